@@ -0,0 +1,171 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from src.tools import bcolors
+from src.settings import get_settings
+from src.audio_utils import decode_audio, ALLOWED_EXTENSIONS, TARGET_SAMPLE_RATE
+
+
+def collect_files(inputs, recursive=False):
+    """Összegyűjti a feldolgozandó hangfájlokat könyvtárakból és glob mintákból."""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*') if recursive else os.path.join(item, '*')
+            candidates = glob.glob(pattern, recursive=recursive)
+        else:
+            candidates = glob.glob(item, recursive=recursive)
+        for path in sorted(candidates):
+            if os.path.isfile(path) and path.rsplit('.', 1)[-1].lower() in ALLOWED_EXTENSIONS:
+                files.append(os.path.abspath(path))
+    # Duplikátumok kiszűrése, sorrend megtartásával
+    return list(dict.fromkeys(files))
+
+
+def load_done_files(output_path):
+    """Beolvassa a korábbi futás sikeresen feldolgozott fájljait a folytatáshoz."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Megszakított futás félbe maradt utolsó sora
+                continue
+            if record.get('status') == 'processed':
+                done.add(record.get('file'))
+    return done
+
+
+def decode_job(path):
+    """Process pool worker: dekódolja a fájlt, a hibát is visszaadja (nem dobja)."""
+    started = time.monotonic()
+    try:
+        samples = decode_audio(path, TARGET_SAMPLE_RATE)
+        return path, samples, None, time.monotonic() - started
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {str(e)}", time.monotonic() - started
+
+
+def write_record(output_file, record):
+    """Egy eredmény sor kiírása és azonnali flush, hogy megszakításkor se vesszen el."""
+    output_file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+    output_file.flush()
+
+
+def run_batch(files, output_path, workers, batch_size, hint=None):
+    """
+    A fájlokat párhuzamosan dekódolja egy process pool-on, és batch-enként
+    adja át a pipeline-nak. Az eredményeket menet közben JSONL-be írja.
+    """
+    # A recognition import behúzza a torch-ot és a transformers-t; csak a fő processben kell
+    # (Windows spawn esetén a worker-ek újraimportálják ezt a modult)
+    from src.recognition import transcribe_samples
+
+    processed = 0
+    failed = 0
+    started = time.monotonic()
+    audio_seconds = 0.0
+    pending_batch = []
+    # Egyszerre legfeljebb ennyi dekódolás fut/vár, hogy a memória korlátos maradjon
+    max_in_flight = workers * 2 + batch_size
+    remaining = iter(files)
+
+    def flush_batch(output_file):
+        nonlocal processed, failed, audio_seconds
+        if not pending_batch:
+            return
+        batch_started = time.monotonic()
+        results = transcribe_samples(
+            [samples for _, samples, _ in pending_batch],
+            sampling_rate=TARGET_SAMPLE_RATE,
+            batch_size=batch_size,
+            hint=hint
+        )
+        inference_sec = time.monotonic() - batch_started
+        for (path, samples, decode_sec), result in zip(pending_batch, results):
+            duration_sec = len(samples) / float(TARGET_SAMPLE_RATE)
+            record = {
+                'file': path,
+                'status': result.get('status'),
+                'duration_sec': duration_sec,
+                'decode_sec': decode_sec,
+                'batch_inference_sec': inference_sec,
+                'routing': result.get('routing'),
+                'partial': result.get('partial', False),
+            }
+            if result.get('status') == 'processed':
+                record['text'] = result['result'].get('text', '')
+                record['result'] = result['result']
+                processed += 1
+                audio_seconds += duration_sec
+            else:
+                record['error'] = result.get('error')
+                failed += 1
+            write_record(output_file, record)
+        pending_batch.clear()
+        print(f"{bcolors.OKBLUE}[INFO] Kész: {processed} sikeres, {failed} sikertelen / {len(files)}{bcolors.ENDC}")
+
+    with open(output_path, 'a', encoding='utf-8') as output_file, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        while True:
+            # Pool feltöltése
+            while len(in_flight) < max_in_flight:
+                path = next(remaining, None)
+                if path is None:
+                    break
+                in_flight.add(executor.submit(decode_job, path))
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, samples, error, decode_sec = future.result()
+                if error:
+                    failed += 1
+                    print(f"{bcolors.FAIL}[ERROR] Dekódolás sikertelen: {path} - {error}{bcolors.ENDC}")
+                    write_record(output_file, {'file': path, 'status': 'failed', 'error': error})
+                    continue
+                pending_batch.append((path, samples, decode_sec))
+            if len(pending_batch) >= batch_size:
+                flush_batch(output_file)
+        flush_batch(output_file)
+
+    elapsed = time.monotonic() - started
+    rtf = elapsed / audio_seconds if audio_seconds else 0.0
+    print(f"{bcolors.OKGREEN}[SUCCESS] Batch kész: {processed} sikeres, {failed} sikertelen, "
+          f"{audio_seconds:.1f}s hang {elapsed:.1f}s alatt (RTF: {rtf:.3f}){bcolors.ENDC}")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hangfájlok batch felismerése szerver nélkül, JSONL kimenettel.')
+    parser.add_argument('inputs', nargs='+', help='Könyvtárak vagy glob minták (pl. "recordings/*.wav")')
+    parser.add_argument('-o', '--output', default='transcripts.jsonl', help='Kimeneti JSONL fájl (folytatható)')
+    parser.add_argument('-r', '--recursive', action='store_true', help='Alkönyvtárak bejárása')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help='Dekódoló processek száma')
+    parser.add_argument('-b', '--batch-size', type=int, default=None,
+                        help='Pipeline batch méret (alapból a hangolt érték, vagy 8)')
+    parser.add_argument('--model-tier', choices=['fast', 'accurate'], default=None, help='Tier kényszerítése')
+    args = parser.parse_args()
+
+    files = collect_files(args.inputs, recursive=args.recursive)
+    done = load_done_files(args.output)
+    todo = [path for path in files if path not in done]
+    print(f"{bcolors.OKBLUE}[INFO] {len(files)} fájl található, {len(done & set(files))} már kész, "
+          f"{len(todo)} feldolgozandó{bcolors.ENDC}")
+    if not todo:
+        return 0
+    batch_size = args.batch_size or get_settings().get('tuned_batch_size') or 8
+    failed = run_batch(todo, args.output, max(1, args.workers), max(1, batch_size), hint=args.model_tier)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
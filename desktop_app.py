@@ -1,24 +1,38 @@
+from src.startup_profile import startup_profiler
 import pyaudio
-import wave
 import threading
 import time
 import requests
 import json
-import tempfile
 import os
 import sys
 import signal
 import subprocess
+import importlib
 from pynput import keyboard
 from pynput.keyboard import Key, KeyCode
-import pyperclip
-from src.tools import bcolors
+from src.tools import get_logger
 import tkinter as tk
 import queue
-from pydub import AudioSegment
+import numpy as np
 from src.indicator import StatusIndicator
-from src.recognition import process_audio
-from src.settings_window import open_settings_window, get_settings
+from src.settings import get_settings
+from src.settings_window import open_settings_window
+from src.output_engine import TextOutputEngine
+from src.audio_utils import pcm16_to_float_mono, TARGET_SAMPLE_RATE
+from src.recognition_daemon import DaemonClient, DaemonUnavailable
+from src.remote_backend import RemoteRecognizer, RemoteUnavailable
+from src.session_recorder import SessionRecorder
+from src.vad import Endpointer, EVENT_ENDPOINT, EVENT_NO_SPEECH
+
+startup_profiler.mark('base imports done')
+# Aszinkron naplózás: a billentyű és felvételi útvonal nem vár a konzolra (debug alapból kikapcsolva)
+log = get_logger('desktop')
+
+# Diktálás állapotai: felvétel -> feldolgozás (felismerés, kiírás) -> szabad
+STATE_IDLE = 'idle'
+STATE_RECORDING = 'recording'
+STATE_FINISHING = 'finishing'
 
 class SpeechRecognitionDesktopApp:
     """
@@ -30,6 +44,9 @@ class SpeechRecognitionDesktopApp:
     def __init__(self):
         """Inicializálja az alkalmazást"""
         self.is_recording = False
+        # A start/stop több szálról jöhet (billentyű figyelő, VAD a felvételi szálon): zár alatt váltunk
+        self.state = STATE_IDLE
+        self.state_lock = threading.Lock()
         self.audio_frames = []
         self.recording_thread = None
         self.audio = pyaudio.PyAudio()
@@ -38,6 +55,8 @@ class SpeechRecognitionDesktopApp:
         self.ctrl_pressed = False
         self.win_pressed = False
         self.was_combo_pressed = False  # Prevent retriggering while held
+        # A fizikailag lenyomott Ctrl / Win billentyűk (a reset_keys nem törli): amíg nem üres, a kimenet vár
+        self.held_modifiers = set()
         # Alkalmazás állapot
         self.running = True
         self.listener = None
@@ -46,19 +65,141 @@ class SpeechRecognitionDesktopApp:
         self.FORMAT = pyaudio.paInt16
         self.CHANNELS = 2
         self.RATE = 44100
-        print(f"{bcolors.OKGREEN}[INFO] Beszédfelismerés asztali alkalmazás elindítva{bcolors.ENDC}")
-        print(f"{bcolors.OKBLUE}[INFO] Nyomja meg a Ctrl+Win billentyűkombinációt a mikrofon aktiválásához{bcolors.ENDC}")
-        print(f"{bcolors.OKBLUE}[INFO] Engedje el a billentyűket a felismerés befejezéséhez{bcolors.ENDC}")
-        print(f"{bcolors.OKBLUE}[INFO] Nyomja meg a Ctrl+C billentyűkombinációt a kilépéshez{bcolors.ENDC}")
+        # Inkrementális kimenet: a felvétel ablakait már felvétel közben felismerjük
+        settings = get_settings()
+        self.output_engine = TextOutputEngine(
+            mode=settings.get('output_mode', 'paste'),
+            restore_clipboard=settings.get('restore_clipboard', True)
+        )
+        self.incremental_output = settings.get('incremental_output', True)
+        self.incremental_window_sec = settings.get('incremental_window_sec', 20)
+        self.SEGMENT_CUT_SEARCH_SEC = 3  # ennyi másodpercben keressük a legcsendesebb vágási pontot
+        self.segment_queue = None
+        self.segment_thread = None
+        self.segment_start = 0
+        self.emitted_segments = 0
+        # A felismerő modul (torch, transformers, modellek) háttérben töltődik be,
+        # vagy ha fut a helyi daemon, azt használjuk (egy közös modell az összes helyi kliensnek)
+        self.recognition_backend = settings.get('recognition_backend', 'auto')
+        self.daemon_client = None
+        self.remote = None
+        self.recognize_samples = None
+        self.local_recognize = None
+        self.local_lock = threading.Lock()
+        self.recognition_error = None
+        self.recognition_ready = threading.Event()
+        # Opt-in: a diktálások hangja, idővonala és szövege a helyi korpuszba (replay-hez)
+        self.session_recorder = None
+        if settings.get('session_recording_enabled', False):
+            self.session_recorder = SessionRecorder(max_mb=settings.get('session_corpus_max_mb', 500))
+        self.session = None
+        # Kihangosított mód: egy koppintás indít, a felvétel a beszéd végén magától áll le (VAD)
+        self.hands_free = settings.get('hands_free_mode', False)
+        self.endpointer = None
+        self.profile_startup = '--profile-startup' in sys.argv or settings.get('startup_profile', False)
+        log.info("Beszédfelismerés asztali alkalmazás elindítva")
+        log.info("Nyomja meg a Ctrl+Win billentyűkombinációt a mikrofon aktiválásához")
+        if self.hands_free:
+            log.info("Kihangosított mód: a felvétel a beszéd végén magától leáll (vagy újabb Ctrl+Win)")
+        else:
+            log.info("Engedje el a billentyűket a felismerés befejezéséhez")
+        log.info("Nyomja meg a Ctrl+C billentyűkombinációt a kilépéshez")
         signal.signal(signal.SIGINT, self.signal_handler)
         # Hangerő beállítása indításkor
-        initial_volume = get_settings().get('volume', 50)
-        self.indicator = StatusIndicator(on_click=lambda: open_settings_window(on_volume_change=self.indicator.sound_manager.set_volume if hasattr(self, 'indicator') else None))
-        # A SoundManager példányt csak az indicator létrehozása után érjük el
-        self.indicator.start()
-        self.indicator.sound_manager.set_volume(initial_volume)
-        self.indicator.sound_manager.play_sound('app_start')
-        # Warm-up: open and close a dummy stream
+        initial_volume = settings.get('volume', 50)
+        with startup_profiler.measure('indicator'):
+            self.indicator = StatusIndicator(on_click=lambda: open_settings_window(on_volume_change=self.indicator.sound_manager.set_volume if hasattr(self, 'indicator') else None))
+            # A SoundManager példányt csak az indicator létrehozása után érjük el
+            self.indicator.start()
+            self.indicator.set_status('loading')
+        with startup_profiler.measure('sound cues'):
+            self.indicator.sound_manager.set_volume(initial_volume)
+            self.indicator.sound_manager.play_sound('app_start')
+        # Nehéz importok, modellek és mikrofon warm-up a háttérben; az UI addig is használható
+        threading.Thread(target=self.load_recognition, name='model-loader', daemon=True).start()
+
+    def load_recognition(self):
+        """Háttérszál: mikrofon warm-up, majd a daemon kapcsolat vagy a helyi modellek betöltése"""
+        with startup_profiler.measure('microphone warm-up'):
+            self.warm_up_microphone()
+        try:
+            if self.recognition_backend == 'remote':
+                self.connect_remote()
+                self.recognize_samples = self.recognize_via_remote
+            elif self.recognition_backend in ('auto', 'daemon') and self.connect_daemon():
+                self.recognize_samples = self.recognize_via_daemon
+            else:
+                self.recognize_samples = self.load_local_recognition()
+            if not self.is_recording:
+                self.indicator.set_status('idle')
+        except Exception as e:
+            self.recognition_error = str(e)
+            log.error("Modell betöltése sikertelen: %s", e)
+            self.indicator.set_status('error')
+        finally:
+            self.recognition_ready.set()
+            startup_profiler.mark('recognition ready')
+            if self.profile_startup:
+                startup_profiler.print_report()
+
+    def connect_daemon(self):
+        """Kapcsolódás a helyi felismerő daemonhoz; False, ha nem fut"""
+        with startup_profiler.measure('daemon connect'):
+            client = DaemonClient(timeout_sec=get_settings().get('daemon_timeout_sec', 60))
+            if not client.ping():
+                log.info("Nem fut helyi felismerő daemon, helyi modell betöltése")
+                return False
+        self.daemon_client = client
+        log.success("Kapcsolódva a helyi felismerő daemonhoz: %s", client.path)
+        return True
+
+    def connect_remote(self):
+        """Távoli szerver háttér: kapcsolat pool és háttér health check; a helyi modell csak szükség esetén töltődik"""
+        settings = get_settings()
+        with startup_profiler.measure('remote health check'):
+            self.remote = RemoteRecognizer(
+                settings.get('remote_server_url', 'http://localhost:38321'),
+                codec=settings.get('remote_codec', 'flac'),
+                timeout_base_sec=settings.get('remote_timeout_base_sec', 5),
+                timeout_per_audio_sec=settings.get('remote_timeout_per_audio_sec', 1.0),
+                health_interval_sec=settings.get('remote_health_interval_sec', 15)
+            )
+            self.remote.start()
+        log.info("Távoli felismerés: %s (%s)", self.remote.base_url,
+                 'elérhető' if self.remote.healthy else 'nem elérhető, helyi tartalék')
+
+    def recognize_via_remote(self, samples):
+        """Felismerés a távoli szerveren; lassú vagy elérhetetlen szervernél helyi felismerés"""
+        try:
+            return self.remote.recognize(samples)
+        except RemoteUnavailable as e:
+            log.warning("Távoli szerver nem használható (%s), helyi felismerés...", e)
+            return self.load_local_recognition()(samples)
+
+    def load_local_recognition(self):
+        """A felismerő modul és a modellek betöltése ebben a processben (egyszer); a felismerő függvényt adja vissza"""
+        with self.local_lock:
+            if self.local_recognize is None:
+                with startup_profiler.measure('import src.recognition'):
+                    recognition = importlib.import_module('src.recognition')
+                for tier in recognition.model_manager.enabled_tiers():
+                    with startup_profiler.measure(f'model load: {tier}'):
+                        recognition.model_manager.get_pipe(tier)
+                self.local_recognize = recognition.recognize_samples
+                log.success("Beszédfelismerő modell betöltve")
+            return self.local_recognize
+
+    def recognize_via_daemon(self, samples):
+        """Felismerés a daemonban; ha közben leállt, átváltunk helyi felismerésre"""
+        try:
+            return self.daemon_client.transcribe(samples)
+        except DaemonUnavailable as e:
+            log.warning("A daemon nem érhető el (%s), helyi felismerésre váltás...", e)
+            self.recognize_samples = self.load_local_recognition()
+            return self.recognize_samples(samples)
+
+    def warm_up_microphone(self):
+        """Warm-up: open and close a dummy stream"""
         try:
             dummy_stream = self.audio.open(
                 format=self.FORMAT,
@@ -68,89 +209,116 @@ class SpeechRecognitionDesktopApp:
                 frames_per_buffer=self.CHUNK
             )
             dummy_stream.close()
-            print(f"{bcolors.OKBLUE}[INFO] Mikrofon előmelegítve (warm-up){bcolors.ENDC}")
+            log.info("Mikrofon előmelegítve (warm-up)")
         except Exception as e:
-            print(f"{bcolors.WARNING}[WARNING] Mikrofon warm-up sikertelen: {e}{bcolors.ENDC}")
+            log.warning("Mikrofon warm-up sikertelen: %s", e)
         
     def signal_handler(self, signum, frame):
         """Signal handler a Ctrl+C kezeléséhez"""
         # Csak SIGINT (Ctrl+C) jelre reagálunk
         if signum == signal.SIGINT:
-            print(f"\n{bcolors.OKBLUE}[INFO] Kilépési jel fogadva (Ctrl+C){bcolors.ENDC}")
+            log.info("Kilépési jel fogadva (Ctrl+C)")
             self.running = False
             self.cleanup()
             sys.exit(0)
         
+    def is_hotkey_modifier(self, key):
+        return (key in (Key.ctrl, Key.ctrl_l, Key.ctrl_r, Key.cmd, Key.cmd_l, Key.cmd_r)
+                or (hasattr(key, 'vk') and key.vk == 91)
+                or (hasattr(key, 'name') and key.name == 'cmd'))
+
+    def track_modifier(self, key, pressed):
+        """
+        Amíg Ctrl vagy Win fizikailag le van nyomva, a kimenet vár (a Ctrl+V / gépelés különben
+        módosító billentyűkkel keveredne); az utolsó felengedésekor a felgyűlt szöveg kiíródik.
+        """
+        if not self.is_hotkey_modifier(key):
+            return
+        if pressed:
+            self.held_modifiers.add(key)
+            self.output_engine.hold()
+        else:
+            self.held_modifiers.discard(key)
+            if not self.held_modifiers:
+                self.output_engine.release()
+
     def on_press(self, key):
         """Billentyű lenyomásakor meghívott függvény"""
         try:
+            self.track_modifier(key, True)
             changed = False
             # Ctrl billentyű követése (több lehetséges formátum)
             if key == Key.ctrl or key == Key.ctrl_l or key == Key.ctrl_r:
                 if not self.ctrl_pressed:
-                    print(f"{bcolors.OKBLUE}[INFO] Ctrl billentyű lenyomva{bcolors.ENDC}")
+                    log.debug("Ctrl billentyű lenyomva")
                     self.ctrl_pressed = True
                     changed = True
 
             # Windows billentyű követése (több lehetséges formátum)
             elif (hasattr(key, 'vk') and key.vk == 91) or key == Key.cmd or key == Key.cmd_l or key == Key.cmd_r:
                 if not self.win_pressed:
-                    print(f"{bcolors.OKBLUE}[INFO] Windows billentyű lenyomva{bcolors.ENDC}")
+                    log.debug("Windows billentyű lenyomva")
                     self.win_pressed = True
                     changed = True
 
             # Alternatív Windows key detektálás
             elif hasattr(key, 'name') and key.name == 'cmd':
                 if not self.win_pressed:
-                    print(f"{bcolors.OKBLUE}[INFO] Windows billentyű lenyomva (name){bcolors.ENDC}")
+                    log.debug("Windows billentyű lenyomva (name)")
                     self.win_pressed = True
                     changed = True
 
             # Ellenőrizzük a Ctrl+Win kombinációt csak egyszer, amikor mindkettő először lenyomva
             if self.ctrl_pressed and self.win_pressed and not self.was_combo_pressed:
-                print(f"{bcolors.OKGREEN}[INFO] Ctrl+Win kombináció lenyomva - felvétel indítása!{bcolors.ENDC}")
+                log.info("Ctrl+Win kombináció lenyomva - felvétel indítása!")
                 self.was_combo_pressed = True
                 if not self.is_recording:
                     self.start_recording()
+                elif self.hands_free:
+                    # Kihangosított módban az újabb koppintás kézzel zárja le a felvételt
+                    log.info("Ctrl+Win koppintás - felvétel leállítása!")
+                    self.stop_recording(reset_keys=False)
 
             # Debug: log state
             if changed:
-                print(f"[DEBUG] State: ctrl_pressed={self.ctrl_pressed}, win_pressed={self.win_pressed}, was_combo_pressed={self.was_combo_pressed}")
+                log.debug("State: ctrl_pressed=%s, win_pressed=%s, was_combo_pressed=%s",
+                          self.ctrl_pressed, self.win_pressed, self.was_combo_pressed)
 
         except AttributeError as e:
-            print(f"{bcolors.WARNING}[WARNING] Billentyű detektálási hiba: {e}{bcolors.ENDC}")
+            log.warning("Billentyű detektálási hiba: %s", e)
 
         except Exception as e:
-            print(f"{bcolors.FAIL}[ERROR] Váratlan hiba a billentyű detektálás során: {e}{bcolors.ENDC}")
+            log.error("Váratlan hiba a billentyű detektálás során: %s", e)
             
     def on_release(self, key):
         """Billentyű felengedéskor meghívott függvény"""
         try:
+            self.track_modifier(key, False)
             changed = False
             # Ctrl billentyű felengedés követése (több lehetséges formátum)
             if key == Key.ctrl or key == Key.ctrl_l or key == Key.ctrl_r:
                 if self.ctrl_pressed:
                     self.ctrl_pressed = False
-                    print(f"{bcolors.OKBLUE}[INFO] Ctrl billentyű felengedve{bcolors.ENDC}")
+                    log.debug("Ctrl billentyű felengedve")
                     changed = True
 
             # Windows billentyű felengedés követése (több lehetséges formátum)
             elif (hasattr(key, 'vk') and key.vk == 91) or key == Key.cmd or key == Key.cmd_l or key == Key.cmd_r:
                 if self.win_pressed:
                     self.win_pressed = False
-                    print(f"{bcolors.OKBLUE}[INFO] Windows billentyű felengedve{bcolors.ENDC}")
+                    log.debug("Windows billentyű felengedve")
                     changed = True
 
             # Alternatív Windows key felengedés detektálás
             elif hasattr(key, 'name') and key.name == 'cmd':
                 if self.win_pressed:
                     self.win_pressed = False
-                    print(f"{bcolors.OKBLUE}[INFO] Windows billentyű felengedve (name){bcolors.ENDC}")
+                    log.debug("Windows billentyű felengedve (name)")
                     changed = True
 
             # Ha bármelyik billentyű felengedődik és felvétel folyik, leállítjuk
-            if (not self.ctrl_pressed or not self.win_pressed) and self.is_recording:
-                print(f"{bcolors.OKGREEN}[INFO] Billentyűk felengedve - felvétel leállítása!{bcolors.ENDC}")
+            if (not self.ctrl_pressed or not self.win_pressed) and self.is_recording and not self.hands_free:
+                log.info("Billentyűk felengedve - felvétel leállítása!")
                 self.stop_recording()
 
             # Reset combo flag if either key is released
@@ -159,50 +327,97 @@ class SpeechRecognitionDesktopApp:
 
             # Debug: log state
             if changed:
-                print(f"[DEBUG] State: ctrl_pressed={self.ctrl_pressed}, win_pressed={self.win_pressed}, was_combo_pressed={self.was_combo_pressed}")
+                log.debug("State: ctrl_pressed=%s, win_pressed=%s, was_combo_pressed=%s",
+                          self.ctrl_pressed, self.win_pressed, self.was_combo_pressed)
                 
         except AttributeError as e:
-            print(f"{bcolors.WARNING}[WARNING] Billentyű felengedés detektálási hiba: {e}{bcolors.ENDC}")
+            log.warning("Billentyű felengedés detektálási hiba: %s", e)
 
         except Exception as e:
-            print(f"{bcolors.FAIL}[ERROR] Váratlan hiba a billentyű felengedés detektálás során: {e}{bcolors.ENDC}")
+            log.error("Váratlan hiba a billentyű felengedés detektálás során: %s", e)
             
     def start_recording(self):
         """Elindítja az audio felvételt"""
-        if self.is_recording:
-            return
-        print(f"{bcolors.OKGREEN}[INFO] Mikrofon aktiválva - felvétel kezdete...{bcolors.ENDC}")
-        self.is_recording = True
+        with self.state_lock:
+            if self.state == STATE_FINISHING:
+                # Az előző diktálás még a felvétel állapotával dolgozik (frame-ek, szegmens sor, session)
+                log.info("Az előző diktálás feldolgozása még tart, új felvétel nem indul")
+                return
+            if self.state != STATE_IDLE:
+                return
+            self.state = STATE_RECORDING
+            self.is_recording = True
+        log.info("Mikrofon aktiválva - felvétel kezdete...")
+        if self.session_recorder:
+            self.session = self.session_recorder.begin('incremental' if self.incremental_output else 'single')
+            self.mark('key_down')
         self.audio_frames = []
-        self.stream = self.audio.open(
-            format=self.FORMAT,
-            channels=self.CHANNELS,
-            rate=self.RATE,
-            input=True,
-            frames_per_buffer=self.CHUNK
-        )
+        self.output_engine.begin()
+        if self.hands_free:
+            self.endpointer = self.create_endpointer()
+        try:
+            self.stream = self.audio.open(
+                format=self.FORMAT,
+                channels=self.CHANNELS,
+                rate=self.RATE,
+                input=True,
+                frames_per_buffer=self.CHUNK
+            )
+        except Exception:
+            with self.state_lock:
+                self.state = STATE_IDLE
+                self.is_recording = False
+            self.session = None
+            raise
+        self.mark('recording_started')
+        if self.incremental_output:
+            self.start_segment_worker()
         self.recording_thread = threading.Thread(target=self.record_audio)
         self.recording_thread.start()
         self.indicator.set_status('listening')
         
-    def stop_recording(self):
-        """Leállítja az audio felvételt és feldolgozza a hangot"""
-        if not self.is_recording:
-            return
-            
-        print(f"{bcolors.OKBLUE}[INFO] Mikrofon deaktiválva - felvétel befejezése...{bcolors.ENDC}")
+    def create_endpointer(self):
+        """Beszéd végpont detektor a kihangosított módhoz, a beállított csend küszöbökkel"""
+        settings = get_settings()
+        return Endpointer(
+            self.RATE, self.CHUNK,
+            trailing_silence_ms=settings.get('vad_trailing_silence_ms', 700),
+            min_speech_ms=settings.get('vad_min_speech_ms', 150),
+            threshold_ratio=settings.get('vad_threshold_ratio', 3.0),
+            min_rms=settings.get('vad_min_rms', 150),
+            no_speech_timeout_sec=settings.get('vad_no_speech_timeout_sec', 8),
+            tail_ms=settings.get('vad_tail_ms', 150)
+        )
+
+    def stop_recording(self, reset_keys=True):
+        """Leállítja az audio felvételt és feldolgozza a hangot (egy felvételre csak egyszer fut le)"""
+        with self.state_lock:
+            if self.state != STATE_RECORDING:
+                return
+            self.state = STATE_FINISHING
+            self.is_recording = False
+        try:
+            self.finish_recording(reset_keys)
+        finally:
+            with self.state_lock:
+                self.state = STATE_IDLE
+
+    def finish_recording(self, reset_keys):
+        """A felvétel lezárása és feldolgozása; közben új felvétel nem indulhat (STATE_FINISHING)"""
+        log.info("Mikrofon deaktiválva - felvétel befejezése...")
+        self.mark('key_up')
         
         # Play end sound
         self.indicator.sound_manager.play_sound('end')
         
-        self.is_recording = False
-        # Reset key states to avoid stuck keys
-        self.ctrl_pressed = False
-        self.win_pressed = False
-        self.was_combo_pressed = False
+        # Reset key states to avoid stuck keys (koppintásnál / VAD leállításnál a billentyűk állapota valós)
+        if reset_keys:
+            self.ctrl_pressed = False
+            self.win_pressed = False
+            self.was_combo_pressed = False
         
-        # Várjuk meg a felvételi szál befejezését
-        if self.recording_thread:
+        # Várjuk meg a felvételi szál befejezését (a VAD leállítás magából a felvételi szálból jön)
+        if self.recording_thread and self.recording_thread is not threading.current_thread():
             self.recording_thread.join()
             
         # Audio stream lezárása
@@ -210,12 +425,34 @@ class SpeechRecognitionDesktopApp:
             self.stream.stop_stream()
             self.stream.close()
             self.stream = None
+        self.mark('recording_stopped', audio_sec=round(self.frame_to_sec(len(self.audio_frames)), 3))
             
         # Audio feldolgozása
-        if self.audio_frames:
+        if self.incremental_output:
+            self.finish_segments()
+        elif self.audio_frames:
             self.process_audio()
             
         self.indicator.set_status('idle')
+        if self.session:
+            self.session.finish(b''.join(self.audio_frames), self.CHANNELS, self.RATE, backend=self.backend_name())
+            self.session = None
+
+    def mark(self, event, **details):
+        """Esemény rögzítése a diktálás idővonalán (ha a felvevő be van kapcsolva)"""
+        if self.session:
+            self.session.mark(event, **details)
+
+    def frame_to_sec(self, index):
+        """Mikrofon chunk index -> másodperc a felvétel elejétől"""
+        return index * self.CHUNK / float(self.RATE)
+
+    def backend_name(self):
+        if self.recognize_samples == self.recognize_via_remote:
+            return 'remote'
+        if self.recognize_samples == self.recognize_via_daemon:
+            return 'daemon'
+        return 'local'
         
     def record_audio(self):
         """Audio felvételi szál"""
@@ -223,112 +460,211 @@ class SpeechRecognitionDesktopApp:
             while self.is_recording and self.running:
                 data = self.stream.read(self.CHUNK, exception_on_overflow=False)
                 self.audio_frames.append(data)
+                if self.endpointer and self.check_endpoint(data):
+                    return
+                if self.incremental_output:
+                    self.submit_ready_segment()
                 time.sleep(0.01)  # Rövid várakozás a CPU terhelés csökkentésére
         except Exception as e:
-            print(f"{bcolors.FAIL}[ERROR] Hiba az audio felvétel során: {str(e)}{bcolors.ENDC}")
+            log.error("Hiba az audio felvétel során: %s", e)
+
+    def check_endpoint(self, data):
+        """
+        Kihangosított mód, a felvételi szálon: ha a beszéd véget ért, a záró csendet levágja és
+        azonnal leállítja a felvételt (a felismerés indul). True, ha a felvétel véget ért.
+        """
+        event = self.endpointer.push(data)
+        if event == EVENT_ENDPOINT:
+            # A már beküldött szegmenseket nem vágjuk
+            keep = max(self.segment_start if self.incremental_output else 0, self.endpointer.end_index())
+            self.mark('endpoint', trimmed_sec=round(self.frame_to_sec(len(self.audio_frames) - keep), 3))
+            log.info("Beszéd vége észlelve - felvétel leállítása!")
+            del self.audio_frames[keep:]
+        elif event == EVENT_NO_SPEECH:
+            log.warning("Nem érkezett beszéd, felvétel leállítása")
+            self.mark('no_speech')
+            del self.audio_frames[:]
+        else:
+            return False
+        self.stop_recording(reset_keys=False)
+        return True
+
+    def start_segment_worker(self):
+        """Elindítja a szegmens felismerő szálat egy új felvételhez"""
+        self.segment_queue = queue.Queue()
+        self.segment_start = 0
+        self.emitted_segments = 0
+        self.segment_thread = threading.Thread(target=self.segment_worker, daemon=True)
+        self.segment_thread.start()
+
+    def submit_ready_segment(self):
+        """Ha elég hang gyűlt össze, a legcsendesebb ponton levágja és felismerésre küldi"""
+        frames_per_sec = self.RATE / self.CHUNK
+        pending = len(self.audio_frames) - self.segment_start
+        if pending < self.incremental_window_sec * frames_per_sec:
+            return
+        search = min(pending, int(self.SEGMENT_CUT_SEARCH_SEC * frames_per_sec))
+        first = len(self.audio_frames) - search
+        # Vágás a legkisebb energiájú chunk után, hogy ne vágjunk szó közepébe
+        energies = [
+            np.abs(np.frombuffer(frame, dtype=np.int16)).mean()
+            for frame in self.audio_frames[first:]
+        ]
+        cut = first + int(np.argmin(energies)) + 1
+        self.segment_queue.put((self.segment_start, cut, self.audio_frames[self.segment_start:cut]))
+        self.mark('segment_submitted', end_sec=round(self.frame_to_sec(cut), 3))
+        self.segment_start = cut
+        log.debug("Szegmens felismerésre küldve (felvétel folytatódik)")
+
+    def segment_worker(self):
+        """Sorban felismeri a beküldött szegmenseket és átadja a szöveget a kimenetnek"""
+        while True:
+            item = self.segment_queue.get()
+            if item is None:
+                break
+            start, end, frames = item
+            started = time.perf_counter()
+            text = self.recognize_frames(frames)
+            if self.session:
+                self.session.add_segment(self.frame_to_sec(start), self.frame_to_sec(end), text,
+                                         time.perf_counter() - started, status='processed' if text else 'empty')
+            if text:
+                self.emitted_segments += 1
+                log.success("Felismert szegmens: %s", text)
+                self.output_engine.emit(text)
+                self.mark('output', end_sec=round(self.frame_to_sec(end), 3))
+
+    def finish_segments(self):
+        """Elküldi a maradék hangot, megvárja az összes szegmenst és kiírja a szöveget"""
+        self.indicator.set_status('sending')
+        remaining = self.audio_frames[self.segment_start:]
+        if remaining:
+            self.segment_queue.put((self.segment_start, len(self.audio_frames), remaining))
+        self.segment_queue.put(None)
+        self.segment_thread.join()
+        # A kiírás a módosító billentyűk felengedésére vár (track_modifier), nem a felvétel végére
+        self.output_engine.flush()
+        self.mark('output_flushed')
+        if self.emitted_segments:
+            self.indicator.set_status('done')
+        else:
+            self.indicator.set_status('error')
+            log.warning("Nem sikerült szöveget felismerni")
+
+    def frames_to_samples(self, frames):
+        """Mikrofon frame-ek -> 16 kHz mono float32 minták (fájl nélkül); néma hangnál None"""
+        data = b''.join(frames)
+        pcm = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        # Néma ellenőrzés: int16 RMS (a korábbi pydub rms < 100 feltétellel azonos)
+        if len(pcm) == 0 or np.sqrt(np.mean(pcm * pcm)) < 100:
+            return None
+        return pcm16_to_float_mono(data, self.CHANNELS, self.RATE)
+
+    def recognize_frames(self, frames):
+        """Felismer egy szegmenst, néma szegmens esetén None-t ad vissza"""
+        try:
+            samples = self.frames_to_samples(frames)
+            if samples is None:
+                log.warning("Néma szegmens, kihagyva")
+                return None
+            result = self.run_recognition(samples)
+            if result.get('status') != 'processed':
+                log.error("Szegmens felismerése sikertelen: %s", result.get('error', 'Ismeretlen hiba'))
+                return None
+            return self.extract_text(result).strip() or None
+        except Exception as e:
+            log.error("Hiba a szegmens feldolgozása során: %s", e)
+            return None
+
+    def run_recognition(self, samples):
+        """Megvárja a háttérben induló felismerőt, majd felismeri a 16 kHz mono mintákat"""
+        if not self.recognition_ready.is_set():
+            log.info("Várakozás a modell betöltésére...")
+            self.recognition_ready.wait()
+        if self.recognize_samples is None:
+            return {'status': 'failed', 'error': f'Model loading failed: {self.recognition_error}'}
+        return self.recognize_samples(samples)
+
+    def extract_text(self, result):
+        """Kinyeri a felismert szöveget a process_audio eredményéből"""
+        if isinstance(result.get('result'), dict):
+            return result['result'].get('text', '')
+        elif isinstance(result.get('result'), str):
+            return result['result']
+        return ''
             
     def process_audio(self):
         """Feldolgozza a felvett hangot"""
         try:
-            print(f"{bcolors.OKBLUE}[INFO] Audio feldolgozás kezdete...{bcolors.ENDC}")
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                temp_wav_path = temp_file.name
-            with wave.open(temp_wav_path, 'wb') as wf:
-                wf.setnchannels(self.CHANNELS)
-                wf.setsampwidth(self.audio.get_sample_size(self.FORMAT))
-                wf.setframerate(self.RATE)
-                wf.writeframes(b''.join(self.audio_frames))
-            audio = AudioSegment.from_wav(temp_wav_path)
-            duration_sec = len(audio) / 1000.0
-            # --- ÚJ: Néma ellenőrzés ---
-            # Ha az RMS vagy dBFS túl alacsony, akkor a felvétel néma
-            if audio.rms < 100 or audio.dBFS < -100:
-                print(f"{bcolors.WARNING}[WARNING] A felvétel néma vagy túl halk, nem küldjük a felismerésnek.{bcolors.ENDC}")
+            log.debug("Audio feldolgozás kezdete...")
+            samples = self.frames_to_samples(self.audio_frames)
+            # Ha az RMS túl alacsony, akkor a felvétel néma
+            if samples is None:
+                log.warning("A felvétel néma vagy túl halk, nem küldjük a felismerésnek.")
                 self.indicator.set_status('error')
                 return
-            # --- Vége: Néma ellenőrzés ---
+            duration_sec = len(samples) / float(TARGET_SAMPLE_RATE)
             if duration_sec > 30:
-                print(f"{bcolors.WARNING}[WARNING] A felvétel {duration_sec:.1f} másodperc, vágás 30 másodpercre!{bcolors.ENDC}")
-                audio = audio[:30_000]
-                audio.export(temp_wav_path, format='wav')
+                log.warning("A felvétel %.1f másodperc, vágás 30 másodpercre!", duration_sec)
+                samples = samples[:30 * TARGET_SAMPLE_RATE]
             else:
-                print(f"{bcolors.OKBLUE}[INFO] Felvétel hossza: {duration_sec:.1f} másodperc{bcolors.ENDC}")
-            print(f"{bcolors.OKBLUE}[INFO] Audio fájl mentve: {temp_wav_path}{bcolors.ENDC}")
-            # Directly call process_audio from recognition.py
-            self.send_audio_to_recognition(temp_wav_path)
+                log.debug("Felvétel hossza: %.1f másodperc", duration_sec)
+            self.send_audio_to_recognition(samples)
         except Exception as e:
-            print(f"{bcolors.FAIL}[ERROR] Hiba az audio feldolgozás során: {str(e)}{bcolors.ENDC}")
-        finally:
-            if 'temp_wav_path' in locals() and os.path.exists(temp_wav_path):
-                try:
-                    os.unlink(temp_wav_path)
-                except:
-                    pass
-                    
-    def send_audio_to_recognition(self, audio_file_path):
-        """Feldolgozza a hangot közvetlenül a process_audio-val"""
+            log.error("Hiba az audio feldolgozás során: %s", e)
+
+    def send_audio_to_recognition(self, samples):
+        """Felismeri a hangot a kiválasztott háttérrel (daemon vagy helyi modell)"""
         try:
             self.indicator.set_status('sending')
-            print(f"{bcolors.OKBLUE}[INFO] Hang feldolgozása helyben...{bcolors.ENDC}")
-            result = process_audio(audio_file_path)
+            log.debug("Hang feldolgozása...")
+            started = time.perf_counter()
+            result = self.run_recognition(samples)
+            if self.session:
+                self.session.add_segment(0.0, len(samples) / float(TARGET_SAMPLE_RATE),
+                                         self.extract_text(result).strip(), time.perf_counter() - started,
+                                         status=result.get('status'))
             if result.get('status') == 'processed':
-                recognized_text = ''
-                # Try to extract recognized text from result['result']
-                if isinstance(result.get('result'), dict):
-                    recognized_text = result['result'].get('text', '')
-                elif isinstance(result.get('result'), str):
-                    recognized_text = result['result']
+                recognized_text = self.extract_text(result)
                 if recognized_text.strip():
                     self.indicator.set_status('done')
-                    print(f"{bcolors.OKGREEN}[SUCCESS] Felismert szöveg: {recognized_text}{bcolors.ENDC}")
+                    log.success("Felismert szöveg: %s", recognized_text)
                     self.paste_to_clipboard(recognized_text)
+                    self.mark('output')
                 else:
                     self.indicator.set_status('error')
-                    print(f"{bcolors.WARNING}[WARNING] Nem sikerült szöveget felismerni{bcolors.ENDC}")
+                    log.warning("Nem sikerült szöveget felismerni")
             else:
                 self.indicator.set_status('error')
-                print(f"{bcolors.FAIL}[ERROR] Beszédfelismerés sikertelen: {result.get('error', 'Ismeretlen hiba')}{bcolors.ENDC}")
+                log.error("Beszédfelismerés sikertelen: %s", result.get('error', 'Ismeretlen hiba'))
         except Exception as e:
             self.indicator.set_status('error')
-            print(f"{bcolors.FAIL}[ERROR] Hiba a beszédfelismerés során: {str(e)}{bcolors.ENDC}")
+            log.error("Hiba a beszédfelismerés során: %s", e)
             
     def paste_to_clipboard(self, text):
-        """Beilleszti a szöveget a vágólapra és automatikusan beilleszti"""
+        """Kiírja a szöveget a kimeneti motoron keresztül (paste vagy type mód)"""
         try:
-            # Szöveg másolása a vágólapra
-            pyperclip.copy(text)
-            print(f"{bcolors.OKGREEN}[SUCCESS] Szöveg másolva a vágólapra{bcolors.ENDC}")
-            
-            # Rövid várakozás
-            time.sleep(0.1)
-            
-            # Ctrl+V automatikus beillesztés
-            keyboard_controller = keyboard.Controller()
-            keyboard_controller.press(Key.ctrl)
-            keyboard_controller.press('v')
-            keyboard_controller.release('v')
-            keyboard_controller.release(Key.ctrl)
-            
-            print(f"{bcolors.OKGREEN}[SUCCESS] Szöveg automatikusan beillesztve!{bcolors.ENDC}")
-            
+            self.output_engine.emit(text)
+            self.output_engine.flush()
         except Exception as e:
-            print(f"{bcolors.FAIL}[ERROR] Hiba a vágólap használata során: {str(e)}{bcolors.ENDC}")
+            log.error("Hiba a vágólap használata során: %s", e)
             
     def run(self):
         """Elindítja az alkalmazást"""
         try:
-            # Globális billentyű listener létrehozása
-            self.listener = keyboard.Listener(
-                on_press=self.on_press,
-                on_release=self.on_release,
-                suppress=False  # Ne blokkolja a billentyűket más alkalmazásoktól
-            )
+            with startup_profiler.measure('hotkey listener'):
+                # Globális billentyű listener létrehozása
+                self.listener = keyboard.Listener(
+                    on_press=self.on_press,
+                    on_release=self.on_release,
+                    suppress=False  # Ne blokkolja a billentyűket más alkalmazásoktól
+                )
+                # Listener indítása
+                self.listener.start()
+            startup_profiler.mark('ui ready')
             
-            print(f"{bcolors.OKGREEN}[INFO] Billentyű figyelő elindítva{bcolors.ENDC}")
-            print(f"{bcolors.OKBLUE}[INFO] Várakozás a billentyűkombinációra...{bcolors.ENDC}")
-            
-            # Listener indítása
-            self.listener.start()
+            log.info("Billentyű figyelő elindítva")
+            log.info("Várakozás a billentyűkombinációra...")
             
             # Fő ciklus - ellenőrzi a running flag-et
             while self.running:
@@ -339,9 +675,9 @@ class SpeechRecognitionDesktopApp:
                     break
                     
         except KeyboardInterrupt:
-            print(f"\n{bcolors.OKBLUE}[INFO] Alkalmazás leállítva (KeyboardInterrupt){bcolors.ENDC}")
+            log.info("Alkalmazás leállítva (KeyboardInterrupt)")
         except Exception as e:
-            print(f"{bcolors.FAIL}[ERROR] Váratlan hiba: {str(e)}{bcolors.ENDC}")
+            log.error("Váratlan hiba: %s", e)
         finally:
             self.cleanup()
             
@@ -355,7 +691,13 @@ class SpeechRecognitionDesktopApp:
             # Listener leállítása
             if self.listener and self.listener.running:
                 self.listener.stop()
-                print(f"{bcolors.OKBLUE}[INFO] Billentyű figyelő leállítva{bcolors.ENDC}")
+                log.info("Billentyű figyelő leállítva")
+
+            # Távoli/daemon kapcsolatok lezárása
+            if self.remote:
+                self.remote.stop()
+            if self.daemon_client:
+                self.daemon_client.close()
                 
             # Audio erőforrások felszabadítása
             if self.stream:
@@ -364,12 +706,12 @@ class SpeechRecognitionDesktopApp:
             if self.audio:
                 self.audio.terminate()
                 
-            print(f"{bcolors.OKBLUE}[INFO] Erőforrások felszabadítva{bcolors.ENDC}")
+            log.info("Erőforrások felszabadítva")
             
             self.indicator.stop()
             
         except Exception as e:
-            print(f"{bcolors.WARNING}[WARNING] Hiba a cleanup során: {str(e)}{bcolors.ENDC}")
+            log.warning("Hiba a cleanup során: %s", e)
 
 if __name__ == "__main__":
     app = SpeechRecognitionDesktopApp()
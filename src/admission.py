@@ -0,0 +1,129 @@
+import itertools
+import math
+import threading
+
+
+class AdmissionDecision:
+    """Egy befogadási döntés eredménye (Retry-After-rel elutasításkor)"""
+
+    def __init__(self, admitted, reason, backlog_audio_sec, estimated_wait_sec, retry_after_sec=None):
+        self.admitted = admitted
+        self.reason = reason
+        self.backlog_audio_sec = backlog_audio_sec
+        self.estimated_wait_sec = estimated_wait_sec
+        self.retry_after_sec = retry_after_sec
+        # Foglalás azonosítója, amíg a munka még nincs az ütemezőben (release() szabadítja fel)
+        self.reservation = None
+
+    def to_dict(self):
+        return {
+            "admitted": self.admitted,
+            "reason": self.reason,
+            "backlog_audio_sec": round(self.backlog_audio_sec, 2),
+            "estimated_wait_sec": round(self.estimated_wait_sec, 2),
+            "retry_after_sec": self.retry_after_sec,
+        }
+
+
+class AdmissionController:
+    """
+    Költség alapú befogadás: a sorban álló audio-másodperceket és a becsült várakozási időt
+    veti össze a konfigurált kerettel, és túlterheléskor azonnal elutasít, a tényleges backlog-ból
+    számolt Retry-After értékkel (nem köt le szerver szálat 30 mp-ig).
+    A becsléshez a mért real-time factor (feldolgozási idő / audio hossz) mozgóátlagát használja.
+    A befogadott, de még feltöltés / dekódolás alatt álló munkák foglalásként számítanak a backlog-ba,
+    így az egyszerre érkező kérések nem férnek be mind ugyanarra a szabad keretre.
+    """
+
+    def __init__(self, scheduler, max_backlog_audio_sec=1800, max_wait_sec=60, initial_rtf=0.3, ewma_alpha=0.2):
+        self.scheduler = scheduler
+        self.max_backlog_audio_sec = max_backlog_audio_sec
+        self.max_wait_sec = max_wait_sec
+        self.rtf = initial_rtf
+        self.ewma_alpha = ewma_alpha
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._rejected = 0
+        self._reserved = {}
+        self._reservation_ids = itertools.count(1)
+
+    def _running_remaining_sec(self, running):
+        """A futó munkák hátralévő becsült ideje (slot-onként átlagolva)."""
+        remaining = sum(max(0.0, cost_sec * self.rtf - elapsed) for cost_sec, elapsed in running)
+        return remaining / max(1, self.scheduler.slots)
+
+    def check(self, cost_sec=0.0, reserve=False):
+        """
+        Befogadható-e egy cost_sec hosszú munka. cost_sec=0 esetén csak azt nézi, hogy a backlog
+        már önmagában túllépi-e a keretet (előzetes ellenőrzés a body beolvasása előtt).
+        reserve=True esetén a befogadott munka foglalást kap, amíg release() fel nem szabadítja.
+        """
+        with self._lock:
+            return self._check_locked(cost_sec, reserve)
+
+    def _check_locked(self, cost_sec, reserve):
+        total_queued_sec, running = self.scheduler.backlog()
+        # SJF: csak a nálunk nem hosszabb várakozók (és foglalások) kerülnek elénk
+        ahead_queued_sec, _ = self.scheduler.backlog(max_cost_sec=cost_sec if cost_sec else None)
+        reserved_sec = sum(self._reserved.values())
+        ahead_reserved_sec = sum(cost for cost in self._reserved.values() if not cost_sec or cost <= cost_sec)
+        running_audio_sec = sum(cost for cost, _ in running)
+        backlog_audio_sec = total_queued_sec + reserved_sec + running_audio_sec
+        estimated_wait_sec = (ahead_queued_sec + ahead_reserved_sec) * self.rtf / max(1, self.scheduler.slots) \
+            + self._running_remaining_sec(running)
+
+        retry_after = 0.0
+        reasons = []
+        backlog_excess = backlog_audio_sec + cost_sec - self.max_backlog_audio_sec
+        # Üres szerver bármekkora munkát befogad (különben egy túl hosszú fájl sosem férne be)
+        if backlog_excess > 0 and backlog_audio_sec > 0:
+            reasons.append(f"backlog {backlog_audio_sec:.0f}s + {cost_sec:.0f}s > {self.max_backlog_audio_sec}s audio")
+            # Ennyi idő alatt dolgozódik le a többlet a mért sebességgel
+            retry_after = max(retry_after, backlog_excess * self.rtf / max(1, self.scheduler.slots))
+        wait_excess = estimated_wait_sec - self.max_wait_sec
+        if wait_excess > 0:
+            reasons.append(f"estimated wait {estimated_wait_sec:.0f}s > {self.max_wait_sec}s")
+            retry_after = max(retry_after, wait_excess)
+
+        if reasons:
+            self._rejected += 1
+            return AdmissionDecision(
+                False, "; ".join(reasons), backlog_audio_sec, estimated_wait_sec,
+                retry_after_sec=max(1, int(math.ceil(retry_after)))
+            )
+        decision = AdmissionDecision(True, "within budget", backlog_audio_sec, estimated_wait_sec)
+        if cost_sec:
+            self._admitted += 1
+            if reserve:
+                decision.reservation = next(self._reservation_ids)
+                self._reserved[decision.reservation] = cost_sec
+        return decision
+
+    def release(self, decision):
+        """A foglalás felszabadítása (amikor a munka az ütemezőbe kerül, vagy a kérés véget ér); többször is hívható."""
+        if decision is None or decision.reservation is None:
+            return
+        with self._lock:
+            self._reserved.pop(decision.reservation, None)
+        decision.reservation = None
+
+    def record_completion(self, audio_sec, processing_sec):
+        """Frissíti a real-time factor mozgóátlagát egy befejezett munka alapján."""
+        if audio_sec <= 0 or processing_sec <= 0:
+            return
+        with self._lock:
+            self.rtf = (1 - self.ewma_alpha) * self.rtf + self.ewma_alpha * (processing_sec / audio_sec)
+
+    def stats(self):
+        queued_sec, running = self.scheduler.backlog()
+        with self._lock:
+            return {
+                "rtf": round(self.rtf, 4),
+                "queued_audio_sec": round(queued_sec, 2),
+                "running_audio_sec": round(sum(cost for cost, _ in running), 2),
+                "reserved_audio_sec": round(sum(self._reserved.values()), 2),
+                "max_backlog_audio_sec": self.max_backlog_audio_sec,
+                "max_wait_sec": self.max_wait_sec,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+            }
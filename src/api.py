@@ -1,19 +1,66 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 import os
+import json
 import subprocess
 import threading
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+import uuid
+import time
+import hmac
 from werkzeug.utils import secure_filename
-from .recognition import process_audio  # Updated import
-from .tools import bcolors  # Updated import
-from .audio_utils import convert_to_mp3  # New import
+from .recognition import prepare_samples, run_prepared, process_long_audio, iter_long_audio, recognize_samples
+from .tools import get_logger, elapsed_ms
+from .model_manager import model_manager
+from .audio_utils import decode_audio, decode_to_scratch, probe_duration, ALLOWED_EXTENSIONS
+from .scheduler import JobScheduler, SchedulerTimeout, LANE_INTERACTIVE, LANE_BULK
+from .admission import AdmissionController
+from .settings import get_settings
+from .memory_guard import MemoryGuard, MemoryBudgetError
+from .profiling import profiler, ProfilingError, MODES, MODE_SAMPLE, SUPPORTED_FORMATS
+from .stream_session import StreamSession, StreamBufferOverflow, ENCODINGS, ENCODING_S16LE
 from pydub import AudioSegment
 from werkzeug.serving import WSGIRequestHandler
 
-app = Flask(__name__)
+# WebSocket streaming (opcionális függőség: flask-sock)
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
 
-# Globális lock a feldolgozáshoz
-processing_lock = threading.Lock()
+app = Flask(__name__)
+# Aszinkron naplózás: a kiírás háttérszálon történik, a kérés útját nem blokkolja
+log = get_logger('api')
+
+# Globális ütemező a feldolgozáshoz (SJF + aging, interaktív sávval) a sima lock helyett
+_settings = get_settings()
+scheduler = JobScheduler(
+    aging_rate=_settings.get('scheduler_aging_rate', 1.0),
+    bulk_max_wait_sec=_settings.get('scheduler_bulk_max_wait_sec', 60)
+)
+SCHEDULER_WAIT_TIMEOUT_SEC = _settings.get('scheduler_wait_timeout_sec', 30)
+# Bulk munka csak bulk_max_wait_sec után zárkózik fel, a slot timeout ennél hosszabb kell legyen
+SCHEDULER_BULK_WAIT_TIMEOUT_SEC = scheduler.bulk_max_wait_sec + SCHEDULER_WAIT_TIMEOUT_SEC
+# Stage-ek saját, korlátos worker pool-jai: ingest (feltöltés mentése) és decode (dekódolás,
+# feature extraction). Csak a modell futtatása sorosított (scheduler slot).
+ingest_slots = threading.BoundedSemaphore(_settings.get('ingest_max_concurrent', 8))
+INGEST_WAIT_TIMEOUT_SEC = _settings.get('ingest_wait_timeout_sec', 10)
+decode_pool = ThreadPoolExecutor(max_workers=_settings.get('decode_workers', 2), thread_name_prefix='decode')
+# Költség alapú befogadás: túlterheléskor azonnali elutasítás Retry-After-rel
+admission = AdmissionController(
+    scheduler,
+    max_backlog_audio_sec=_settings.get('admission_max_backlog_audio_sec', 1800),
+    max_wait_sec=_settings.get('admission_max_wait_sec', 60),
+    initial_rtf=_settings.get('admission_initial_rtf', 0.3)
+)
+# Processz szintű memória keret (None = csak mérés) és kérésenkénti csúcsmemória
+memory_guard = MemoryGuard(
+    budget_mb=_settings.get('memory_budget_mb'),
+    defer_timeout_sec=_settings.get('memory_defer_timeout_sec', 10)
+)
+# Egyidejű WebSocket streamek korlátja
+stream_slots = threading.BoundedSemaphore(_settings.get('ws_max_streams', 8))
+sock = Sock(app) if Sock else None
 
 # Get the project root directory (one level up from src)
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -27,37 +74,30 @@ app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 app.config["PROCESSED_FOLDER"] = PROCESSED_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB
 
-# Támogatott hangformátumok
-ALLOWED_EXTENSIONS = {
-    # Tömörített formátumok
-    "mp3", "mp4", "m4a", "aac", "ogg", "wma", "wmv", "flac", "alac",
-    # Nem tömörített formátumok
-    "wav", "aiff", "pcm", "raw",
-    # Webes formátumok
-    "webm", "opus",
-    # Egyéb formátumok
-    "amr", "mid", "midi", "wavpack", "ape", "tta", "ac3", "dts"
-}
-
 WSGIRequestHandler.timeout = 300  # 5 perc
+API_DEBUG = True
+# Csak az ennél régebbi fájlokat töröljük: a futó kérések feltöltései és scratch fájljai maradnak
+UPLOAD_STALE_AGE_SEC = 3600
 
 def cleanup_uploads_directory():
-    """Törli az uploads könyvtár tartalmát"""
+    """Törli az uploads könyvtárból a régi (már egyetlen kéréshez sem tartozó) fájlokat"""
     try:
-        # Töröljük az összes fájlt az uploads könyvtárból
+        cutoff = time.time() - UPLOAD_STALE_AGE_SEC
         for filename in os.listdir(UPLOAD_FOLDER):
             file_path = os.path.join(UPLOAD_FOLDER, filename)
             try:
+                if os.path.getmtime(file_path) > cutoff:
+                    continue
                 if os.path.isfile(file_path):
                     os.remove(file_path)
                 elif os.path.isdir(file_path):
                     shutil.rmtree(file_path)
             except Exception as e:
-                print(f"{bcolors.WARNING}[WARNING] Fájl törlése sikertelen: {file_path} - {str(e)}{bcolors.ENDC}")
+                log.warning("Fájl törlése sikertelen: %s - %s", file_path, e)
         
-        print(f"{bcolors.OKBLUE}[INFO] Uploads könyvtár törölve{bcolors.ENDC}")
+        log.info("Uploads könyvtár régi fájljai törölve")
     except Exception as e:
-        print(f"{bcolors.WARNING}[WARNING] Uploads könyvtár törlése sikertelen: {str(e)}{bcolors.ENDC}")
+        log.warning("Uploads könyvtár törlése sikertelen: %s", e)
 
 def cleanup_files(*files):
     """Törli a megadott fájlokat, ha léteznek"""
@@ -66,9 +106,9 @@ def cleanup_files(*files):
             try:
                 file_size = os.path.getsize(file_path)
                 os.remove(file_path)
-                print(f"{bcolors.OKBLUE}[INFO] Fájl törölve: {file_path} (méret: {file_size} bytes){bcolors.ENDC}")
+                log.info("Fájl törölve: %s (méret: %s bytes)", file_path, file_size)
             except Exception as e:
-                print(f"{bcolors.WARNING}[WARNING] Fájl törlése sikertelen: {file_path} - {str(e)}{bcolors.ENDC}")
+                log.warning("Fájl törlése sikertelen: %s - %s", file_path, e)
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -82,163 +122,468 @@ def before_request():
                     if os.path.isfile(os.path.join(UPLOAD_FOLDER, f)))
     
     if total_size > 1024 * 1024 * 1024:  # 1GB
-        print(f"{bcolors.WARNING}[WARNING] Uploads könyvtár túl nagy ({total_size / (1024*1024*1024):.2f}GB), törlés...{bcolors.ENDC}")
+        log.warning("Uploads könyvtár túl nagy (%.2fGB), törlés...", total_size / (1024*1024*1024))
         cleanup_uploads_directory()
 
-@app.after_request
-def after_request(response):
-    """Minden válasz után futtatjuk"""
-    # Töröljük az uploads könyvtárat
-    cleanup_uploads_directory()
-    return response
+@app.before_request
+def profile_request_start():
+    # Aktív profilozás alatt a felismerési kérések számolása / cProfile a kérés szálán
+    if request.endpoint == "upload_audio":
+        profiler.on_request_start()
+
+@app.teardown_request
+def profile_request_end(exc):
+    if request.endpoint == "upload_audio":
+        profiler.on_request_end()
+
+def estimate_cost_sec(file_path):
+    """
+    A munka becsült költsége az ütemezéshez: a hang hossza másodpercben (csak fejléc olvasás).
+    Ha a hossz nem olvasható ki, a fájlméretből becsülünk (~128 kbps).
+    """
+    duration_sec = probe_duration(file_path)
+    if duration_sec is None:
+        duration_sec = os.path.getsize(file_path) / 16000.0
+    return duration_sec
+
+def estimate_memory_bytes(cost_sec, long_mode):
+    """
+    A kérés becsült memóriaigénye a dekódolás előtt: float32 PCM (16 kHz) szorozva a pipeline
+    másolataival. Hosszú módban csak egy ablak van egyszerre a memóriában.
+    """
+    settings = get_settings()
+    audio_sec = settings.get('long_audio_window_sec', 30) if long_mode else cost_sec
+    return audio_sec * 16000 * 4 * settings.get('memory_overhead_factor', 3)
+
+def reject_memory(error):
+    """413 (önmagában sem fér bele) vagy 503 Retry-After-rel (a keret épp foglalt)"""
+    log.warning("Kérés elutasítva (memória keret): %s", error)
+    if error.too_large:
+        return jsonify({"error": "Audio is too large for the memory budget", "details": str(error)}), 413
+    response = jsonify({"error": "Server is busy, please try again later", "details": str(error)})
+    response.headers["Retry-After"] = str(error.retry_after_sec)
+    return response, 503
+
+def reject_overloaded(decision):
+    """503 válasz a backlog-ból számolt Retry-After header-rel"""
+    log.warning("Kérés elutasítva (túlterhelés): %s, retry after %ss", decision.reason, decision.retry_after_sec)
+    response = jsonify({"error": "Server is busy, please try again later", "admission": decision.to_dict()})
+    response.headers["Retry-After"] = str(decision.retry_after_sec)
+    return response, 503
+
+def release_slot(ticket):
+    """Slot elengedése; a mért feldolgozási idő frissíti a befogadás RTF becslését"""
+    admission.record_completion(ticket.cost_sec, time.monotonic() - ticket.started_at)
+    scheduler.release(ticket)
 
 @app.route("/health", methods=["GET"])
 def health_check():
-    """Egészség ellenőrzés endpoint"""
-    return jsonify({"status": "healthy", "service": "speech-recognition"}), 200
+    """Liveness endpoint: a process él és válaszol (a modell állapotától függetlenül)"""
+    return jsonify({"status": "healthy", "service": "speech-recognition", **model_manager.status_info()}), 200
+
+@app.route("/health/ready", methods=["GET"])
+def readiness_check():
+    """Readiness endpoint: csak betöltött és bemelegített modellnél 200, egyébként 503"""
+    info = model_manager.status_info()
+    if model_manager.is_ready():
+        return jsonify({"status": "ready", "service": "speech-recognition", **info}), 200
+    return jsonify({"status": "not_ready", "service": "speech-recognition", **info}), 503
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Ütemező metrikák: sor hossza és várakozási idők sávonként"""
+    return jsonify({
+        "scheduler": scheduler.stats(),
+        "admission": admission.stats(),
+        "memory": memory_guard.stats(),
+    }), 200
+
+def debug_authorized():
+    """Debug endpoint hitelesítés: X-Debug-Token vagy Authorization: Bearer header a beállított tokennel"""
+    token = get_settings().get('debug_profiling_token')
+    if not token:
+        return False
+    supplied = request.headers.get("X-Debug-Token", "")
+    authorization = request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        supplied = authorization[len("Bearer "):]
+    return hmac.compare_digest(supplied.encode("utf-8"), str(token).encode("utf-8"))
+
+@app.route("/debug/profile", methods=["POST"])
+def debug_profile():
+    """
+    Élő process profilozása újraindítás nélkül (alapból kikapcsolva).
+    Paraméterek: mode=sample|cprofile|tracemalloc, seconds=N, requests=N (ennyi felismerés után leáll),
+    format=collapsed|pstats|text. A válasz a profil fájl.
+    """
+    settings = get_settings()
+    # Kikapcsolt állapotban nem fedjük fel, hogy az endpoint létezik
+    if not settings.get('debug_profiling_enabled', False):
+        return jsonify({"error": "Not found"}), 404
+    if not debug_authorized():
+        log.warning("Jogosulatlan profilozási kérés: %s", request.remote_addr)
+        return jsonify({"error": "Unauthorized"}), 401
+
+    mode = request.args.get("mode", MODE_SAMPLE)
+    if mode not in MODES:
+        return jsonify({"error": f"Unknown mode: {mode}", "modes": list(MODES)}), 400
+    fmt = request.args.get("format")
+    if fmt and fmt not in SUPPORTED_FORMATS[mode]:
+        return jsonify({"error": f"Format {fmt} is not supported for {mode}", "formats": list(SUPPORTED_FORMATS[mode])}), 400
+    try:
+        max_seconds = settings.get('debug_profiling_max_sec', 120)
+        seconds = min(float(request.args.get("seconds", 10)), max_seconds)
+        requests_limit = int(request.args["requests"]) if "requests" in request.args else None
+        interval_sec = float(request.args.get("interval_ms", 5)) / 1000.0
+    except ValueError:
+        return jsonify({"error": "Invalid numeric parameter"}), 400
 
-@app.route("/recognition", methods=["POST"])
-def upload_audio():
-    print(f"{bcolors.OKBLUE}[INFO] Új bejövő kérés...{bcolors.ENDC}")
-    
-    # Várjuk meg, amíg a lock felszabadul
-    if not processing_lock.acquire(blocking=True, timeout=30):  # 30 másodperc timeout
-        print(f"{bcolors.FAIL}[ERROR] Időtúllépés a feldolgozás várakozásakor{bcolors.ENDC}")
-        return jsonify({"error": "Server is busy, please try again later"}), 503
+    try:
+        session = profiler.run(mode, seconds, requests=requests_limit, interval_sec=interval_sec)
+        body, mimetype, filename = session.render(fmt)
+    except ProfilingError as e:
+        return jsonify({"error": str(e)}), 409
+    response = Response(body, mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    response.headers["X-Profile-Summary"] = json.dumps(session.summary())
+    return response
 
+def ingest_upload():
+    """
+    Ingest stage: a kérés body-jának ellenőrzése és mentése egyedi nevű fájlba.
+    Visszaad egy (file_path, None) párt, vagy hiba esetén (None, (response, status_code)).
+    """
     file_path = None
-    converted_path = None
+    # A body-t nem olvassuk be memóriába (get_data másolat), csak a méretét naplózzuk
+    log.debug("Raw data size: %s bytes", request.content_length)
 
-    try:
-        raw_data = request.get_data()
-        print(f"{bcolors.OKBLUE}[INFO] Raw data size: {len(raw_data)} bytes{bcolors.ENDC}")
+    if "audio" in request.files:
+        log.debug("Fájl fogadása FormData módban...")
+        file = request.files["audio"]
 
-        if "audio" in request.files:
-            print(f"{bcolors.OKCYAN}[INFO] Fájl fogadása FormData módban...{bcolors.ENDC}")
-            file = request.files["audio"]
+        # Content type ellenőrzés
+        content_type = file.content_type
+        log.debug("Content-Type: %s", content_type)
 
-            # Content type ellenőrzés
-            content_type = file.content_type
-            print(f"{bcolors.OKBLUE}[INFO] Content-Type: {content_type}{bcolors.ENDC}")
-            
-            if not content_type or not (content_type.startswith('audio/') or content_type == 'application/octet-stream'):
-                print(f"{bcolors.FAIL}[ERROR] Érvénytelen content type: {content_type}{bcolors.ENDC}")
-                return jsonify({"error": f"Invalid content type: {content_type}"}), 400
+        if not content_type or not (content_type.startswith('audio/') or content_type == 'application/octet-stream'):
+            log.error("Érvénytelen content type: %s", content_type)
+            return None, (jsonify({"error": f"Invalid content type: {content_type}"}), 400)
 
-            if file.filename == "":
-                print(f"{bcolors.FAIL}[ERROR] Nincs fájlnév megadva{bcolors.ENDC}")
-                return jsonify({"error": "No selected file"}), 400
+        if file.filename == "":
+            log.error("Nincs fájlnév megadva")
+            return None, (jsonify({"error": "No selected file"}), 400)
 
-            if not allowed_file(file.filename):
-                print(f"{bcolors.FAIL}[ERROR] Nem támogatott fájlformátum: {file.filename}{bcolors.ENDC}")
-                return jsonify({"error": f"File format not supported. Allowed formats: {', '.join(ALLOWED_EXTENSIONS)}"}), 400
+        if not allowed_file(file.filename):
+            log.error("Nem támogatott fájlformátum: %s", file.filename)
+            return None, (jsonify({"error": f"File format not supported. Allowed formats: {', '.join(ALLOWED_EXTENSIONS)}"}), 400)
 
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
+        # Egyedi név, mert a feltöltés már párhuzamosan, az ütemezőn kívül történik
+        filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
+        file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
 
-            print(f"{bcolors.WARNING}[INFO] Várakozás a fájl feltöltésére: {filename}{bcolors.ENDC}")
-            file.save(file_path)
+        log.debug("Várakozás a fájl feltöltésére: %s", filename)
+        file.save(file_path)
 
-            if not os.path.exists(file_path):
-                print(f"{bcolors.FAIL}[ERROR] Fájl mentése sikertelen: {file_path}{bcolors.ENDC}")
-                return jsonify({"error": "Failed to save file"}), 500
+        if not os.path.exists(file_path):
+            log.error("Fájl mentése sikertelen: %s", file_path)
+            return None, (jsonify({"error": "Failed to save file"}), 500)
 
-            if os.path.getsize(file_path) == 0:
-                cleanup_files(file_path)
-                print(f"{bcolors.FAIL}[ERROR] Feltöltött fájl üres!{bcolors.ENDC}")
-                return jsonify({"error": "Uploaded file is empty"}), 400
+        if os.path.getsize(file_path) == 0:
+            cleanup_files(file_path)
+            log.error("Feltöltött fájl üres!")
+            return None, (jsonify({"error": "Uploaded file is empty"}), 400)
 
-            print(f"{bcolors.OKGREEN}[SUCCESS] Fájl mentve: {file_path} ({os.path.getsize(file_path)} bytes){bcolors.ENDC}")
+        log.debug("Fájl mentve: %s", file_path)
 
-        elif request.data:
-            print(f"{bcolors.OKCYAN}[INFO] Nyers bináris adat érkezett...{bcolors.ENDC}")
-            
-            content_type = request.headers.get('Content-Type', '')
-            print(f"{bcolors.OKBLUE}[INFO] Content-Type: {content_type}{bcolors.ENDC}")
+    # Chunked feltöltésnél nincs Content-Length, a body mégis jelen van
+    elif request.content_length or request.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+        log.debug("Nyers bináris adat érkezett...")
 
-            if not content_type or not (content_type.startswith('audio/') or content_type == 'application/octet-stream'):
-                print(f"{bcolors.FAIL}[ERROR] Érvénytelen content type: {content_type}{bcolors.ENDC}")
-                return jsonify({"error": f"Invalid content type: {content_type}"}), 400
+        content_type = request.headers.get('Content-Type', '')
+        log.debug("Content-Type: %s", content_type)
 
-            filename = request.headers.get("Filename", "uploaded_audio.mp3")
-            if not allowed_file(filename):
-                print(f"{bcolors.FAIL}[ERROR] Nem támogatott fájlformátum: {filename}{bcolors.ENDC}")
-                return jsonify({"error": f"File format not supported. Allowed formats: {', '.join(ALLOWED_EXTENSIONS)}"}), 400
+        if not content_type or not (content_type.startswith('audio/') or content_type == 'application/octet-stream'):
+            log.error("Érvénytelen content type: %s", content_type)
+            return None, (jsonify({"error": f"Invalid content type: {content_type}"}), 400)
 
-            file_path = os.path.join(app.config["UPLOAD_FOLDER"], secure_filename(filename))
+        filename = request.headers.get("Filename", "uploaded_audio.mp3")
+        if not allowed_file(filename):
+            log.error("Nem támogatott fájlformátum: %s", filename)
+            return None, (jsonify({"error": f"File format not supported. Allowed formats: {', '.join(ALLOWED_EXTENSIONS)}"}), 400)
 
-            with open(file_path, "wb") as f:
-                f.write(request.data)
+        file_path = os.path.join(app.config["UPLOAD_FOLDER"], f"{uuid.uuid4().hex}_{secure_filename(filename)}")
 
-            if not os.path.exists(file_path):
-                print(f"{bcolors.FAIL}[ERROR] Fájl mentése sikertelen: {file_path}{bcolors.ENDC}")
-                return jsonify({"error": "Failed to save file"}), 500
+        # Streamelve írjuk ki, hogy a teljes body ne legyen egyszerre a memóriában
+        with open(file_path, "wb") as f:
+            shutil.copyfileobj(request.stream, f, 1024 * 1024)
 
-            if os.path.getsize(file_path) == 0:
-                cleanup_files(file_path)
-                print(f"{bcolors.FAIL}[ERROR] Nyers bináris fájl üres!{bcolors.ENDC}")
-                return jsonify({"error": "Binary upload is empty"}), 400
+        if not os.path.exists(file_path):
+            log.error("Fájl mentése sikertelen: %s", file_path)
+            return None, (jsonify({"error": "Failed to save file"}), 500)
 
-            print(f"{bcolors.OKGREEN}[SUCCESS] Nyers adat mentve: {file_path} ({os.path.getsize(file_path)} bytes){bcolors.ENDC}")
+        if os.path.getsize(file_path) == 0:
+            cleanup_files(file_path)
+            log.error("Nyers bináris fájl üres!")
+            return None, (jsonify({"error": "Binary upload is empty"}), 400)
 
-        else:
-            print(f"{bcolors.FAIL}[ERROR] Nincs érvényes audio adat{bcolors.ENDC}")
-            return jsonify({"error": "No audio data found"}), 400
+        log.debug("Nyers adat mentve: %s", file_path)
+
+    else:
+        log.error("Nincs érvényes audio adat")
+        return None, (jsonify({"error": "No audio data found"}), 400)
 
-        # **MP3 Konverzió**
-        if file_path and not file_path.endswith(".mp3"):
-            print(f"{bcolors.OKBLUE}[INFO] Konvertálás kezdése: {file_path}{bcolors.ENDC}")
-            converted_path = convert_to_mp3(file_path, app.config["PROCESSED_FOLDER"])
+    return file_path, None
 
-            if converted_path is None:
-                cleanup_files(file_path)
-                print(f"{bcolors.FAIL}[ERROR] MP3 konvertálás sikertelen!{bcolors.ENDC}")
-                return jsonify({"error": "Failed to convert audio"}), 500
+@app.route("/recognition", methods=["POST"])
+def upload_audio():
+    started = time.perf_counter()
+    log.debug("Új bejövő kérés...")
+    # Amíg a modell töltődik/bemelegszik, nem várakoztatjuk a kérést
+    if not model_manager.is_ready():
+        log.warning("A modell még nem áll készen: %s", model_manager.status)
+        response = jsonify({"error": "Model is not ready", **model_manager.status_info()})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+    # Előzetes befogadás: ha a backlog már most túl nagy, a body beolvasása előtt elutasítunk
+    decision = admission.check()
+    if not decision.admitted:
+        return reject_overloaded(decision)
+    # Kliens hint a modell tier-hez ('fast' / 'accurate'), header vagy query paraméter
+    model_hint = request.headers.get("X-Model-Tier") or request.args.get("model_tier")
+    # Késleltetés-érzékeny kliensek külön sávja (header vagy query paraméter)
+    lane = request.headers.get("X-Priority") or request.args.get("lane") or LANE_BULK
+    if lane not in (LANE_INTERACTIVE, LANE_BULK):
+        lane = LANE_BULK
 
-            file_path = converted_path
+    file_path = None
+    scratch_path = None
+    ticket = None
+    memory_entry = None
+    # Streaming válasznál a slot-ot a válasz lezárása engedi el
+    slot_handed_off = False
 
-        print(f"{bcolors.OKGREEN}[SUCCESS] File processed: {file_path}{bcolors.ENDC}")
-        # A hangfájl feldolgozása egy másik fájlban történik
-        print(f"{bcolors.OKBLUE}[INFO] Starting audio processing...{bcolors.ENDC}")
+    try:
+        # **Ingest stage**: korlátozott számú párhuzamos feltöltés mentése
+        if not ingest_slots.acquire(timeout=INGEST_WAIT_TIMEOUT_SEC):
+            log.error("Túl sok párhuzamos feltöltés")
+            return jsonify({"error": "Server is busy, please try again later"}), 503
         try:
-            result = process_audio(file_path)
-            print(f"{bcolors.OKBLUE}[INFO] Audio processing result: {result}{bcolors.ENDC}")
-        except Exception as e:
-            print(f"{bcolors.FAIL}[ERROR] Audio processing failed: {str(e)}{bcolors.ENDC}")
-            import traceback
-            print(f"{bcolors.FAIL}[ERROR] Stack trace: {traceback.format_exc()}{bcolors.ENDC}")
-            return jsonify({"error": "Audio processing failed", "details": str(e), "traceback": traceback.format_exc()}), 500
+            file_path, error_response = ingest_upload()
+        finally:
+            ingest_slots.release()
+        if error_response:
+            return error_response
+
+        cost_sec = estimate_cost_sec(file_path)
+        # Foglalás a befogadástól az ütemezőbe kerülésig (közben ingest / memória / decode stage)
+        decision = admission.check(cost_sec, reserve=True)
+        if not decision.admitted:
+            cleanup_files(file_path)
+            return reject_overloaded(decision)
+
+        stream = request.args.get("stream") in ("1", "true")
+        long_mode = stream or cost_sec > get_settings().get('long_audio_threshold_sec', 600)
+        # Memória keret: a becsült dekódolt méret a betöltés előtt foglalódik le
+        try:
+            memory_entry = memory_guard.reserve(os.path.basename(file_path), estimate_memory_bytes(cost_sec, long_mode))
+        except MemoryBudgetError as e:
+            return reject_memory(e)
 
-        # Sikeres feldolgozás után töröljük a fájlokat
-        print(f"{bcolors.OKBLUE}[INFO] Feldolgozás befejezve, fájlok törlése...{bcolors.ENDC}")
+        # **Decode stage**: dekódolás és feature extraction a decode pool-on, az inference slot-on kívül
+        try:
+            prepared = decode_pool.submit(
+                decode_stage, file_path, long_mode, model_hint, scheduler.queue_length()
+            ).result()
+        except Exception as e:
+            log.error("Dekódolás sikertelen: %s", e)
+            return jsonify({"error": "Failed to decode audio", "details": str(e)}), 400
+        # A feltöltött fájlra a dekódolás után már nincs szükség
         cleanup_files(file_path)
-        if converted_path and converted_path != file_path:
-            cleanup_files(converted_path)
-        
-        # Töröljük az uploads könyvtárat is
-        cleanup_uploads_directory()
+        scratch_path = prepared.get("scratch_path")
+
+        # **Inference stage**: a becsült költség (hang hossza) alapján SJF sorrendben kapunk slot-ot
+        log.debug("Várakozás slot-ra: %.1fs becsült költség, sáv: %s, becsült várakozás: %.1fs",
+                  cost_sec, lane, decision.estimated_wait_sec)
+        try:
+            # A befogadott kérés a becsült várakozásának többszöröséig várhat
+            base_timeout = SCHEDULER_BULK_WAIT_TIMEOUT_SEC if lane == LANE_BULK else SCHEDULER_WAIT_TIMEOUT_SEC
+            wait_timeout = max(base_timeout, decision.estimated_wait_sec * 2)
+            # Innentől az ütemező backlog-ja számolja a munkát
+            admission.release(decision)
+            ticket = scheduler.acquire(cost_sec, lane=lane, timeout=wait_timeout)
+        except SchedulerTimeout:
+            log.error("Időtúllépés a feldolgozás várakozásakor")
+            return jsonify({"error": "Server is busy, please try again later"}), 503
+        queue_load = scheduler.queue_length()
+
+        # **Streaming mód**: hosszú felvételek szegmensenként, NDJSON-ként, állandó memóriával
+        if stream:
+            response = Response(
+                stream_with_context(stream_long_audio(file_path, scratch_path, model_hint, queue_load)),
+                mimetype="application/x-ndjson"
+            )
+            # A slot-ot és a scratch fájlt a válasz lezárásakor engedjük el (kliens bontáskor is lefut)
+            stream_ticket = ticket
+            stream_scratch_path = scratch_path
+            stream_memory_entry = memory_entry
+            response.call_on_close(lambda: finish_stream(stream_scratch_path, stream_ticket, stream_memory_entry))
+            slot_handed_off = True
+            return response
+
+        log.debug("Starting audio processing...")
+        if long_mode:
+            result = process_long_audio(file_path, hint=model_hint, queue_load=queue_load, scratch_path=scratch_path)
+        else:
+            result = run_prepared(prepared, file_path=file_path)
+        # A teljes eredmény (chunk listákkal) csak debug szinten; egyébként egy összefoglaló sor
+        log.debug("Audio processing result: %s", result)
+        log.info("Kérés kész", status=result.get("status"), audio_sec=round(cost_sec, 2), lane=lane,
+                 tier=(result.get("routing") or {}).get("tier"), total_ms=elapsed_ms(started))
 
         return jsonify(result)
 
     except Exception as e:
-        # Hiba esetén is töröljük a fájlokat
-        print(f"{bcolors.FAIL}[ERROR] Váratlan hiba történt, fájlok törlése...{bcolors.ENDC}")
-        cleanup_files(file_path)
-        if converted_path and converted_path != file_path:
-            cleanup_files(converted_path)
-        
-        # Töröljük az uploads könyvtárat is
-        cleanup_uploads_directory()
-            
-        print(f"{bcolors.FAIL}[ERROR] Váratlan hiba: {str(e)}{bcolors.ENDC}")
-        import traceback
-        print(f"{bcolors.FAIL}[ERROR] Stack trace: {traceback.format_exc()}{bcolors.ENDC}")
+        log.exception("Váratlan hiba: %s", e)
         return jsonify({"error": "Unexpected server error", "details": str(e)}), 500
     finally:
-        # Mindenképpen felszabadítjuk a lock-ot
-        processing_lock.release()
-        print(f"{bcolors.OKBLUE}[INFO] Feldolgozás befejezve, lock felszabadítva{bcolors.ENDC}")
+        # Hiba esetén is töröljük a fájlokat (streaming esetén a scratch-et a válasz lezárása törli)
+        cleanup_files(file_path)
+        admission.release(decision)
+        if not slot_handed_off:
+            cleanup_files(scratch_path)
+            memory_guard.release(memory_entry)
+        # Mindenképpen felszabadítjuk a slot-ot (streaming esetén a válasz lezárása teszi meg)
+        if ticket and not slot_handed_off:
+            release_slot(ticket)
+            log.debug("Feldolgozás befejezve, slot felszabadítva")
+
+
+def decode_stage(file_path, long_mode, model_hint, queue_load):
+    """
+    Decode stage (decode pool-on fut): hosszú módban 16 kHz-es PCM scratch fájlba dekódol,
+    egyébként numpy mintákká, és elvégzi a feature extraction-t is.
+    """
+    if long_mode:
+        log.debug("Hosszú mód: dekódolás scratch fájlba...")
+        return {"scratch_path": decode_to_scratch(file_path, scratch_dir=app.config["PROCESSED_FOLDER"])}
+    return prepare_samples(decode_audio(file_path), hint=model_hint, queue_load=queue_load)
+
+
+def stream_long_audio(file_path, scratch_path, model_hint, queue_load):
+    """
+    NDJSON generator: soronként egy routing, több segment, végül egy done (vagy error) esemény.
+    """
+    try:
+        for item in iter_long_audio(file_path, hint=model_hint, queue_load=queue_load, scratch_path=scratch_path):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+        yield json.dumps({"type": "done", "status": "processed"}) + "\n"
+    except Exception as e:
+        log.error("Streaming feldolgozás sikertelen: %s", e)
+        yield json.dumps({"type": "error", "status": "failed", "error": str(e), "error_type": type(e).__name__}) + "\n"
+
+
+def finish_stream(scratch_path, ticket, memory_entry=None):
+    """A streaming válasz lezárásakor fut: scratch fájl törlése, a slot és a memória foglalás elengedése"""
+    cleanup_files(scratch_path)
+    release_slot(ticket)
+    memory_guard.release(memory_entry)
+    log.info("Streaming befejezve, slot felszabadítva")
+
+
+def recognize_stream_window(samples, model_hint):
+    """Egy stream ablak felismerése az interaktív sávban, a fájlos kérésekkel közös ütemezőn"""
+    cost_sec = len(samples) / 16000.0
+    ticket = scheduler.acquire(cost_sec, lane=LANE_INTERACTIVE, timeout=SCHEDULER_WAIT_TIMEOUT_SEC)
+    try:
+        return recognize_samples(samples, hint=model_hint, queue_load=scheduler.queue_length())
+    finally:
+        release_slot(ticket)
+
+def stream_recognition(ws):
+    """
+    WebSocket streaming felismerés. A kliens bináris üzenetekben PCM frame-eket küld
+    (query: sample_rate, encoding=s16le|f32le, model_tier), a végén egy {"type": "end"} szöveges üzenetet.
+    A szerver JSON eseményeket küld: partial (a nyitott ablak aktuális szövege), final (lezárt ablak),
+    done vagy error.
+    """
+    settings = get_settings()
+    send_lock = threading.Lock()
+
+    def send(event):
+        with send_lock:
+            ws.send(json.dumps(event, ensure_ascii=False))
+
+    if not model_manager.is_ready():
+        send({"type": "error", "error": "Model is not ready", **model_manager.status_info()})
+        ws.close(reason=1013, message="Model is not ready")
+        return
+    try:
+        sampling_rate = int(request.args.get("sample_rate", 16000))
+    except ValueError:
+        sampling_rate = 0
+    encoding = request.args.get("encoding", ENCODING_S16LE)
+    if sampling_rate <= 0 or encoding not in ENCODINGS:
+        send({"type": "error", "error": f"Invalid stream format (sample_rate, encoding: {', '.join(ENCODINGS)})"})
+        ws.close(reason=1003, message="Invalid stream format")
+        return
+    if not stream_slots.acquire(blocking=False):
+        log.warning("Stream elutasítva: elérte a %s egyidejű stream korlátot", settings.get('ws_max_streams', 8))
+        send({"type": "error", "error": "Too many concurrent streams, please try again later"})
+        ws.close(reason=1013, message="Too many concurrent streams")
+        return
+
+    model_hint = request.args.get("model_tier")
+    max_frame_bytes = settings.get('ws_max_frame_bytes', 256 * 1024)
+    session = StreamSession(
+        send,
+        lambda samples: recognize_stream_window(samples, model_hint),
+        sampling_rate=sampling_rate,
+        encoding=encoding,
+        window_sec=settings.get('ws_window_sec', 15),
+        partial_step_sec=settings.get('ws_partial_step_sec', 1.0),
+        max_buffer_sec=settings.get('ws_max_buffer_sec', 60),
+        # Ha várakozik munka az ütemezőben, a partial-okat kihagyjuk (a final-ok késleltetése korlátos marad)
+        is_busy=lambda: scheduler.queue_length() > 0
+    )
+    log.info("Stream megnyitva: %s Hz %s", sampling_rate, encoding)
+    session.start()
+    finished = False
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                break
+            if isinstance(message, str):
+                try:
+                    control = json.loads(message)
+                except ValueError:
+                    control = {}
+                if control.get("type") == "end":
+                    session.finish()
+                    finished = True
+                    break
+                continue
+            if len(message) > max_frame_bytes:
+                raise StreamBufferOverflow(f"Frame larger than {max_frame_bytes} bytes")
+            session.push(message)
+    except StreamBufferOverflow as e:
+        log.warning("Stream lezárva: %s", e)
+        send({"type": "error", "error": str(e), "error_type": type(e).__name__})
+    except Exception as e:
+        # Kliens bontás (ConnectionClosed) vagy feldolgozási hiba
+        log.warning("Stream megszakadt: %s", e)
+    finally:
+        if not finished:
+            session.close()
+        stream_slots.release()
+        log.info("Stream lezárva")
 
+if sock:
+    sock.route("/recognition/ws")(stream_recognition)
 
 def start_api():
-    app.run(port=38321, debug=True)
+    # A modellek háttérben töltődnek és melegednek be, a /health/ready addig 503-at ad.
+    # debug módban a werkzeug reloader egy figyelő processt is indít, abban nem töltünk modellt.
+    if not API_DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        model_manager.start_background_load()
+    app.run(port=38321, debug=API_DEBUG)
@@ -1,8 +1,35 @@
+import io
+import math
 import os
+import struct
 import subprocess
+import tempfile
+import wave
+import numpy as np
 from pydub import AudioSegment
 from .tools import bcolors
 
+# Opcionális: polyphase resampler (pontosabb a beépített szűrő + lineáris interpolációnál)
+try:
+    from scipy.signal import resample_poly
+except ImportError:
+    resample_poly = None
+
+# Támogatott hangformátumok
+ALLOWED_EXTENSIONS = {
+    # Tömörített formátumok
+    "mp3", "mp4", "m4a", "aac", "ogg", "wma", "wmv", "flac", "alac",
+    # Nem tömörített formátumok
+    "wav", "aiff", "pcm", "raw",
+    # Webes formátumok
+    "webm", "opus",
+    # Egyéb formátumok
+    "amr", "mid", "midi", "wavpack", "ape", "tta", "ac3", "dts"
+}
+
+# A Whisper modellek 16 kHz mono bemenetet várnak
+TARGET_SAMPLE_RATE = 16000
+
 def convert_to_mp3(input_path, output_dir):
     """
     Konvertálja a bemeneti hangfájlt MP3 formátumra.
@@ -95,4 +122,512 @@ def convert_to_mp3(input_path, output_dir):
 
     except Exception as e:
         print(f"{bcolors.FAIL}[ERROR] Váratlan hiba a konvertálás során: {str(e)}{bcolors.ENDC}")
-        return None 
\ No newline at end of file
+        return None 
+
+# Formátum felismerés a fájl elejéből (magic bytes), a kiterjesztéstől függetlenül
+NATIVE_BLOCK_SEC = 30
+_FILTER_CONTEXT = 32  # A resample szűrő (63 tap) fél hossza + 1, a blokkhatárokhoz
+
+
+def detect_format(input_path):
+    """
+    A fájl első bájtjai alapján felismert konténer: 'wav', 'aiff', 'flac', 'ogg', 'mp3', 'mp4',
+    'webm', vagy None, ha ismeretlen.
+    """
+    try:
+        with open(input_path, 'rb') as f:
+            head = f.read(12)
+    except OSError:
+        return None
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'wav'
+    if head[:4] == b'FORM' and head[8:12] in (b'AIFF', b'AIFC'):
+        return 'aiff'
+    if head[:4] == b'fLaC':
+        return 'flac'
+    if head[:4] == b'OggS':
+        return 'ogg'
+    if head[:4] == b'\x1aE\xdf\xa3':
+        return 'webm'
+    if head[4:8] == b'ftyp':
+        return 'mp4'
+    if head[:3] == b'ID3' or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return 'mp3'
+    return None
+
+
+def _extended_to_float(data):
+    """AIFF 80 bites IEEE extended (mintavételi frekvencia) -> float."""
+    exponent = ((data[0] & 0x7F) << 8) | data[1]
+    mantissa = int.from_bytes(data[2:10], 'big')
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    value = mantissa * 2.0 ** (exponent - 16383 - 63)
+    return -value if data[0] & 0x80 else value
+
+
+class _PcmReader:
+    """
+    Nem tömörített PCM (WAV / AIFF) olvasása közvetlenül a fájlból, blokkonként.
+    Csak a fejlécet értelmezi; a mintákat a read() olvassa be és alakítja mono float32-vé.
+    """
+
+    def __init__(self, path, rate, channels, bits, sample_kind, big_endian, data_offset, data_size):
+        self.path = path
+        self.rate = rate
+        self.channels = channels
+        self.bits = bits
+        self.sample_kind = sample_kind  # 'int' vagy 'float'
+        self.big_endian = big_endian
+        self.data_offset = data_offset
+        self.frame_bytes = channels * (bits // 8)
+        # Streamelve írt fájlokban a méret mező hibás lehet: a tényleges fájlméretre vágjuk
+        available = max(0, os.path.getsize(path) - data_offset)
+        size = available if data_size is None else min(data_size, available)
+        self.frames = size // self.frame_bytes if self.frame_bytes else 0
+        if self.rate <= 0 or self.channels <= 0 or self._dtype() is None and bits != 24:
+            raise ValueError(f"Unsupported PCM layout: {sample_kind} {bits} bit, {channels} ch, {rate} Hz")
+
+    def _dtype(self):
+        order = '>' if self.big_endian else '<'
+        if self.sample_kind == 'float':
+            return {32: order + 'f4', 64: order + 'f8'}.get(self.bits)
+        if self.bits == 8:
+            # WAV 8 bit előjel nélküli, AIFF 8 bit előjeles
+            return 'i1' if self.big_endian else 'u1'
+        return {16: order + 'i2', 32: order + 'i4'}.get(self.bits)
+
+    def read(self, start, count):
+        count = max(0, min(count, self.frames - start))
+        with open(self.path, 'rb') as f:
+            f.seek(self.data_offset + start * self.frame_bytes)
+            raw = f.read(count * self.frame_bytes)
+        count = len(raw) // self.frame_bytes
+        raw = raw[:count * self.frame_bytes]
+        if self.bits == 24:
+            data = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+            if self.big_endian:
+                data = data[:, ::-1]
+            values = data[:, 0] | (data[:, 1] << 8) | (data[:, 2] << 16)
+            samples = (values - ((values & 0x800000) << 1)).astype(np.float32) / 8388608.0
+        else:
+            samples = np.frombuffer(raw, dtype=self._dtype())
+            if self.sample_kind == 'float':
+                samples = samples.astype(np.float32)
+            elif self.bits == 8 and not self.big_endian:
+                samples = (samples.astype(np.float32) - 128.0) / 128.0
+            else:
+                samples = samples.astype(np.float32) / float(2 ** (self.bits - 1))
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        return samples.astype(np.float32, copy=False)
+
+    def close(self):
+        pass
+
+
+def _open_wav(path):
+    with open(path, 'rb') as f:
+        f.seek(12)
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError("WAV data chunk not found")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = f.read(size)
+                if size % 2:
+                    f.seek(1, os.SEEK_CUR)
+            elif chunk_id == b'data':
+                if fmt is None or len(fmt) < 16:
+                    raise ValueError("WAV fmt chunk missing before data")
+                data_offset = f.tell()
+                break
+            else:
+                f.seek(size + size % 2, os.SEEK_CUR)
+    tag, channels, rate, _, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if tag == 0xFFFE and len(fmt) >= 26:
+        # WAVE_FORMAT_EXTENSIBLE: a valódi formátum az al-formátum GUID első két bájtja
+        tag = struct.unpack('<H', fmt[24:26])[0]
+    if tag not in (1, 3):
+        raise ValueError(f"WAV format tag {tag} is not plain PCM")
+    # 0xFFFFFFFF: streamelt / túl nagy fájl, a tényleges méretet használjuk
+    data_size = None if size == 0xFFFFFFFF or size == 0 else size
+    return _PcmReader(path, rate, channels, bits, 'float' if tag == 3 else 'int', False, data_offset, data_size)
+
+
+def _open_aiff(path):
+    with open(path, 'rb') as f:
+        is_aifc = f.read(12)[8:12] == b'AIFC'
+        comm = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError("AIFF SSND chunk not found")
+            chunk_id, size = struct.unpack('>4sI', header)
+            if chunk_id == b'COMM':
+                comm = f.read(size)
+                if size % 2:
+                    f.seek(1, os.SEEK_CUR)
+            elif chunk_id == b'SSND':
+                if comm is None or len(comm) < 18:
+                    raise ValueError("AIFF COMM chunk missing before SSND")
+                offset, _ = struct.unpack('>II', f.read(8))
+                data_offset = f.tell() + offset
+                data_size = size - 8 - offset
+                break
+            else:
+                f.seek(size + size % 2, os.SEEK_CUR)
+    channels, frames, bits = struct.unpack('>HIH', comm[:8])
+    rate = int(round(_extended_to_float(comm[8:18])))
+    compression = comm[18:22] if is_aifc and len(comm) >= 22 else b'NONE'
+    if compression == b'NONE':
+        kind, big_endian = 'int', True
+    elif compression == b'sowt':
+        kind, big_endian = 'int', False
+    elif compression in (b'fl32', b'FL32', b'fl64', b'FL64'):
+        kind, big_endian = 'float', True
+        bits = 64 if compression.lower() == b'fl64' else 32
+    else:
+        raise ValueError(f"AIFF-C compression {compression!r} is not supported natively")
+    reader = _PcmReader(path, rate, channels, bits, kind, big_endian, data_offset, data_size)
+    reader.frames = min(reader.frames, frames)
+    return reader
+
+
+class _SoundfileReader:
+    """FLAC olvasás a soundfile (libsndfile) csomaggal, ha telepítve van"""
+
+    def __init__(self, path):
+        import soundfile
+        self._file = soundfile.SoundFile(path)
+        self.rate = self._file.samplerate
+        self.channels = self._file.channels
+        self.frames = self._file.frames
+
+    def read(self, start, count):
+        self._file.seek(start)
+        samples = self._file.read(count, dtype='float32', always_2d=True)
+        return samples.mean(axis=1).astype(np.float32, copy=False)
+
+    def close(self):
+        self._file.close()
+
+
+def _open_native(input_path):
+    """
+    Natív (ffmpeg nélküli) olvasó a felismert formátumhoz, vagy None, ha a formátumot
+    ffmpeg-nek kell dekódolnia (tömörített, egzotikus, vagy hiányzik az opcionális csomag).
+    """
+    kind = detect_format(input_path)
+    try:
+        if kind == 'wav':
+            return _open_wav(input_path)
+        if kind == 'aiff':
+            return _open_aiff(input_path)
+        if kind == 'flac':
+            return _SoundfileReader(input_path)
+    except ImportError:
+        return None
+    except Exception as e:
+        print(f"{bcolors.OKBLUE}[INFO] Natív dekódolás nem lehetséges ({kind}): {str(e)}, ffmpeg használata{bcolors.ENDC}")
+    return None
+
+
+def _iter_native_blocks(reader, sampling_rate):
+    """
+    A natív olvasó mintáit blokkonként (NATIVE_BLOCK_SEC) adja vissza a cél frekvencián.
+    A blokkok egész másodpercnyi bemenetet fednek le, így a kimeneti minták pozíciói egyeznek
+    a teljes tömbön futtatott resample()-éval; a szűrőhöz a szomszédos mintákat is beolvassa.
+    """
+    block = NATIVE_BLOCK_SEC * reader.rate
+    total_out = int(reader.frames * sampling_rate / reader.rate)
+    polyphase = resample_poly is not None and reader.rate != sampling_rate
+    if polyphase:
+        up, down = _poly_factors(reader.rate, sampling_rate)
+        # A szűrő fél hossza bemeneti mintákban, a down többszörösére kerekítve: így a blokk
+        # első kimeneti mintája egész pozícióra esik, és a blokkhatáron nincs fáziseltolódás
+        context = down * -(-(10 * max(up, down) // up + 2) // down)
+    else:
+        context = _FILTER_CONTEXT
+    for start in range(0, reader.frames, block):
+        if reader.rate == sampling_rate:
+            yield reader.read(start, block)
+            continue
+        lo = max(0, start - context)
+        hi = min(reader.frames, start + block + context)
+        samples = reader.read(lo, hi - lo)
+        if polyphase:
+            out = resample_poly(samples, up, down)
+            offset = lo * up // down
+            out_start = start * sampling_rate // reader.rate
+            out_end = min(total_out, (start + block) * sampling_rate // reader.rate)
+            yield out[out_start - offset:out_end - offset].astype(np.float32)
+            continue
+        if sampling_rate < reader.rate:
+            samples = _lowpass(samples, reader.rate, sampling_rate)
+        out_start = start * sampling_rate // reader.rate
+        out_end = min(total_out, (start + block) * sampling_rate // reader.rate)
+        positions = np.arange(out_start, out_end) * (reader.rate / float(sampling_rate)) - lo
+        yield np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def _native_duration(input_path):
+    """Hossz csak a fejlécből (WAV / AIFF / FLAC STREAMINFO), vagy None."""
+    kind = detect_format(input_path)
+    try:
+        if kind == 'wav':
+            reader = _open_wav(input_path)
+        elif kind == 'aiff':
+            reader = _open_aiff(input_path)
+        elif kind == 'flac':
+            with open(input_path, 'rb') as f:
+                head = f.read(26)
+            # Az első metaadat blokk a STREAMINFO: 20 bit frekvencia, ..., 36 bit mintaszám
+            if len(head) < 26 or head[4] & 0x7F != 0:
+                return None
+            info = int.from_bytes(head[18:26], 'big')
+            rate = info >> 44
+            total = info & 0xFFFFFFFFF
+            return total / float(rate) if rate and total else None
+        else:
+            return None
+        return reader.frames / float(reader.rate)
+    except (OSError, ValueError, struct.error):
+        return None
+
+def decode_audio(input_path, sampling_rate=TARGET_SAMPLE_RATE):
+    """
+    Dekódolja a hangfájlt mono float32 PCM numpy tömbbé a megadott mintavételi frekvencián.
+    WAV / AIFF (és soundfile-lal FLAC) a processzen belül, egyéb formátum egyetlen ffmpeg hívással,
+    köztes fájl (MP3) nélkül. Hiba esetén kivételt dob.
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Audio file not found: {input_path}")
+    if os.path.getsize(input_path) == 0:
+        raise ValueError(f"Audio file is empty: {input_path}")
+    reader = _open_native(input_path)
+    if reader is not None:
+        try:
+            blocks = list(_iter_native_blocks(reader, sampling_rate))
+        finally:
+            reader.close()
+        return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+    cmd = [
+        'ffmpeg',
+        '-nostdin',
+        '-i', input_path,
+        '-vn',  # Csak az audio stream
+        '-ac', '1',  # Mono
+        '-ar', str(sampling_rate),  # Mintavételi frekvencia
+        '-f', 'f32le',  # Nyers float32 little-endian kimenet
+        '-loglevel', 'error',
+        'pipe:1'
+    ]
+    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg decode failed: {process.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(process.stdout, dtype=np.float32)
+
+
+def probe_duration(input_path):
+    """
+    Csak a fejléc/konténer metaadatok alapján adja vissza a hang hosszát másodpercben
+    (WAV / AIFF / FLAC natívan, egyébként ffprobe), a teljes fájl dekódolása nélkül.
+    Ha nem sikerül, None-t ad vissza.
+    """
+    duration_sec = _native_duration(input_path)
+    if duration_sec is not None:
+        return duration_sec
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        input_path
+    ]
+    try:
+        process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if process.returncode != 0:
+            return None
+        return float(process.stdout.strip())
+    except (OSError, ValueError):
+        return None
+
+
+def decode_to_scratch(input_path, scratch_dir=None, sampling_rate=TARGET_SAMPLE_RATE):
+    """
+    Dekódolja a hangfájlt egy 16 bites mono PCM scratch fájlba (natív formátumnál blokkonként,
+    egyébként ffmpeg közvetlenül a fájlba ír), így a teljes hang sosem kerül a Python memóriába. A hívó felel a fájl törléséért.
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Audio file not found: {input_path}")
+    reader = _open_native(input_path)
+    fd, scratch_path = tempfile.mkstemp(suffix='.pcm', dir=scratch_dir)
+    if reader is not None:
+        # Natív formátum: blokkonként konvertálva, a memória a blokkmérettől függ
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for samples in _iter_native_blocks(reader, sampling_rate):
+                    f.write((np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes())
+        except Exception:
+            os.remove(scratch_path)
+            raise
+        finally:
+            reader.close()
+        return scratch_path
+    os.close(fd)
+    cmd = [
+        'ffmpeg',
+        '-y',  # A mkstemp már létrehozta a fájlt
+        '-nostdin',
+        '-i', input_path,
+        '-vn',
+        '-ac', '1',
+        '-ar', str(sampling_rate),
+        '-f', 's16le',  # Nyers 16 bites little-endian PCM
+        '-loglevel', 'error',
+        scratch_path
+    ]
+    process = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        os.remove(scratch_path)
+        raise RuntimeError(f"FFmpeg decode failed: {process.stderr.decode(errors='replace').strip()}")
+    return scratch_path
+
+
+def resample(samples, rate, target_rate=TARGET_SAMPLE_RATE):
+    """
+    Resampler float32 mintákhoz. Ha a scipy telepítve van, polyphase (resample_poly); egyébként
+    egyszerű beépített változat: lefelé mintavételezés előtt 63 tap windowed-sinc aluláteresztő
+    szűrő (aliasing ellen), utána lineáris interpoláció. Ez gyengébb minőségű (a sávhatár közelében
+    csillapít, kevés aliasing marad), beszédfelismeréshez elég.
+    """
+    if rate == target_rate or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+    if resample_poly is not None:
+        up, down = _poly_factors(rate, target_rate)
+        return resample_poly(samples, up, down)[:int(len(samples) * target_rate / rate)].astype(np.float32)
+    if target_rate < rate:
+        samples = _lowpass(samples, rate, target_rate)
+    positions = np.arange(int(len(samples) * target_rate / rate)) * (rate / float(target_rate))
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def _poly_factors(rate, target_rate):
+    divisor = math.gcd(int(rate), int(target_rate))
+    return int(target_rate) // divisor, int(rate) // divisor
+
+
+def _lowpass(samples, rate, target_rate):
+    # 63 tap windowed-sinc aluláteresztő a lefelé mintavételezéshez (_FILTER_CONTEXT ehhez igazodik)
+    cutoff = 0.45 * target_rate / rate
+    taps = np.arange(63) - 31
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * taps) * np.hamming(len(taps))
+    return np.convolve(samples, kernel / kernel.sum(), mode='same')
+
+
+class StreamResampler:
+    """
+    A resample() darabonként hívható változata (pl. WebSocket frame-ek): a bemenet a natív
+    frekvencián gyűlik, a szűrőhöz szükséges szomszédos mintákat a hívások között megtartja,
+    és a kimeneti pozíciókat a stream elejétől számolja. A push() + flush() kimenete megegyezik
+    a beépített (scipy nélküli) resample() teljes hangon futtatott kimenetével (nincs frame-enkénti
+    zero padding és drift).
+    """
+
+    def __init__(self, rate, target_rate=TARGET_SAMPLE_RATE):
+        self.rate = rate
+        self.target_rate = target_rate
+        self._step = rate / float(target_rate)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._base = 0  # a _buffer első mintájának indexe a stream elejétől
+        self._total = 0
+        self._out_index = 0
+
+    def push(self, samples):
+        """Új natív minták; visszaadja a már pontosan kiszámítható kimeneti mintákat."""
+        if self.rate == self.target_rate:
+            return samples.astype(np.float32, copy=False)
+        self._buffer = np.concatenate([self._buffer, samples])
+        self._total += len(samples)
+        # A k. kimeneti mintához a szűrt jel kell a k * step + 1 pozícióig, ahhoz a szűrő fél hossza is
+        return self._emit(int((self._total - _FILTER_CONTEXT) / self._step))
+
+    def flush(self):
+        """A stream vége: a maradék kimenet (a végén zero padding, mint a teljes resample-nél)."""
+        if self.rate == self.target_rate:
+            return np.zeros(0, dtype=np.float32)
+        return self._emit(int(self._total * self.target_rate / self.rate))
+
+    def _emit(self, end_out):
+        end_out = min(end_out, int(self._total * self.target_rate / self.rate))
+        if end_out <= self._out_index:
+            return np.zeros(0, dtype=np.float32)
+        first = int(self._out_index * self._step)
+        last = int((end_out - 1) * self._step) + 1
+        lo = max(self._base, first - _FILTER_CONTEXT)
+        hi = min(self._total, last + _FILTER_CONTEXT + 1)
+        window = self._buffer[lo - self._base:hi - self._base]
+        if self.target_rate < self.rate:
+            window = _lowpass(window, self.rate, self.target_rate)
+        positions = np.arange(self._out_index, end_out) * self._step - lo
+        out = np.interp(positions, np.arange(len(window)), window).astype(np.float32)
+        self._out_index = end_out
+        # A következő kimeneti minta szűréséhez szükséges bemenetet tartjuk meg
+        keep_from = max(self._base, int(end_out * self._step) - _FILTER_CONTEXT)
+        self._buffer = self._buffer[keep_from - self._base:]
+        self._base = keep_from
+        return out
+
+
+def pcm16_to_float_mono(data, channels, rate, target_rate=TARGET_SAMPLE_RATE):
+    """
+    Nyers 16 bites interleaved PCM (pl. mikrofon frame-ek) -> mono float32 a modell frekvenciáján.
+    Fájl és ffmpeg nélkül, közvetlenül a memóriában.
+    """
+    samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return resample(samples, rate, target_rate)
+
+
+def encode_for_upload(samples, codec='flac', sampling_rate=TARGET_SAMPLE_RATE):
+    """
+    16 kHz mono float32 minták tömörítése feltöltéshez. Visszaad egy (bytes, filename, content_type)
+    hármast. FLAC: soundfile-lal (opcionális), vagy ffmpeg-gel; Opus: ffmpeg-gel.
+    Ha egyik sem érhető el, 16 bites 16 kHz mono WAV (így is töredéke a 44.1 kHz sztereó WAV-nak).
+    """
+    if codec == 'flac':
+        try:
+            import soundfile
+            buffer = io.BytesIO()
+            soundfile.write(buffer, samples, sampling_rate, format='FLAC', subtype='PCM_16')
+            return buffer.getvalue(), 'capture.flac', 'audio/flac'
+        except ImportError:
+            pass
+    if codec in ('flac', 'opus'):
+        output_args = ['-c:a', 'libopus', '-b:a', '24k', '-f', 'ogg'] if codec == 'opus' else ['-f', 'flac']
+        cmd = [
+            'ffmpeg', '-nostdin', '-loglevel', 'error',
+            '-f', 'f32le', '-ar', str(sampling_rate), '-ac', '1', '-i', 'pipe:0',
+        ] + output_args + ['pipe:1']
+        try:
+            process = subprocess.run(cmd, input=np.asarray(samples, dtype=np.float32).tobytes(),
+                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            if process.returncode == 0 and process.stdout:
+                if codec == 'opus':
+                    return process.stdout, 'capture.opus', 'audio/ogg'
+                return process.stdout, 'capture.flac', 'audio/flac'
+        except OSError:
+            # Nincs ffmpeg a kliensen
+            pass
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sampling_rate)
+        wf.writeframes(pcm.tobytes())
+    return buffer.getvalue(), 'capture.wav', 'audio/wav'
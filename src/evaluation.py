@@ -0,0 +1,302 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import unicodedata
+from .tools import bcolors
+from .settings import get_settings
+from .audio_utils import ALLOWED_EXTENSIONS, TARGET_SAMPLE_RATE
+
+# Get the project root directory (one level up from src)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_LOCAL = 'local'
+BACKENDS = (BACKEND_LOCAL, 'daemon', 'remote')
+QUANTIZATION_NONE = 'none'
+MB = 1024 * 1024
+
+
+def normalize_text(text):
+    """Kisbetű, írásjelek nélkül, egyszeres szóközökkel (a WER/CER ne az írásjeleken múljon)."""
+    text = unicodedata.normalize('NFC', text or '').lower()
+    text = re.sub(r"[^\w\s']", ' ', text)
+    return ' '.join(text.split())
+
+
+def edit_distance(reference, hypothesis):
+    """Levenshtein távolság két token (szó vagy karakter) sorozat között."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_token in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_token in enumerate(hypothesis, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_token != hyp_token))
+        previous = current
+    return previous[-1]
+
+
+def word_error_rate(reference, hypothesis):
+    """Szó szintű hibaarány normalizált szövegen."""
+    ref = normalize_text(reference).split()
+    hyp = normalize_text(hypothesis).split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    return edit_distance(ref, hyp) / float(len(ref))
+
+
+def load_corpus(path):
+    """
+    Címkézett korpusz: vagy egy könyvtár, ahol minden hangfájl mellett azonos nevű .txt a referencia,
+    vagy egy JSONL manifest ({"audio": útvonal, "text": referencia} soronként, relatív útvonal a
+    manifesthez képest). Visszaad egy [(audio_path, reference), ...] listát.
+    """
+    items = []
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            stem, _, extension = name.rpartition('.')
+            transcript = os.path.join(path, stem + '.txt')
+            if extension.lower() in ALLOWED_EXTENSIONS and os.path.isfile(transcript):
+                with open(transcript, 'r', encoding='utf-8') as f:
+                    items.append((os.path.join(path, name), f.read().strip()))
+        return items
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                items.append((os.path.join(base, record['audio']), record['text']))
+    return items
+
+
+class RssSampler:
+    """Csúcs RSS mérése háttérszálon (a modell betöltés utáni alapszinttel együtt)"""
+
+    def __init__(self, interval_sec=0.02):
+        from .memory_guard import current_rss_bytes
+        self._current = current_rss_bytes
+        self.interval_sec = interval_sec
+        self.peak = self._current()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='eval-rss', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_sec):
+            self.peak = max(self.peak or 0, self._current() or 0)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def current_mb(self):
+        rss = self._current()
+        return round(rss / MB, 1) if rss is not None else None
+
+
+def _evaluate_items(items, recognize):
+    """Generator: a korpusz felismerése, elemenként egy mérés."""
+    from .audio_utils import decode_audio
+    for path, reference in items:
+        samples = decode_audio(path, TARGET_SAMPLE_RATE)
+        started = time.perf_counter()
+        result = recognize(samples)
+        elapsed = time.perf_counter() - started
+        text = ''
+        if result.get('status') == 'processed' and isinstance(result.get('result'), dict):
+            text = result['result'].get('text', '').strip()
+        ref = normalize_text(reference)
+        hyp = normalize_text(text)
+        yield {
+            "type": "item",
+            "audio": path,
+            "status": result.get('status'),
+            "audio_sec": len(samples) / float(TARGET_SAMPLE_RATE),
+            "inference_sec": elapsed,
+            "word_errors": edit_distance(ref.split(), hyp.split()),
+            "words": len(ref.split()),
+            "char_errors": edit_distance(ref.replace(' ', ''), hyp.replace(' ', '')),
+            "chars": len(ref.replace(' ', '')),
+            "text": text,
+        }
+
+
+def _local_worker(corpus, model_id, quantization):
+    """
+    Egy (modell, kvantálás) konfiguráció mérése külön processben: a memória így csak ehhez
+    a modellhez tartozik, és a beállítások felülírása nem szivárog át a következő konfigurációba.
+    """
+    settings = get_settings()
+    # Csak memóriában: a mérés nem írja át a mentett beállításokat
+    settings['ai_model'] = model_id
+    settings['ai_model_fast'] = model_id
+    settings['routing_enabled'] = False
+    settings['model_quantization'] = None if quantization == QUANTIZATION_NONE else quantization
+    from .recognition import recognize_samples
+    from .model_manager import model_manager
+    with RssSampler() as sampler:
+        started = time.perf_counter()
+        model_manager.load_all()
+        model_manager.warm_up()
+        load_sec = time.perf_counter() - started
+        idle_rss_mb = sampler.current_mb()
+        for item in _evaluate_items(load_corpus(corpus), recognize_samples):
+            # Elemenként egy JSON sor a stdout-on (a modell naplói közé keveredve)
+            print(json.dumps(item, ensure_ascii=False), flush=True)
+    print(json.dumps({
+        "type": "summary",
+        "load_sec": load_sec,
+        "idle_rss_mb": idle_rss_mb,
+        "peak_rss_mb": round(sampler.peak / MB, 1) if sampler.peak else None,
+    }), flush=True)
+
+
+def _collect(config, lines):
+    """A worker JSON sorainak összesítése egy konfiguráció eredményévé."""
+    items = [line for line in lines if line.get('type') == 'item']
+    summary = next((line for line in lines if line.get('type') == 'summary'), {})
+    audio_sec = sum(item['audio_sec'] for item in items)
+    words = sum(item['words'] for item in items)
+    chars = sum(item['chars'] for item in items)
+    return dict(
+        config,
+        items=len(items),
+        failed=sum(1 for item in items if item['status'] != 'processed'),
+        wer=sum(item['word_errors'] for item in items) / float(words) if words else None,
+        cer=sum(item['char_errors'] for item in items) / float(chars) if chars else None,
+        rtf=sum(item['inference_sec'] for item in items) / audio_sec if audio_sec else None,
+        load_sec=summary.get('load_sec'),
+        idle_rss_mb=summary.get('idle_rss_mb'),
+        peak_rss_mb=summary.get('peak_rss_mb'),
+    )
+
+
+def run_config(corpus, config):
+    """Egy konfiguráció futtatása: helyi modell külön processben, daemon/remote ebben a processben."""
+    print(f"{bcolors.OKBLUE}[INFO] Kiértékelés: {config['name']}{bcolors.ENDC}")
+    if config['backend'] == BACKEND_LOCAL:
+        command = [
+            sys.executable, '-m', 'src.evaluation', '_worker', corpus,
+            '--model', config['model'], '--quantization', config['quantization'],
+        ]
+        process = subprocess.run(command, cwd=PROJECT_ROOT, stdout=subprocess.PIPE, text=True, encoding='utf-8')
+        if process.returncode != 0:
+            print(f"{bcolors.FAIL}[ERROR] Kiértékelés sikertelen: {config['name']}, kihagyva{bcolors.ENDC}")
+            return None
+        lines = [json.loads(line) for line in process.stdout.splitlines() if line.startswith('{')]
+        return _collect(config, lines)
+
+    from .session_recorder import make_recognizer
+    try:
+        recognize = make_recognizer(config['backend'])
+    except RuntimeError as e:
+        print(f"{bcolors.FAIL}[ERROR] {str(e)}, kihagyva{bcolors.ENDC}")
+        return None
+    return _collect(config, list(_evaluate_items(load_corpus(corpus), recognize)))
+
+
+def pareto_front(results):
+    """Azok a konfigurációk, amelyeknél nincs egyszerre pontosabb (WER) és gyorsabb (RTF)."""
+    front = []
+    for result in results:
+        dominated = any(
+            other is not result
+            and other['wer'] <= result['wer'] and other['rtf'] <= result['rtf']
+            and (other['wer'] < result['wer'] or other['rtf'] < result['rtf'])
+            for other in results
+        )
+        if not dominated:
+            front.append(result)
+    return front
+
+
+def print_table(results, max_wer=None):
+    results = [result for result in results if result and result['wer'] is not None and result['rtf'] is not None]
+    if not results:
+        print(f"{bcolors.FAIL}[ERROR] Nincs értékelhető eredmény{bcolors.ENDC}")
+        return None
+    front = pareto_front(results)
+    print(f"\n{'':2}{'konfiguráció':<52}{'WER':>8}{'CER':>8}{'RTF':>8}{'betöltés':>10}{'RSS csúcs':>11}")
+    for result in sorted(results, key=lambda result: result['rtf']):
+        marker = '*' if any(result is item for item in front) else ' '
+        load = f"{result['load_sec']:.1f}s" if result.get('load_sec') is not None else '-'
+        peak = f"{result['peak_rss_mb']:.0f} MB" if result.get('peak_rss_mb') is not None else '-'
+        print(f"{marker:2}{result['name']:<52}{result['wer']:>8.3f}{result['cer']:>8.3f}{result['rtf']:>8.3f}"
+              f"{load:>10}{peak:>11}")
+    print("* Pareto-optimális (nincs nála pontosabb és egyben gyorsabb konfiguráció)")
+    if max_wer is None:
+        return None
+    eligible = [result for result in front if result['wer'] <= max_wer]
+    if not eligible:
+        print(f"{bcolors.WARNING}[WARNING] Egyik konfiguráció sem éri el a WER <= {max_wer} szintet{bcolors.ENDC}")
+        return None
+    best = min(eligible, key=lambda result: result['rtf'])
+    print(f"{bcolors.OKGREEN}[SUCCESS] Leggyorsabb WER <= {max_wer} mellett: {best['name']} "
+          f"(WER {best['wer']:.3f}, RTF {best['rtf']:.3f}){bcolors.ENDC}")
+    return best
+
+
+def build_configs(models, quantizations, backends):
+    configs = []
+    for backend in backends:
+        if backend != BACKEND_LOCAL:
+            # A daemon/szerver a saját betöltött modelljével fut, itt nem választható
+            configs.append({"name": backend, "backend": backend, "model": None, "quantization": None})
+            continue
+        for model_id in models:
+            for quantization in quantizations:
+                configs.append({
+                    "name": f"{backend} {model_id} {quantization}",
+                    "backend": backend,
+                    "model": model_id,
+                    "quantization": quantization,
+                })
+    return configs
+
+
+def _list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pontosság és sebesség mérése modellenként, kvantálásonként és háttérenként.')
+    parser.add_argument('command', choices=['run', '_worker'])
+    parser.add_argument('corpus', help='Címkézett korpusz: könyvtár (hang + azonos nevű .txt) vagy JSONL manifest')
+    parser.add_argument('--models', type=_list, default=None, help='Modell azonosítók (alapból ai_model és ai_model_fast)')
+    parser.add_argument('--model', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--quantization', type=str, default=QUANTIZATION_NONE,
+                        help='Kvantálási módok vesszővel (none, dynamic-int8)')
+    parser.add_argument('--backends', type=_list, default=[BACKEND_LOCAL], help='Hátterek (local, daemon, remote)')
+    parser.add_argument('--max-wer', type=float, default=None, help='Pontossági küszöb az ajánláshoz')
+    parser.add_argument('-o', '--output', default=None, help='Eredmények JSON fájlba')
+    args = parser.parse_args()
+
+    if args.command == '_worker':
+        _local_worker(args.corpus, args.model, args.quantization)
+        return 0
+
+    if not load_corpus(args.corpus):
+        print(f"{bcolors.FAIL}[ERROR] Üres vagy hibás korpusz: {args.corpus}{bcolors.ENDC}")
+        return 1
+    unknown = [backend for backend in args.backends if backend not in BACKENDS]
+    if unknown:
+        print(f"{bcolors.FAIL}[ERROR] Ismeretlen háttér: {', '.join(unknown)}{bcolors.ENDC}")
+        return 1
+    settings = get_settings()
+    models = args.models or list(dict.fromkeys([settings.get('ai_model'), settings.get('ai_model_fast')]))
+    configs = build_configs(models, _list(args.quantization), args.backends)
+    results = [run_config(args.corpus, config) for config in configs]
+    best = print_table(results, max_wer=args.max_wer)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"results": [result for result in results if result], "recommended": best}, f, indent=2)
+        print(f"{bcolors.OKBLUE}[INFO] Eredmények mentve: {args.output}{bcolors.ENDC}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import time
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+from .settings import get_settings
+
+# A Whisper decoder legfeljebb 448 pozíciót kezel; a prompt tokenek után ennyi marad
+WHISPER_MAX_NEW_TOKENS = 440
+
+# Leállás okai (a részleges eredmény mellett riportálva)
+REASON_DEADLINE = 'deadline'
+REASON_REPETITION = 'repetition'
+REASON_TOKEN_BUDGET = 'token_budget'
+
+
+def find_repetition(tokens, max_period, min_repeats, min_span):
+    """
+    Ismétlődési hurok keresése a sorozat végén: visszaadja a periódus hosszát, ha az utolsó
+    period hosszú blokk legalább min_repeats-szer (és legalább min_span elemen) ismétlődik.
+    """
+    length = len(tokens)
+    for period in range(1, max_period + 1):
+        repeats = max(min_repeats, -(-min_span // period))
+        span = period * repeats
+        if span > length:
+            break
+        tail = tokens[length - span:]
+        block = tail[-period:]
+        if all(tail[offset:offset + period] == block for offset in range(0, span, period)):
+            return period
+    return None
+
+
+def collapse_repetition(text, max_period=8, min_repeats=4, min_span=16):
+    """A szöveg végén ismétlődő szó-blokkot egyetlen előfordulásra vágja vissza."""
+    words = text.split()
+    period = find_repetition(words, max_period, min_repeats, min_span)
+    if not period:
+        return text, False
+    block = words[-period:]
+    end = len(words) - period
+    while end - period >= 0 and words[end - period:end] == block:
+        end -= period
+    return ' '.join(words[:end] + block), True
+
+
+class DeadlineCriteria(StoppingCriteria):
+    """Wall-clock határidő: lejárta után minden sor generálása leáll."""
+
+    def __init__(self, guard):
+        self.guard = guard
+
+    def __call__(self, input_ids, scores, **kwargs):
+        expired = time.monotonic() >= self.guard.deadline
+        if expired:
+            self.guard.mark(REASON_DEADLINE)
+        return torch.full((input_ids.shape[0],), expired, dtype=torch.bool, device=input_ids.device)
+
+
+class RepetitionCriteria(StoppingCriteria):
+    """Token szintű hurok felismerés soronként (pl. ugyanaz a szó/kifejezés újra és újra)."""
+
+    def __init__(self, guard, max_period, min_repeats, min_span):
+        self.guard = guard
+        self.max_period = max_period
+        self.min_repeats = min_repeats
+        self.min_span = min_span
+
+    def __call__(self, input_ids, scores, **kwargs):
+        window = input_ids[:, -self.max_period * max(self.min_repeats, self.min_span):].tolist()
+        looping = [
+            find_repetition(row, self.max_period, self.min_repeats, self.min_span) is not None
+            for row in window
+        ]
+        if any(looping):
+            self.guard.mark(REASON_REPETITION)
+        return torch.tensor(looping, dtype=torch.bool, device=input_ids.device)
+
+
+class TokenBudgetCriteria(StoppingCriteria):
+    """
+    A hang hosszából számolt token keret. Long-form generálásnál szegmensenként számol
+    (a bemenet hosszának csökkenése új szegmenst jelez).
+    """
+
+    def __init__(self, guard):
+        self.guard = guard
+        self._start_len = None
+        self._last_len = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        length = input_ids.shape[1]
+        if self._start_len is None or length <= self._last_len:
+            self._start_len = length - 1
+        self._last_len = length
+        exhausted = length - self._start_len >= self.guard.max_new_tokens
+        if exhausted:
+            self.guard.mark(REASON_TOKEN_BUDGET)
+        return torch.full((input_ids.shape[0],), exhausted, dtype=torch.bool, device=input_ids.device)
+
+
+class GenerationGuard:
+    """
+    Egy felismerés generálási korlátai: a hang hosszából számolt token keret, wall-clock
+    határidő és ismétlődési hurok felismerés. Elakadt dekódolásnál a generálás korán leáll,
+    az eredmény részlegesként jelölve tér vissza, így nem tartja fel a többi hívót.
+    """
+
+    def __init__(self, duration_sec, settings=None, deadline_audio_sec=None):
+        settings = settings or get_settings()
+        self.enabled = settings.get('generation_guard_enabled', True)
+        # Szegmensenként legfeljebb 30s hang kerül a decoder-re
+        segment_sec = min(max(duration_sec, 0.0), 30.0)
+        self.max_new_tokens = int(min(
+            WHISPER_MAX_NEW_TOKENS,
+            settings.get('generation_base_tokens', 16) + settings.get('generation_tokens_per_sec', 16) * segment_sec
+        ))
+        # Batch-elt hívásnál a határidő az összes hang hosszára számolódik (deadline_audio_sec)
+        self.deadline_sec = settings.get('generation_deadline_base_sec', 10) \
+            + settings.get('generation_deadline_per_audio_sec', 1.0) * (deadline_audio_sec or duration_sec)
+        self.repetition_max_period = settings.get('repetition_max_period', 8)
+        self.repetition_min_repeats = settings.get('repetition_min_repeats', 4)
+        self.repetition_min_span = settings.get('repetition_min_span', 16)
+        self.deadline = None
+        self.reasons = []
+
+    def mark(self, reason):
+        if reason not in self.reasons:
+            self.reasons.append(reason)
+
+    def generate_kwargs(self):
+        """A generate()/pipeline generate_kwargs kiegészítése; a határidő innen indul."""
+        if not self.enabled:
+            return {}
+        self.deadline = time.monotonic() + self.deadline_sec
+        return {
+            "stopping_criteria": StoppingCriteriaList([
+                DeadlineCriteria(self),
+                RepetitionCriteria(self, self.repetition_max_period, self.repetition_min_repeats, self.repetition_min_span),
+                TokenBudgetCriteria(self),
+            ]),
+        }
+
+    def finish(self, result):
+        """
+        Az eredmény utófeldolgozása: a szöveg végi hurok levágása és a részleges eredmény jelölése
+        (result['partial'], result['generation']). Visszaadja a módosított result dict-et.
+        """
+        if not self.enabled:
+            return result
+        text = result.get("text", "")
+        if text:
+            collapsed, repeated = collapse_repetition(
+                text, self.repetition_max_period, self.repetition_min_repeats, self.repetition_min_span
+            )
+            if repeated:
+                self.mark(REASON_REPETITION)
+                result["text"] = collapsed
+        result["partial"] = bool(self.reasons)
+        result["generation"] = {
+            "stopped_by": list(self.reasons),
+            "max_new_tokens": self.max_new_tokens,
+            "deadline_sec": round(self.deadline_sec, 2),
+        }
+        return result
+
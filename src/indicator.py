@@ -4,7 +4,7 @@ import queue
 import os
 import time
 from src.tools import bcolors
-from src.settings_window import get_settings
+from src.settings import get_settings, subscribe_settings
 
 # Always define these at the top
 SIMPLEAUDIO_AVAILABLE = False
@@ -22,14 +22,23 @@ try:
 except ImportError:
     pass
 
-# Always import pydub and pyaudio for robust fallback
-from pydub import AudioSegment
+import numpy as np
 import pyaudio
 
 ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'audio')
 
+# Közös kimeneti formátum: minden hangjelzés ide konvertálódik betöltéskor
+CUE_SAMPLE_RATE = 44100
+CUE_CHANNELS = 2
+CUE_FRAMES_PER_BUFFER = 512
+
 class SoundManager:
-    """Manages beeping sounds for different application states using WAV files from assets/"""
+    """
+    Hangjelzések a különböző állapotokhoz (WAV fájlok az assets/ könyvtárból).
+    A fájlok egyszer dekódolódnak a memóriába (háttérszálon előtöltve), a hangerővel skálázott
+    pufferek csak set_volume-kor számolódnak újra, a lejátszás pedig egyetlen, hosszan élő
+    callback-es kimeneti stream-en történik, ahol az egyszerre szóló hangok összekeverednek.
+    """
     def __init__(self):
         self.enabled = True
         self.sounds = {
@@ -41,62 +50,165 @@ class SoundManager:
         }
         # Hangerő beállítása (0-100)
         self.volume = get_settings().get('volume', 30)
+        self._lock = threading.Lock()
+        self._decoded = {}
+        self._gained = {}
+        self._voices = []
+        self._stream_idle = True
+        self._pyaudio = None
+        self._stream = None
+        # A settings.json kézi módosítása is érvényesüljön (a csúszka közvetlenül állítja)
+        self._unsubscribe = subscribe_settings(self._on_settings_changed, keys=('volume',))
+        threading.Thread(target=self._preload, name='sound-preload', daemon=True).start()
+
+    def _preload(self):
+        for sound_type in self.sounds:
+            self._get_cue(sound_type)
+        self._open_stream()
+
+    def _open_stream(self):
+        """Az egyetlen kimeneti stream megnyitása; hiba esetén a simpleaudio tartalék marad"""
+        with self._lock:
+            if self._stream is not None:
+                return
+            try:
+                self._pyaudio = pyaudio.PyAudio()
+                self._stream = self._pyaudio.open(
+                    format=pyaudio.paInt16,
+                    channels=CUE_CHANNELS,
+                    rate=CUE_SAMPLE_RATE,
+                    output=True,
+                    frames_per_buffer=CUE_FRAMES_PER_BUFFER,
+                    stream_callback=self._mix_callback,
+                    start=False
+                )
+            except Exception as e:
+                print(f"{bcolors.WARNING}[WARNING] Audio output stream failed: {e}{bcolors.ENDC}")
+                if self._pyaudio:
+                    self._pyaudio.terminate()
+                self._pyaudio = None
+                self._stream = None
+
+    def _gain(self):
+        change_db = 20 * (self.volume / 100.0 - 1) if self.volume > 0 else -120
+        return 10 ** (change_db / 20.0)
+
+    def _get_cue(self, sound_type):
+        """A hangerővel skálázott, interleaved int16 puffer (első használatkor dekódol)"""
+        with self._lock:
+            if sound_type in self._gained:
+                return self._gained[sound_type]
+        sound_path = self.sounds[sound_type]
+        if not os.path.exists(sound_path):
+            print(f"{bcolors.WARNING}[WARNING] Sound file not found: {sound_path}{bcolors.ENDC}")
+            return None
+        try:
+            # A WAV-ok MP3 kódolásúak is lehetnek, ezért pydub (ffmpeg) dekódol, egyszer
+            from pydub import AudioSegment
+            audio = AudioSegment.from_file(sound_path)
+            audio = audio.set_frame_rate(CUE_SAMPLE_RATE).set_channels(CUE_CHANNELS).set_sample_width(2)
+            samples = np.frombuffer(audio.raw_data, dtype=np.int16)
+        except Exception as e:
+            print(f"{bcolors.WARNING}[WARNING] Sound decode failed ({sound_path}): {e}{bcolors.ENDC}")
+            return None
+        with self._lock:
+            self._decoded[sound_type] = samples
+            self._gained[sound_type] = self._apply_gain(samples)
+            return self._gained[sound_type]
+
+    def _apply_gain(self, samples):
+        gain = self._gain()
+        if gain == 1.0:
+            return samples
+        return np.clip(samples.astype(np.float32) * gain, -32768, 32767).astype(np.int16)
 
     def set_volume(self, volume):
         """
-        Beállítja a hangerőt (0-100).
+        Beállítja a hangerőt (0-100), és újraszámolja a skálázott puffereket.
         """
-        self.volume = volume
+        with self._lock:
+            self.volume = volume
+            self._gained = {name: self._apply_gain(samples) for name, samples in self._decoded.items()}
+
+    def _on_settings_changed(self, changed):
+        volume = changed.get('volume')
+        if isinstance(volume, (int, float)) and volume != self.volume:
+            self.set_volume(volume)
+
+    def _mix_callback(self, in_data, frame_count, time_info, status):
+        """PortAudio callback: az aktív hangok összekeverése; ha nincs mit játszani, a stream megáll"""
+        needed = frame_count * CUE_CHANNELS
+        with self._lock:
+            if not self._voices:
+                self._stream_idle = True
+                return (bytes(needed * 2), pyaudio.paComplete)
+            mix = np.zeros(needed, dtype=np.int32)
+            remaining = []
+            for samples, position in self._voices:
+                chunk = samples[position:position + needed]
+                mix[:len(chunk)] += chunk
+                if position + needed < len(samples):
+                    remaining.append((samples, position + needed))
+            self._voices = remaining
+        return (np.clip(mix, -32768, 32767).astype(np.int16).tobytes(), pyaudio.paContinue)
 
     def play_sound(self, sound_type):
+        """Nem blokkol: a hang bekerül a keverőbe, és a stream (újra)indul, ha állt"""
         if not self.enabled or sound_type not in self.sounds:
             return
-        sound_path = self.sounds[sound_type]
-        if not os.path.exists(sound_path):
-            print(f"{bcolors.WARNING}[WARNING] Sound file not found: {sound_path}{bcolors.ENDC}")
+        samples = self._get_cue(sound_type)
+        if samples is None:
             return
-        # Try simpleaudio, then pydub+pyaudio
+        if self._stream is None:
+            self._open_stream()
         try:
-            if SIMPLEAUDIO_AVAILABLE:
-                try:
-                    wave_obj = sa.WaveObject.from_wave_file(sound_path)
-                    # Hangerő alkalmazása simpleaudio-nál (csak ha támogatott)
-                    # Nincs natív hangerő, ezért pydubbal módosítjuk, ha nem 100%
-                    if self.volume != 100:
-                        audio = AudioSegment.from_file(sound_path)
-                        change_db = 20 * (self.volume / 100.0 - 1) if self.volume > 0 else -120
-                        audio = audio + change_db
-                        raw = audio.raw_data
-                        play_obj = sa.play_buffer(raw, audio.channels, audio.sample_width, audio.frame_rate)
-                    else:
-                        play_obj = wave_obj.play()
-                    return
-                except Exception as e:
-                    print(f"{bcolors.WARNING}[WARNING] simpleaudio failed: {e}{bcolors.ENDC}")
-            # Always try pydub + pyaudio as the final fallback
+            with self._lock:
+                stream = self._stream
+                restart = False
+                if stream is not None:
+                    self._voices.append((samples, 0))
+                    restart = self._stream_idle
+                    self._stream_idle = False
+            if stream is not None:
+                if restart:
+                    # A callback paComplete-tel állt le (már nem hívódik), újraindítás lock nélkül;
+                    # a stream nyitva marad, nincs új PyAudio példány
+                    if not stream.is_stopped():
+                        stream.stop_stream()
+                    stream.start_stream()
+                return
+        except Exception as e:
+            print(f"{bcolors.WARNING}[WARNING] Audio stream playback failed: {e}{bcolors.ENDC}")
+        # Tartalék: simpleaudio a már dekódolt, skálázott pufferrel
+        if SIMPLEAUDIO_AVAILABLE:
             try:
-                audio = AudioSegment.from_file(sound_path)
-                # Hangerő alkalmazása pydubnál
-                if self.volume != 100:
-                    change_db = 20 * (self.volume / 100.0 - 1) if self.volume > 0 else -120
-                    audio = audio + change_db
-                p = pyaudio.PyAudio()
-                stream = p.open(format=p.get_format_from_width(audio.sample_width),
-                                channels=audio.channels,
-                                rate=audio.frame_rate,
-                                output=True)
-                stream.write(audio.raw_data)
-                stream.stop_stream()
-                stream.close()
-                p.terminate()
+                sa.play_buffer(samples.tobytes(), CUE_CHANNELS, 2, CUE_SAMPLE_RATE)
                 return
             except Exception as e:
-                print(f"{bcolors.WARNING}[WARNING] pydub+pyaudio failed: {e}{bcolors.ENDC}")
-            print(f"{bcolors.WARNING}[WARNING] All sound playback methods failed for {sound_path}{bcolors.ENDC}")
+                print(f"{bcolors.WARNING}[WARNING] simpleaudio failed: {e}{bcolors.ENDC}")
+        print(f"{bcolors.WARNING}[WARNING] All sound playback methods failed for {sound_type}{bcolors.ENDC}")
+
+    def close(self):
+        """A kimeneti stream és a PyAudio példány lezárása"""
+        with self._lock:
+            stream, self._stream = self._stream, None
+            audio, self._pyaudio = self._pyaudio, None
+            self._voices = []
+        try:
+            if stream is not None:
+                stream.close()
+            if audio is not None:
+                audio.terminate()
         except Exception as e:
-            print(f"{bcolors.WARNING}[WARNING] Sound playback failed: {e}{bcolors.ENDC}")
+            print(f"{bcolors.WARNING}[WARNING] Audio output close failed: {e}{bcolors.ENDC}")
 
 class StatusIndicator(threading.Thread):
+    """
+    Állapotjelző pont a képernyő alján. A vászon elemei (pont, pörgő ív) egyszer jönnek létre,
+    és helyben frissülnek; az ablak mérete és pozíciója fix (a legnagyobb pont méretére),
+    így animáció közben nincs újrarajzolás és geometria számítás. A GUI szál csak valódi
+    állapot eseményre (<<StatusChanged>>) és futó animációra ébred, nincs periodikus lekérdezés.
+    """
     COLORS = {
         'idle': '#888888',      # szürke
         'active': '#888888',    # szürke (alias)
@@ -105,6 +217,7 @@ class StatusIndicator(threading.Thread):
         'done': '#2ECC40',      # zöld
         'error': '#FF4136',     # piros
         'running': '#00BFFF',   # világoskék (pörgés)
+        'loading': '#B10DC9',   # lila (modell betöltés, pörgés)
     }
     TRANSITION_DURATION = 300  # ms
     TRANSITION_STEPS = 15
@@ -116,15 +229,14 @@ class StatusIndicator(threading.Thread):
     BIG_SIZE = 48
     SIZE_TRANSITION_STEPS = 10
     SIZE_TRANSITION_DURATION = 200  # ms összesen
+    STATUS_EVENT = '<<StatusChanged>>'
 
     def __init__(self, size=24, y_offset=30, on_click=None):
         super().__init__(daemon=True)
         self.size = size
-        self.target_size = size
-        self.size_transitioning = False
-        self.size_transition_step = 0
         self.start_size = size
         self.end_size = size
+        self.size_transition_step = 0
         self.y_offset = y_offset
         self.status = 'idle'
         self.status_queue = queue.Queue()
@@ -133,12 +245,21 @@ class StatusIndicator(threading.Thread):
         self.running = True
         self.sound_manager = SoundManager()
         self.current_color = self.COLORS['idle']
-        self.target_color = self.COLORS['idle']
         self.transition_step = 0
-        self.transitioning = False
         self.spin_angle = 0
         self.is_spinning = False
         self.on_click = on_click
+        # Perzisztens vászon elemek és a futó animációk after azonosítói
+        self._oval = None
+        self._arc = None
+        self._canvas_size = self.BIG_SIZE + 2 * self._arc_margin(self.BIG_SIZE)
+        self._jobs = {}
+        self._events_ready = False
+
+    @staticmethod
+    def _arc_margin(size):
+        # Ív margója, hogy a pörgő ív mindig beleférjen
+        return max(6, size // 8)
 
     def run(self):
         self.root = tk.Tk()
@@ -147,33 +268,41 @@ class StatusIndicator(threading.Thread):
         self.root.attributes('-alpha', 0.9)
         self.root.configure(bg='black')
         self.root.wm_attributes('-transparentcolor', 'black')
-        self.root.geometry(self._get_geometry())
+        # Egyszer számolt, fix geometria (a monitor lekérdezése csak itt történik)
+        self.root.geometry(self._get_geometry(self._canvas_size))
         self.dot = tk.Canvas(
             self.root,
-            width=self.size,
-            height=self.size,
+            width=self._canvas_size,
+            height=self._canvas_size,
             highlightthickness=0,
             bg='black'
         )
         self.dot.pack()
-        self._draw_dot(self.COLORS['idle'])
+        self._oval = self.dot.create_oval(0, 0, 0, 0, fill=self.current_color, outline='white', width=1)
+        self._arc = self.dot.create_arc(
+            0, 0, 0, 0, start=self.spin_angle, extent=self.SPIN_ARC_EXTENT,
+            style=tk.ARC, outline='white', state=tk.HIDDEN
+        )
+        self._layout()
         if self.on_click:
             self.dot.bind('<Button-1>', lambda event: self.on_click())
-        self.root.after(100, self._poll_status)
+        self.root.bind(self.STATUS_EVENT, self._on_status_event)
+        self._events_ready = True
+        # Az ablak létrejötte előtt beérkezett állapotok feldolgozása
+        self._on_status_event()
         self.root.mainloop()
 
-    def _get_geometry(self, size=None):
-        # Az ablak pozícióját és méretét adja vissza
-        s = size if size is not None else self.size
+    def _get_geometry(self, size):
+        # Az ablak pozícióját és méretét adja vissza (az alsó széle fix, vízszintesen középen)
         try:
             import screeninfo
             screen = screeninfo.get_monitors()[0]
-            x = screen.x + (screen.width - s) // 2
-            y = screen.y + screen.height - s - self.y_offset - 40 - 20
+            x = screen.x + (screen.width - size) // 2
+            y = screen.y + screen.height - size - self.y_offset - 40 - 20
         except Exception:
-            x = (self.root.winfo_screenwidth() - s) // 2
-            y = self.root.winfo_screenheight() - s - self.y_offset - 40 - 20
-        return f"{s}x{s}+{x}+{y}"
+            x = (self.root.winfo_screenwidth() - size) // 2
+            y = self.root.winfo_screenheight() - size - self.y_offset - 40 - 20
+        return f"{size}x{size}+{x}+{y}"
 
     def _hex_to_rgb(self, hex_color):
         hex_color = hex_color.lstrip('#')
@@ -185,126 +314,127 @@ class StatusIndicator(threading.Thread):
     def _interpolate_color(self, c1, c2, t):
         return tuple(int(a + (b - a) * t) for a, b in zip(c1, c2))
 
-    def _draw_dot(self, color):
-        self.dot.delete('all')
-        # A vászon méretét megnöveljük, hogy a pörgő ív mindig beleférjen
-        arc_margin = max(6, self.size // 8)  # Ív margója
-        canvas_size = self.size + arc_margin * 2
-        self.dot.config(width=canvas_size, height=canvas_size)
-        self.root.geometry(self._get_geometry(canvas_size))
-        # Fő pont kirajzolása középre
-        self.dot.create_oval(
-            arc_margin, arc_margin,
-            arc_margin + self.size - 2, arc_margin + self.size - 2,
-            fill=color, outline='white', width=1
-        )
-        # Pörgő ív kirajzolása, ha szükséges
-        if self.is_spinning:
-            center = canvas_size // 2
-            r = (self.size // 2) + (arc_margin // 2)
-            self.dot.create_arc(
-                center - r, center - r, center + r, center + r,
-                start=self.spin_angle, extent=self.SPIN_ARC_EXTENT,
-                style=tk.ARC, outline='white', width=max(2, self.size // 12)
-            )
+    def _layout(self):
+        """A pont és az ív koordinátái az aktuális mérethez (a pont alja a vászon aljához igazodik)"""
+        margin = self._arc_margin(self.size)
+        x0 = (self._canvas_size - self.size) // 2
+        y0 = self._canvas_size - margin - self.size
+        self.dot.coords(self._oval, x0, y0, x0 + self.size - 2, y0 + self.size - 2)
+        center_x = x0 + self.size // 2
+        center_y = y0 + self.size // 2
+        r = (self.size // 2) + (margin // 2)
+        self.dot.coords(self._arc, center_x - r, center_y - r, center_x + r, center_y + r)
+        self.dot.itemconfig(self._arc, width=max(2, self.size // 12))
+
+    def _schedule(self, name, delay, callback):
+        """Egy animáció következő lépése; az azonos nevű korábbi lépés törlődik"""
+        self._cancel(name)
+        self._jobs[name] = self.root.after(delay, callback)
+
+    def _cancel(self, name):
+        job = self._jobs.pop(name, None)
+        if job is not None:
+            self.root.after_cancel(job)
 
     def _start_size_transition(self, new_size):
-        self.size_transitioning = True
         self.size_transition_step = 0
         self.start_size = self.size
         self.end_size = new_size
         self._do_size_transition()
 
     def _do_size_transition(self):
-        if not self.size_transitioning:
-            return
+        self._jobs.pop('size', None)
         t = self.size_transition_step / self.SIZE_TRANSITION_STEPS
-        new_size = int(self.start_size + (self.end_size - self.start_size) * t)
-        self.size = new_size
-        self._draw_dot(self.current_color)
+        self.size = int(self.start_size + (self.end_size - self.start_size) * t)
+        self._layout()
         if self.size_transition_step < self.SIZE_TRANSITION_STEPS:
             self.size_transition_step += 1
-            self.root.after(self.SIZE_TRANSITION_DURATION // self.SIZE_TRANSITION_STEPS, self._do_size_transition)
+            self._schedule('size', self.SIZE_TRANSITION_DURATION // self.SIZE_TRANSITION_STEPS, self._do_size_transition)
         else:
-            self.size_transitioning = False
             self.size = self.end_size
-            self._draw_dot(self.current_color)
+            self._layout()
 
     def _start_transition(self, new_color):
-        self.transitioning = True
         self.transition_step = 0
         self.start_rgb = self._hex_to_rgb(self.current_color)
         self.end_rgb = self._hex_to_rgb(new_color)
         self._do_transition()
 
     def _do_transition(self):
-        if not self.transitioning:
-            return
+        self._jobs.pop('color', None)
         t = self.transition_step / self.TRANSITION_STEPS
-        rgb = self._interpolate_color(self.start_rgb, self.end_rgb, t)
-        hex_color = self._rgb_to_hex(rgb)
-        self._draw_dot(hex_color)
-        self.current_color = hex_color
+        self.current_color = self._rgb_to_hex(self._interpolate_color(self.start_rgb, self.end_rgb, t))
+        self.dot.itemconfig(self._oval, fill=self.current_color)
         if self.transition_step < self.TRANSITION_STEPS:
             self.transition_step += 1
-            self.root.after(self.TRANSITION_DURATION // self.TRANSITION_STEPS, self._do_transition)
+            self._schedule('color', self.TRANSITION_DURATION // self.TRANSITION_STEPS, self._do_transition)
         else:
-            self.transitioning = False
             self.current_color = self._rgb_to_hex(self.end_rgb)
-            self._draw_dot(self.current_color)
+            self.dot.itemconfig(self._oval, fill=self.current_color)
 
     def _start_spinning(self):
         if not self.is_spinning:
             self.is_spinning = True
+            self.dot.itemconfig(self._arc, state=tk.NORMAL)
             self._spin()
 
     def _stop_spinning(self):
         self.is_spinning = False
-        self._draw_dot(self.current_color)
+        self._cancel('spin')
+        self.dot.itemconfig(self._arc, state=tk.HIDDEN)
 
     def _spin(self):
+        self._jobs.pop('spin', None)
         if self.is_spinning:
             self.spin_angle = (self.spin_angle + 12) % 360
-            self._draw_dot(self.current_color)
-            self.root.after(self.SPIN_INTERVAL, self._spin)
+            self.dot.itemconfig(self._arc, start=self.spin_angle)
+            self._schedule('spin', self.SPIN_INTERVAL, self._spin)
 
-    def _poll_status(self):
+    def _on_status_event(self, event=None):
+        """Csak állapot eseményre fut (GUI szálon): a sorban álló állapotok alkalmazása"""
         try:
             while not self.status_queue.empty():
-                status = self.status_queue.get_nowait()
-                self.status = status
-                color = self.COLORS.get(status, '#888888')
-                # Pörgés: 'sending' vagy 'running' állapotban
-                if status in ('sending', 'running'):
-                    self._start_spinning()
-                else:
-                    self._stop_spinning()
-                # Méretváltás: 'listening' vagy 'sending' -> nagyobb, egyébként alapméret
-                if status in ('listening', 'sending'):
-                    if self.size != self.BIG_SIZE:
-                        self._start_size_transition(self.BIG_SIZE)
-                else:
-                    if self.size != self.BASE_SIZE:
-                        self._start_size_transition(self.BASE_SIZE)
-                if color != self.current_color:
-                    self._start_transition(color)
-                else:
-                    self._draw_dot(color)
-                if status == 'listening':
-                    self.sound_manager.play_sound('start')
-                elif status == 'done':
-                    self.sound_manager.play_sound('success')
-                elif status == 'error':
-                    self.sound_manager.play_sound('error')
-                if status in ('done', 'error'):
-                    self.root.after(1000, lambda: self.set_status('idle'))
+                self._apply_status(self.status_queue.get_nowait())
         except Exception:
             pass
-        if self.running:
-            self.root.after(100, self._poll_status)
+
+    def _apply_status(self, status):
+        self.status = status
+        color = self.COLORS.get(status, '#888888')
+        # Pörgés: 'sending', 'running' vagy 'loading' állapotban
+        if status in ('sending', 'running', 'loading'):
+            self._start_spinning()
+        else:
+            self._stop_spinning()
+        # Méretváltás: 'listening' vagy 'sending' -> nagyobb, egyébként alapméret
+        target_size = self.BIG_SIZE if status in ('listening', 'sending') else self.BASE_SIZE
+        if self.size != target_size:
+            self._start_size_transition(target_size)
+        if color != self.current_color:
+            self._start_transition(color)
+        if status == 'listening':
+            self.sound_manager.play_sound('start')
+        elif status == 'done':
+            self.sound_manager.play_sound('success')
+        elif status == 'error':
+            self.sound_manager.play_sound('error')
+        if status in ('done', 'error'):
+            self._schedule('idle', 1000, lambda: self.set_status('idle'))
+        else:
+            self._cancel('idle')
+
     def set_status(self, status):
+        """Bármelyik szálról hívható: sorba teszi az állapotot és felébreszti a GUI szálat"""
         self.status_queue.put(status)
+        if self._events_ready and self.running:
+            try:
+                self.root.event_generate(self.STATUS_EVENT, when='tail')
+            except (tk.TclError, RuntimeError):
+                # Az ablak már megszűnt (leállítás közben)
+                pass
+
     def stop(self):
         self.running = False
+        self.sound_manager.close()
         if self.root:
-            self.root.destroy() 
\ No newline at end of file
+            self.root.destroy()
@@ -0,0 +1,170 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from .tools import get_logger, percentile
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MB = 1024 * 1024
+log = get_logger('memory')
+
+
+def current_rss_bytes():
+    """A process rezidens memóriája (psutil, vagy Linuxon /proc); ha nem mérhető, None."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class MemoryBudgetError(Exception):
+    """A kérés nem fér bele a memória keretbe (too_large: önmagában sem férne bele soha)"""
+
+    def __init__(self, message, too_large=False, retry_after_sec=None):
+        super().__init__(message)
+        self.too_large = too_large
+        self.retry_after_sec = retry_after_sec
+
+
+class RequestMemory:
+    """Egy kérés memória nyilvántartása: foglalt becslés, induló és csúcs RSS"""
+
+    def __init__(self, name, reserved_bytes, start_rss):
+        self.name = name
+        self.reserved_bytes = reserved_bytes
+        self.start_rss = start_rss
+        self.peak_rss = start_rss
+        self.started_at = time.monotonic()
+
+    def peak_delta_bytes(self):
+        if self.start_rss is None:
+            return None
+        return max(0, self.peak_rss - self.start_rss)
+
+
+class MemoryGuard:
+    """
+    Processz szintű memória keret és kérésenkénti csúcsmemória mérés.
+    - reserve(): a kérés becsült (dekódolt) méretét a betöltés előtt lefoglalja; ha nem fér bele,
+      legfeljebb defer_timeout_sec-ig vár a többi kérés végére, utána MemoryBudgetError
+    - egy háttérszál sample_interval_sec-enként méri az RSS-t, és frissíti a futó kérések csúcsát
+    Az RSS process szintű, ezért párhuzamos kéréseknél a kérésenkénti csúcs közelítő érték.
+    """
+
+    def __init__(self, budget_mb=None, defer_timeout_sec=10, sample_interval_sec=0.05, history_size=500):
+        self.budget_bytes = int(budget_mb * MB) if budget_mb else None
+        self.defer_timeout_sec = defer_timeout_sec
+        self.sample_interval_sec = sample_interval_sec
+        self._cond = threading.Condition()
+        self._active = set()
+        self._reserved_bytes = 0
+        self._peak_history = deque(maxlen=history_size)
+        self._process_peak_rss = current_rss_bytes()
+        self._baseline_rss = None
+        self._rejected = 0
+        self._deferred = 0
+        self._sampler = None
+
+    def _ensure_sampler(self):
+        if self._sampler is None and current_rss_bytes() is not None:
+            self._sampler = threading.Thread(target=self._sample_loop, name='memory-sampler', daemon=True)
+            self._sampler.start()
+
+    def _sample_loop(self):
+        while True:
+            rss = current_rss_bytes()
+            with self._cond:
+                self._process_peak_rss = max(self._process_peak_rss or 0, rss)
+                for entry in self._active:
+                    entry.peak_rss = max(entry.peak_rss, rss)
+            time.sleep(self.sample_interval_sec)
+
+    def _fits(self, estimated_bytes, rss):
+        if self.budget_bytes is None or rss is None:
+            return True
+        # A még nem materializálódott foglalásokat is beszámítjuk (konzervatív)
+        return rss + self._reserved_bytes + estimated_bytes <= self.budget_bytes
+
+    def reserve(self, name, estimated_bytes):
+        """
+        Lefoglalja a kérés becsült memóriáját és elindítja a mérését. Visszaadja a RequestMemory-t,
+        amit a kérés végén release()-szel kell elengedni.
+        """
+        self._ensure_sampler()
+        estimated_bytes = int(max(0, estimated_bytes))
+        with self._cond:
+            rss = current_rss_bytes()
+            if rss is not None and not self._active:
+                # Üresjárati RSS (betöltött modell): ennél lejjebb a process nem megy
+                self._baseline_rss = rss if self._baseline_rss is None else min(self._baseline_rss, rss)
+            if self.budget_bytes is not None and self._baseline_rss is not None \
+                    and self._baseline_rss + estimated_bytes > self.budget_bytes:
+                # Üres szerveren sem férne bele, várni felesleges
+                self._rejected += 1
+                raise MemoryBudgetError(
+                    f"Estimated {estimated_bytes / MB:.0f} MB does not fit the "
+                    f"{self.budget_bytes / MB:.0f} MB memory budget (idle RSS {self._baseline_rss / MB:.0f} MB)",
+                    too_large=True
+                )
+            # Futó kérés nélkül a felszabadított, de az allokátornál maradt memória újrahasznosul
+            if self._active and not self._fits(estimated_bytes, rss):
+                self._deferred += 1
+                log.warning("Memória keret: %s várakozik (%.0f MB becsült)", name, estimated_bytes / MB)
+                deadline = time.monotonic() + self.defer_timeout_sec
+                while self._active and not self._fits(estimated_bytes, current_rss_bytes()):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._rejected += 1
+                        raise MemoryBudgetError(
+                            f"Memory budget exhausted ({self._reserved_bytes / MB:.0f} MB reserved)",
+                            retry_after_sec=max(1, int(math.ceil(self.defer_timeout_sec)))
+                        )
+                    self._cond.wait(remaining)
+                rss = current_rss_bytes()
+            entry = RequestMemory(name, estimated_bytes, rss)
+            self._active.add(entry)
+            self._reserved_bytes += estimated_bytes
+            return entry
+
+    def release(self, entry):
+        """Elengedi a foglalást, naplózza és a metrikákhoz rögzíti a kérés csúcsmemóriáját."""
+        if entry is None:
+            return
+        with self._cond:
+            if entry not in self._active:
+                return
+            self._active.discard(entry)
+            self._reserved_bytes -= entry.reserved_bytes
+            peak_delta = entry.peak_delta_bytes()
+            if peak_delta is not None:
+                self._peak_history.append(peak_delta)
+            self._cond.notify_all()
+        if peak_delta is not None:
+            log.debug("Memória: %s", entry.name, peak_delta_mb=round(peak_delta / MB, 1),
+                      reserved_mb=round(entry.reserved_bytes / MB, 1), peak_rss_mb=round(entry.peak_rss / MB))
+
+    def stats(self):
+        with self._cond:
+            peaks = sorted(self._peak_history)
+            rss = current_rss_bytes()
+            return {
+                "rss_mb": round(rss / MB, 1) if rss is not None else None,
+                "process_peak_rss_mb": round(self._process_peak_rss / MB, 1) if self._process_peak_rss else None,
+                "idle_rss_mb": round(self._baseline_rss / MB, 1) if self._baseline_rss else None,
+                "budget_mb": round(self.budget_bytes / MB, 1) if self.budget_bytes else None,
+                "reserved_mb": round(self._reserved_bytes / MB, 1),
+                "active_requests": len(self._active),
+                "request_peak_p50_mb": round(percentile(peaks, 0.50) / MB, 1) if peaks else None,
+                "request_peak_p95_mb": round(percentile(peaks, 0.95) / MB, 1) if peaks else None,
+                "request_peak_max_mb": round(peaks[-1] / MB, 1) if peaks else None,
+                "deferred": self._deferred,
+                "rejected": self._rejected,
+            }
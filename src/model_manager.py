@@ -0,0 +1,217 @@
+import threading
+import time
+import numpy as np
+import torch
+from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+from .tools import bcolors
+from .settings import get_settings, subscribe_settings
+from .model_store import find_variant, load_model, dtype_name, ModelStoreError, QUANTIZE_DYNAMIC_INT8
+from .thread_tuner import apply_thread_settings
+
+device = "cuda:0" if torch.cuda.is_available() else "cpu"
+torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+
+# Modell tier-ek: rövid klipekhez kicsi/gyors, hosszú vagy nehéz hanghoz nagy/pontos modell
+TIER_FAST = 'fast'
+TIER_ACCURATE = 'accurate'
+MODEL_TIERS = (TIER_FAST, TIER_ACCURATE)
+
+# Ezek változásakor a betöltött pipeline-ok elavulnak
+MODEL_SETTING_KEYS = ('ai_model', 'ai_model_fast', 'model_quantization', 'routing_enabled')
+
+# Betöltési állapotok (readiness)
+STATUS_NOT_LOADED = 'not_loaded'
+STATUS_LOADING = 'loading'
+STATUS_WARMING = 'warming'
+STATUS_READY = 'ready'
+STATUS_FAILED = 'failed'
+
+
+class ModelManager:
+    """
+    A tier-enkénti ASR pipeline-ok betöltése és rezidensen tartása.
+    Minden tier egyszer töltődik be, utána memóriában marad.
+    """
+
+    def __init__(self):
+        self._pipes = {}
+        self._model_ids = {}
+        self._lock = threading.Lock()
+        self.status = STATUS_NOT_LOADED
+        self.error = None
+        self.status_since = time.time()
+        subscribe_settings(self._on_settings_changed, keys=MODEL_SETTING_KEYS)
+
+    def _on_settings_changed(self, changed):
+        """
+        Modell beállítás változásakor az érintett tier-ek pipeline-ját eldobja; a következő
+        get_pipe() az új beállítással tölt be (a futó kérések a régi példányt használják végig).
+        """
+        with self._lock:
+            if 'model_quantization' in changed:
+                stale = list(self._pipes)
+            else:
+                stale = [tier for tier, model_id in self._model_ids.items() if model_id != self.model_id_for(tier)]
+            for tier in stale:
+                self._pipes.pop(tier, None)
+                self._model_ids.pop(tier, None)
+        if stale:
+            print(f"{bcolors.OKBLUE}[INFO] Modell beállítás változott ({', '.join(sorted(changed))}), "
+                  f"újratöltés a következő kérésnél: {', '.join(stale)}{bcolors.ENDC}")
+
+    def _set_status(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.status_since = time.time()
+
+    def is_ready(self):
+        return self.status == STATUS_READY
+
+    def status_info(self):
+        """Readiness információ a health endpoint-okhoz."""
+        return {
+            "model_status": self.status,
+            "status_since": self.status_since,
+            "models": dict(self._model_ids),
+            "error": self.error,
+        }
+
+    def model_id_for(self, tier):
+        """Visszaadja a tier-hez beállított modell azonosítót."""
+        settings = get_settings()
+        if tier == TIER_FAST:
+            return settings.get('ai_model_fast', 'openai/whisper-small')
+        return settings.get('ai_model', 'openai/whisper-large-v3-turbo')
+
+    def enabled_tiers(self):
+        """Routing nélkül csak a pontos modell kell."""
+        if get_settings().get('routing_enabled', False):
+            return MODEL_TIERS
+        return (TIER_ACCURATE,)
+
+    def load_all(self):
+        """Betölti az összes használt tier-t, hogy egyik se az első kérésnél töltődjön."""
+        for tier in self.enabled_tiers():
+            self.get_pipe(tier)
+
+    def start_background_load(self):
+        """Háttérszálon betölti és bemelegíti a modelleket; az állapot a status mezőben követhető."""
+        thread = threading.Thread(target=self._background_load, name='model-loader', daemon=True)
+        thread.start()
+        return thread
+
+    def _background_load(self):
+        try:
+            self._set_status(STATUS_LOADING)
+            self.load_all()
+            self._set_status(STATUS_WARMING)
+            self.warm_up()
+            self._set_status(STATUS_READY)
+            print(f"{bcolors.OKGREEN}[SUCCESS] Models loaded and warmed up, ready to serve{bcolors.ENDC}")
+        except Exception as e:
+            self._set_status(STATUS_FAILED, error=f"{type(e).__name__}: {str(e)}")
+            print(f"{bcolors.FAIL}[ERROR] Model loading failed: {str(e)}{bcolors.ENDC}")
+
+    def warm_up(self):
+        """
+        Néhány szintetikus inferencia tier-enként, hogy a kernel-ek és az allokátor
+        már az első valódi kérés előtt steady-state-ben legyenek.
+        """
+        durations = get_settings().get('warmup_durations_sec', [1, 5])
+        rng = np.random.default_rng(0)
+        warmed = set()
+        for tier in self.enabled_tiers():
+            pipe = self.get_pipe(tier)
+            if id(pipe) in warmed:
+                continue
+            warmed.add(id(pipe))
+            for duration_sec in durations:
+                # Halk zaj: valós méretű bemenet, a generálás rövidre korlátozva
+                samples = (rng.standard_normal(int(16000 * duration_sec)) * 0.001).astype(np.float32)
+                started = time.perf_counter()
+                pipe({"raw": samples, "sampling_rate": 16000}, generate_kwargs={"max_new_tokens": 16})
+                print(f"{bcolors.OKBLUE}[INFO] Warm-up {tier} {duration_sec}s: {time.perf_counter() - started:.2f}s{bcolors.ENDC}")
+
+    def get_pipe(self, tier):
+        """Visszaadja a tier pipeline-ját, szükség esetén betölti (thread-safe)."""
+        with self._lock:
+            if tier not in self._pipes:
+                model_id = self.model_id_for(tier)
+                # Ha a két tier ugyanazt a modellt használja, nem töltjük be kétszer
+                for loaded_tier, loaded_id in self._model_ids.items():
+                    if loaded_id == model_id:
+                        self._pipes[tier] = self._pipes[loaded_tier]
+                        break
+                else:
+                    self._pipes[tier] = self._load_pipe(model_id)
+                self._model_ids[tier] = model_id
+            return self._pipes[tier]
+
+    def _load_pipe(self, model_id):
+        settings = get_settings()
+        # Hangolt szálszámok / affinity, még az első torch művelet előtt (processenként egyszer)
+        apply_thread_settings(settings)
+        quantize = settings.get('model_quantization')
+        if quantize and (quantize != QUANTIZE_DYNAMIC_INT8 or device != "cpu"):
+            print(f"{bcolors.WARNING}[WARNING] Quantization '{quantize}' is not supported on {device}, ignored{bcolors.ENDC}")
+            quantize = None
+        # A dinamikus int8 kvantálás float32 modellből készül
+        load_dtype = torch.float32 if quantize else torch_dtype
+        print(f"{bcolors.OKBLUE}[INFO] Loading model: {model_id} ({device}, {load_dtype}, quantization: {quantize}){bcolors.ENDC}")
+
+        # Elsőként a helyi, előre konvertált store-ból (offline, konverzió nélkül)
+        directory = find_variant(model_id, dtype_name(load_dtype))
+        if directory:
+            print(f"{bcolors.OKBLUE}[INFO] Using local model store: {directory}{bcolors.ENDC}")
+            model, processor = load_model(
+                directory, load_dtype, quantize=quantize, full_verify=settings.get('model_store_full_verify', False)
+            )
+        elif settings.get('model_store_offline', False):
+            raise ModelStoreError(
+                f"Model {model_id} ({dtype_name(load_dtype)}) is not in the local store and offline mode is enabled"
+            )
+        else:
+            model = AutoModelForSpeechSeq2Seq.from_pretrained(
+                model_id, torch_dtype=load_dtype, low_cpu_mem_usage=True, use_safetensors=True
+            )
+            if quantize:
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            processor = AutoProcessor.from_pretrained(model_id)
+        model.to(device)
+
+        pipe = pipeline(
+            "automatic-speech-recognition",
+            model=model,
+            tokenizer=processor.tokenizer,
+            feature_extractor=processor.feature_extractor,
+            torch_dtype=load_dtype,
+            device=device,
+        )
+        print(f"{bcolors.OKGREEN}[SUCCESS] Model loaded: {model_id}{bcolors.ENDC}")
+        return pipe
+
+
+def choose_tier(duration_sec, queue_load=None, hint=None):
+    """
+    Kiválasztja a tier-t a hang hossza, opcionálisan a sor terhelése és a kliens hint alapján.
+    Visszaad egy (tier, reason) párt.
+    """
+    settings = get_settings()
+    if not settings.get('routing_enabled', False):
+        return TIER_ACCURATE, 'routing disabled'
+    # Kliens hint felülírja az automatikus döntést
+    if hint in MODEL_TIERS:
+        return hint, f'client hint: {hint}'
+    fast_max_sec = settings.get('routing_fast_max_sec', 8)
+    reason = ''
+    # Terhelés alatt hosszabb klipek is a gyors modellre mennek
+    busy_queue_len = settings.get('routing_busy_queue_len', 3)
+    if queue_load is not None and queue_load >= busy_queue_len:
+        fast_max_sec = settings.get('routing_busy_fast_max_sec', 20)
+        reason = f'queue load {queue_load} >= {busy_queue_len}, '
+    if duration_sec <= fast_max_sec:
+        return TIER_FAST, f'{reason}duration {duration_sec:.1f}s <= {fast_max_sec}s'
+    return TIER_ACCURATE, f'{reason}duration {duration_sec:.1f}s > {fast_max_sec}s'
+
+
+model_manager = ModelManager()
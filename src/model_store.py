@@ -0,0 +1,204 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import torch
+import transformers
+from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor
+from .tools import bcolors
+
+# Get the project root directory (one level up from src)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCAL_MODELS_DIR = os.path.join(PROJECT_ROOT, 'local-models')
+MANIFEST_NAME = 'manifest.json'
+
+# Tárolható dtype variánsok
+DTYPES = {
+    'float32': torch.float32,
+    'float16': torch.float16,
+    'bfloat16': torch.bfloat16,
+}
+# Betöltéskori kvantálás (CPU): a float32 variánsból készül, a Linear rétegek int8-ra
+QUANTIZE_DYNAMIC_INT8 = 'dynamic-int8'
+QUANTIZATIONS = (QUANTIZE_DYNAMIC_INT8,)
+
+
+class ModelStoreError(Exception):
+    """Kivétel osztály a helyi model store hibáihoz (hiányzó variáns, sérült fájl)"""
+    pass
+
+
+def dtype_name(torch_dtype):
+    """torch dtype -> tárolási variáns neve"""
+    for name, value in DTYPES.items():
+        if value == torch_dtype:
+            return name
+    raise ModelStoreError(f"Unsupported dtype: {torch_dtype}")
+
+
+def variant_dir(model_id, dtype, store_dir=LOCAL_MODELS_DIR):
+    """A modell variáns könyvtára: local-models/<org>--<name>/<dtype>"""
+    return os.path.join(store_dir, model_id.replace('/', '--'), dtype)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _list_files(directory):
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name != MANIFEST_NAME:
+                files.append(os.path.relpath(os.path.join(root, name), directory).replace(os.sep, '/'))
+    return sorted(files)
+
+
+def snapshot(model_id, dtype='float16', store_dir=LOCAL_MODELS_DIR):
+    """
+    Letölti/betölti a modellt, a cél dtype-ra konvertálja, és safetensors formában (mmap-elhető)
+    elmenti a processorral együtt. A manifest a fájlok sha256 checksum-ait tartalmazza.
+    A mentés egy ideiglenes könyvtárba történik, és csak a végén kerül a helyére (atomi csere).
+    """
+    if dtype not in DTYPES:
+        raise ModelStoreError(f"Unsupported dtype: {dtype} (allowed: {', '.join(DTYPES)})")
+    target_dir = variant_dir(model_id, dtype, store_dir)
+    temp_dir = target_dir + '.tmp'
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    print(f"{bcolors.OKBLUE}[INFO] Snapshot készítése: {model_id} ({dtype}) -> {target_dir}{bcolors.ENDC}")
+
+    model = AutoModelForSpeechSeq2Seq.from_pretrained(
+        model_id, torch_dtype=DTYPES[dtype], low_cpu_mem_usage=True, use_safetensors=True
+    )
+    processor = AutoProcessor.from_pretrained(model_id)
+    model.save_pretrained(temp_dir, safe_serialization=True)
+    processor.save_pretrained(temp_dir)
+
+    manifest = {
+        'model_id': model_id,
+        'dtype': dtype,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'transformers_version': transformers.__version__,
+        'torch_version': torch.__version__,
+        'files': {
+            name: {
+                'sha256': _sha256(os.path.join(temp_dir, name)),
+                'size': os.path.getsize(os.path.join(temp_dir, name)),
+            }
+            for name in _list_files(temp_dir)
+        },
+    }
+    with open(os.path.join(temp_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(target_dir, ignore_errors=True)
+    os.replace(temp_dir, target_dir)
+    print(f"{bcolors.OKGREEN}[SUCCESS] Snapshot kész: {target_dir} ({len(manifest['files'])} fájl){bcolors.ENDC}")
+    return target_dir
+
+
+def read_manifest(directory):
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def verify(directory, full=True):
+    """
+    Ellenőrzi a variánst a manifest alapján. full=True: sha256 minden fájlra,
+    full=False: csak létezés és méret (olcsó, indításkor ezt használjuk alapból).
+    Hiba esetén ModelStoreError-t dob.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise ModelStoreError(f"Manifest not found in {directory}")
+    for name, info in manifest['files'].items():
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            raise ModelStoreError(f"Missing file: {path}")
+        if os.path.getsize(path) != info['size']:
+            raise ModelStoreError(f"Size mismatch: {path}")
+        if full and _sha256(path) != info['sha256']:
+            raise ModelStoreError(f"Checksum mismatch: {path}")
+    return manifest
+
+
+def find_variant(model_id, dtype, store_dir=LOCAL_MODELS_DIR):
+    """Visszaadja a variáns könyvtárát, ha létezik benne manifest, egyébként None."""
+    directory = variant_dir(model_id, dtype, store_dir)
+    if read_manifest(directory) is None:
+        return None
+    return directory
+
+
+def load_model(directory, torch_dtype, quantize=None, full_verify=False):
+    """
+    Betölti a modellt és a processort a store-ból, teljesen offline (local_files_only).
+    A dtype egyezik a tárolttal, így nincs konverzió; a safetensors fájlok mmap-pel töltődnek.
+    """
+    manifest = verify(directory, full=full_verify)
+    if DTYPES[manifest['dtype']] != torch_dtype:
+        raise ModelStoreError(f"Stored dtype {manifest['dtype']} does not match requested {torch_dtype}")
+    model = AutoModelForSpeechSeq2Seq.from_pretrained(
+        directory, torch_dtype=torch_dtype, low_cpu_mem_usage=True, use_safetensors=True, local_files_only=True
+    )
+    if quantize == QUANTIZE_DYNAMIC_INT8:
+        # A dinamikus int8 kvantálás csak float32 CPU modellen értelmezett
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    processor = AutoProcessor.from_pretrained(directory, local_files_only=True)
+    return model, processor
+
+
+def list_variants(store_dir=LOCAL_MODELS_DIR):
+    """A store összes variánsa (model_id, dtype, könyvtár, méret)."""
+    variants = []
+    if not os.path.isdir(store_dir):
+        return variants
+    for model_dir in sorted(os.listdir(store_dir)):
+        for dtype in sorted(DTYPES):
+            manifest = read_manifest(os.path.join(store_dir, model_dir, dtype))
+            if manifest:
+                size = sum(info['size'] for info in manifest['files'].values())
+                variants.append((manifest['model_id'], dtype, os.path.join(store_dir, model_dir, dtype), size))
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Helyi, előre konvertált model store kezelése.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    snapshot_parser = subparsers.add_parser('snapshot', help='Modell mentése a store-ba')
+    snapshot_parser.add_argument('model_id')
+    snapshot_parser.add_argument('--dtype', choices=sorted(DTYPES), default='float16')
+    verify_parser = subparsers.add_parser('verify', help='Checksum ellenőrzés')
+    verify_parser.add_argument('model_id')
+    verify_parser.add_argument('--dtype', choices=sorted(DTYPES), default='float16')
+    subparsers.add_parser('list', help='Tárolt variánsok listázása')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'snapshot':
+            snapshot(args.model_id, args.dtype)
+        elif args.command == 'verify':
+            directory = variant_dir(args.model_id, args.dtype)
+            verify(directory, full=True)
+            print(f"{bcolors.OKGREEN}[SUCCESS] Ellenőrzés rendben: {directory}{bcolors.ENDC}")
+        else:
+            for model_id, dtype, directory, size in list_variants():
+                print(f"{model_id:<40} {dtype:<10} {size / (1024 * 1024):>10.1f} MB  {directory}")
+    except ModelStoreError as e:
+        print(f"{bcolors.FAIL}[ERROR] {str(e)}{bcolors.ENDC}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import threading
+import queue
+import time
+import pyperclip
+from pynput import keyboard
+from pynput.keyboard import Key
+from .tools import get_logger
+
+# Támogatott kimeneti módok
+OUTPUT_MODE_PASTE = 'paste'  # vágólap + Ctrl+V batch-ekben
+OUTPUT_MODE_TYPE = 'type'    # közvetlen szintetikus gépelés
+OUTPUT_MODES = (OUTPUT_MODE_PASTE, OUTPUT_MODE_TYPE)
+
+log = get_logger('output')
+
+
+class TextOutputEngine:
+    """
+    Inkrementális szöveg kimenet a fókuszban lévő alkalmazásba.
+    Az emit() hívások egy háttér worker-be kerülnek, így a felismerés nem vár a beillesztésre.
+    Paste módban a vágólap korábbi tartalmát a beillesztés után visszaállítja.
+    """
+
+    def __init__(self, mode=OUTPUT_MODE_PASTE, restore_clipboard=True, batch_window=0.15,
+                 ready_timeout=0.5, restore_delay=0.25, hold_timeout=10):
+        self.mode = mode if mode in OUTPUT_MODES else OUTPUT_MODE_PASTE
+        self.restore_clipboard = restore_clipboard
+        # Ennyi ideig gyűjtjük a gyorsan egymás után érkező darabokat egy beillesztésbe
+        self.batch_window = batch_window
+        # Maximális várakozás arra, hogy a vágólap tényleg a mi szövegünket adja vissza
+        self.ready_timeout = ready_timeout
+        # A célalkalmazásnak idő kell a beillesztés kiolvasásához, mielőtt visszaállítjuk a vágólapot
+        self.restore_delay = restore_delay
+        # Biztonsági határ: elveszett billentyű felengedés esetén se ragadjon be a kimenet
+        self.hold_timeout = hold_timeout
+        self._queue = queue.Queue()
+        self._open = threading.Event()
+        self._open.set()
+        self._last_char = ''
+        self._controller = keyboard.Controller()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def emit(self, text):
+        """Sorba állít egy megerősített szövegdarabot kiírásra."""
+        if text and text.strip():
+            self._queue.put(text.strip())
+
+    def begin(self):
+        """
+        Új diktálás kezdete: az előző diktálás utolsó karakteréhez már nem illesztünk szóközt
+        (a fókusz közben másik alkalmazásba vagy üres mezőbe kerülhetett).
+        """
+        self._last_char = ''
+
+    def hold(self):
+        """
+        Visszatartja a kiírást (amíg a Ctrl / Win fizikailag le van nyomva, különben a Ctrl+V
+        és a gépelés módosító billentyűkkel keveredne). A darabok közben gyűlnek.
+        """
+        self._open.clear()
+
+    def release(self):
+        """Feloldja a visszatartást, a felgyűlt darabok kiíródnak."""
+        self._open.set()
+
+    def flush(self):
+        """Megvárja, amíg minden sorba állított darab kiíródik."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            parts = [first]
+            try:
+                if not self._open.wait(self.hold_timeout):
+                    log.warning("A módosító billentyűk felengedése nem érkezett meg, kiírás így is...")
+                # Batch: a közben érkezett darabokat egyben írjuk ki
+                deadline = time.monotonic() + self.batch_window
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        parts.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                text = self._join_parts(parts)
+                if self.mode == OUTPUT_MODE_TYPE:
+                    self._type_text(text)
+                else:
+                    self._paste_text(text)
+                self._last_char = text[-1:]
+            except Exception as e:
+                log.error("Hiba a szöveg kiírása során: %s", e)
+            finally:
+                for _ in parts:
+                    self._queue.task_done()
+
+    def _join_parts(self, parts):
+        """Összefűzi a darabokat, a korábban kiírt szöveghez szóközzel illesztve."""
+        text = ' '.join(parts)
+        if self._last_char and not self._last_char.isspace():
+            text = ' ' + text
+        return text
+
+    def _wait_clipboard_ready(self, text):
+        """
+        Fix sleep helyett addig poll-oljuk a vágólapot (növekvő várakozással),
+        amíg a mi szövegünket adja vissza. True, ha időben elkészült.
+        """
+        deadline = time.monotonic() + self.ready_timeout
+        delay = 0.002
+        while True:
+            try:
+                if pyperclip.paste() == text:
+                    return True
+            except Exception:
+                pass
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def _paste_text(self, text):
+        previous = None
+        if self.restore_clipboard:
+            try:
+                previous = pyperclip.paste()
+            except Exception as e:
+                log.warning("Vágólap tartalma nem menthető: %s", e)
+        pyperclip.copy(text)
+        if not self._wait_clipboard_ready(text):
+            log.warning("A vágólap nem frissült időben, beillesztés így is...")
+        # Ctrl+V automatikus beillesztés
+        self._controller.press(Key.ctrl)
+        self._controller.press('v')
+        self._controller.release('v')
+        self._controller.release(Key.ctrl)
+        log.debug("Szöveg beillesztve (%s karakter)", len(text))
+        if previous is not None:
+            time.sleep(self.restore_delay)
+            try:
+                # Csak akkor állítjuk vissza, ha közben senki más nem írt a vágólapra
+                if pyperclip.paste() == text:
+                    pyperclip.copy(previous)
+            except Exception as e:
+                log.warning("Vágólap visszaállítása sikertelen: %s", e)
+
+    def _type_text(self, text):
+        self._controller.type(text)
+        log.debug("Szöveg begépelve (%s karakter)", len(text))
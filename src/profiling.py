@@ -0,0 +1,223 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from .tools import bcolors
+
+# Profilozási módok
+MODE_SAMPLE = 'sample'
+MODE_CPROFILE = 'cprofile'
+MODE_TRACEMALLOC = 'tracemalloc'
+MODES = (MODE_SAMPLE, MODE_CPROFILE, MODE_TRACEMALLOC)
+
+# Kimeneti formátumok
+FORMAT_COLLAPSED = 'collapsed'
+FORMAT_PSTATS = 'pstats'
+FORMAT_TEXT = 'text'
+DEFAULT_FORMATS = {
+    MODE_SAMPLE: FORMAT_COLLAPSED,
+    MODE_CPROFILE: FORMAT_PSTATS,
+    MODE_TRACEMALLOC: FORMAT_TEXT,
+}
+SUPPORTED_FORMATS = {
+    MODE_SAMPLE: (FORMAT_COLLAPSED,),
+    MODE_CPROFILE: (FORMAT_PSTATS, FORMAT_TEXT),
+    MODE_TRACEMALLOC: (FORMAT_TEXT, FORMAT_COLLAPSED),
+}
+
+
+class ProfilingError(Exception):
+    """Kivétel osztály a profilozási munkamenet hibáihoz (érvénytelen paraméter, már fut egy)"""
+    pass
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfileSession:
+    """
+    Egy futó szerver process profilozása adott ideig vagy adott számú kérésig.
+    - sample: sys._current_frames() mintavétel háttérszálon, minden szálra (collapsed stacks)
+    - cprofile: a kéréseket kiszolgáló szálakon determinisztikus profil (pstats)
+    - tracemalloc: allokációk snapshot-ja a munkamenet végén (top sorok / collapsed stacks bájtban)
+    """
+
+    def __init__(self, mode, seconds, requests=None, interval_sec=0.005, top=50):
+        if mode not in MODES:
+            raise ProfilingError(f"Unknown mode: {mode} (allowed: {', '.join(MODES)})")
+        self.mode = mode
+        self.seconds = seconds
+        self.requests = requests
+        self.interval_sec = interval_sec
+        self.top = top
+        self.started_at = None
+        self.finished_at = None
+        self.request_count = 0
+        self.sample_count = 0
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._samples = Counter()
+        self._sampler = None
+        self._thread_profiles = {}
+        self._stats = None
+        self._snapshot = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        self.started_at = time.monotonic()
+        if self.mode == MODE_SAMPLE:
+            self._sampler = threading.Thread(target=self._sample_loop, name='profile-sampler', daemon=True)
+            self._sampler.start()
+        elif self.mode == MODE_TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self._started_tracemalloc = True
+
+    def wait(self):
+        """Blokkol a megadott ideig, vagy amíg a kért számú kérés le nem fut."""
+        self._done.wait(self.seconds)
+        self.stop()
+
+    def stop(self):
+        with self._lock:
+            if self.finished_at is not None:
+                return
+            self.finished_at = time.monotonic()
+        self._done.set()
+        if self._sampler:
+            self._sampler.join()
+        if self.mode == MODE_TRACEMALLOC:
+            self._snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            ))
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while not self._done.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._samples[';'.join(reversed(stack))] += 1
+            self.sample_count += 1
+            time.sleep(self.interval_sec)
+
+    def on_request_start(self):
+        """Kérés kezdete (before_request); cprofile módban a kérés szálán elindul a profiler."""
+        if self.mode != MODE_CPROFILE or self._done.is_set():
+            return
+        profile = cProfile.Profile()
+        self._thread_profiles[threading.get_ident()] = profile
+        profile.enable()
+
+    def on_request_end(self):
+        """Kérés vége (teardown_request); a szál profilja hozzáadódik az összesítéshez."""
+        profile = self._thread_profiles.pop(threading.get_ident(), None)
+        if profile is not None:
+            profile.disable()
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+        with self._lock:
+            self.request_count += 1
+            reached = self.requests and self.request_count >= self.requests
+        if reached:
+            self._done.set()
+
+    def summary(self):
+        return {
+            "mode": self.mode,
+            "duration_sec": round((self.finished_at or time.monotonic()) - self.started_at, 3),
+            "requests": self.request_count,
+            "samples": self.sample_count,
+        }
+
+    def render(self, fmt=None):
+        """Visszaad egy (body, mimetype, filename) hármast a kért formátumban."""
+        fmt = fmt or DEFAULT_FORMATS[self.mode]
+        if fmt not in SUPPORTED_FORMATS[self.mode]:
+            raise ProfilingError(f"Format {fmt} is not supported for {self.mode}")
+        if self.mode == MODE_SAMPLE:
+            body = ''.join(f"{stack} {count}\n" for stack, count in self._samples.most_common())
+            return body, 'text/plain', 'profile.collapsed'
+        if self.mode == MODE_CPROFILE:
+            if self._stats is None:
+                raise ProfilingError("No request finished during the profiling window")
+            if fmt == FORMAT_PSTATS:
+                # pstats bináris formátum (python -m pstats, snakeviz); csak fájlba írható
+                fd, path = tempfile.mkstemp(suffix='.pstats')
+                os.close(fd)
+                try:
+                    self._stats.dump_stats(path)
+                    with open(path, 'rb') as f:
+                        return f.read(), 'application/octet-stream', 'profile.pstats'
+                finally:
+                    os.remove(path)
+            out = io.StringIO()
+            pstats.Stats(self._stats, stream=out).sort_stats('cumulative').print_stats(self.top)
+            return out.getvalue(), 'text/plain', 'profile.txt'
+        if fmt == FORMAT_COLLAPSED:
+            # Allokációs stack-ek bájtban súlyozva (flamegraph-hoz)
+            lines = []
+            for stat in self._snapshot.statistics('traceback'):
+                frames = ';'.join(f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in reversed(stat.traceback))
+                lines.append(f"{frames} {stat.size}\n")
+            return ''.join(lines), 'text/plain', 'memory.collapsed'
+        stats = self._snapshot.statistics('lineno')
+        lines = [f"Total traced: {sum(stat.size for stat in stats) / 1024:.1f} KiB\n"]
+        lines.extend(f"{stat}\n" for stat in stats[:self.top])
+        return ''.join(lines), 'text/plain', 'memory.txt'
+
+
+class Profiler:
+    """Egyszerre egy aktív munkamenet; a kérés hook-ok ezen keresztül érik el."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.session = None
+
+    def run(self, mode, seconds, requests=None, interval_sec=0.005):
+        """Elindít és végigvár egy munkamenetet, majd visszaadja azt."""
+        session = ProfileSession(mode, seconds, requests=requests, interval_sec=interval_sec)
+        with self._lock:
+            if self.session is not None:
+                raise ProfilingError("A profiling session is already running")
+            self.session = session
+        print(f"{bcolors.WARNING}[PROFILE] Profiling started: {mode}, {seconds}s, requests: {requests}{bcolors.ENDC}")
+        try:
+            session.start()
+            session.wait()
+        finally:
+            with self._lock:
+                self.session = None
+        print(f"{bcolors.WARNING}[PROFILE] Profiling finished: {session.summary()}{bcolors.ENDC}")
+        return session
+
+    def on_request_start(self):
+        session = self.session
+        if session:
+            session.on_request_start()
+
+    def on_request_end(self):
+        session = self.session
+        if session:
+            session.on_request_end()
+
+
+profiler = Profiler()
@@ -1,76 +1,314 @@
-import torch
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
-from datasets import load_dataset
-from .tools import bcolors
+from .tools import get_logger
+from .model_manager import model_manager, choose_tier
+from .settings import get_settings
+from .audio_utils import probe_duration, decode_audio, decode_to_scratch, TARGET_SAMPLE_RATE
+from .generation_guard import GenerationGuard, REASON_REPETITION
 import os
+import numpy as np
 from pydub import AudioSegment
 
+# Kérésenkénti részletek debug szinten, a háttérszálon kiírva (a felismerés útját nem lassítja)
+log = get_logger('recognition')
+
 class SpeechRecognitionError(Exception):
     """Kivétel osztály a beszédfelismerési hibák kezelésére"""
     pass
 
-device = "cuda:0" if torch.cuda.is_available() else "cpu"
-torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-
-model_id = "openai/whisper-large-v3-turbo"
-
-model = AutoModelForSpeechSeq2Seq.from_pretrained(
-    model_id, torch_dtype=torch_dtype, low_cpu_mem_usage=True, use_safetensors=True
-)
-model.to(device)
-
-processor = AutoProcessor.from_pretrained(model_id)
-
-pipe = pipeline(
-    "automatic-speech-recognition",
-    model=model,
-    tokenizer=processor.tokenizer,
-    feature_extractor=processor.feature_extractor,
-    torch_dtype=torch_dtype,
-    device=device,
-)
+def route_request(duration_sec, queue_load=None, hint=None):
+  """Tier választás (rövid klip -> gyors modell, hosszú -> pontos modell), az eredményben riportálva"""
+  tier, reason = choose_tier(duration_sec, queue_load=queue_load, hint=hint)
+  return {
+      "tier": tier,
+      "model_id": model_manager.model_id_for(tier),
+      "reason": reason,
+      "duration_sec": duration_sec,
+  }
 
-def process_audio(file_path):
+def process_audio(file_path, hint=None, queue_load=None):
   try:
-    print(f"{bcolors.OKBLUE}[INFO] Loading audio file: {file_path}{bcolors.ENDC}")
+    log.debug("Loading audio file: %s", file_path)
     if not os.path.exists(file_path):
       raise FileNotFoundError(f"Audio file not found: {file_path}")
     
     if os.path.getsize(file_path) == 0:
       raise ValueError(f"Audio file is empty: {file_path}")
       
-    # Determine audio duration
-    audio = AudioSegment.from_file(file_path)
-    duration_sec = len(audio) / 1000.0
-    print(f"{bcolors.OKBLUE}[INFO] Audio duration: {duration_sec:.2f} seconds{bcolors.ENDC}")
+    # Determine audio duration (header-only probe, the file is not decoded here)
+    duration_sec = probe_duration(file_path)
+    if duration_sec is None:
+      audio = AudioSegment.from_file(file_path)
+      duration_sec = len(audio) / 1000.0
+      del audio
+    log.debug("Audio duration: %.2f seconds", duration_sec)
+
+    # Hosszú felvétel: memory-mapped scratch fájlból, ablakonként, állandó memóriával
+    if duration_sec > get_settings().get('long_audio_threshold_sec', 600):
+      log.info("Long recording, switching to memory-bounded windowed mode")
+      return process_long_audio(file_path, hint=hint, queue_load=queue_load)
     
-    print(f"{bcolors.OKBLUE}[INFO] Starting speech recognition...{bcolors.ENDC}")
-    if duration_sec > 30:
-      print(f"{bcolors.WARNING}[INFO] Audio longer than 30s, enabling return_timestamps=True for long-form recognition{bcolors.ENDC}")
-      result = pipe(file_path, return_timestamps=True)
+    # Decode stage, majd feature extraction és inference
+    samples = decode_audio(file_path)
+    prepared = prepare_samples(samples, hint=hint, queue_load=queue_load)
+    return run_prepared(prepared, file_path=file_path)
+  except Exception as e:
+    return _failed_result(file_path, e)
+
+
+def _failed_result(file_path, e):
+  log.error("Failed to process audio: %s", e, error_type=type(e).__name__, details=repr(e))
+  
+  return {
+      "file_path": file_path,
+      "status": "failed",
+      "error": str(e),
+      "error_type": type(e).__name__
+  }
+
+
+def prepare_samples(samples, hint=None, queue_load=None):
+  """
+  Decode utáni előkészítő stage (az inference slot-on kívül futtatható):
+  tier választás, és 30s-ig a log-mel feature extraction is itt történik.
+  Hosszabb hangnál a nyers minták maradnak, azokat a pipeline chunk-olja.
+  """
+  duration_sec = len(samples) / float(TARGET_SAMPLE_RATE)
+  routing = route_request(duration_sec, queue_load=queue_load, hint=hint)
+  log.debug("Routing: %s (%s) - %s", routing['tier'], routing['model_id'], routing['reason'])
+  prepared = {"routing": routing, "samples": samples, "features": None}
+  if duration_sec <= 30:
+    pipe = model_manager.get_pipe(routing['tier'])
+    prepared["features"] = pipe.feature_extractor(
+        samples, sampling_rate=TARGET_SAMPLE_RATE, return_tensors="pt"
+    ).input_features
+    prepared["samples"] = None
+  return prepared
+
+
+def run_prepared(prepared, file_path=None):
+  """Inference stage: csak a modell futtatása (ez az egyetlen rész, amit sorosítani kell)"""
+  try:
+    routing = prepared["routing"]
+    pipe = model_manager.get_pipe(routing['tier'])
+
+    # Token keret, határidő és hurok felismerés: egy elakadt dekódolás sem foglalja sokáig a slot-ot
+    guard = GenerationGuard(routing['duration_sec'])
+    log.debug("Starting speech recognition...")
+    if prepared["features"] is not None:
+      # Előre kiszámolt feature-ök: közvetlen generate, a pipeline preprocess kihagyásával
+      model = pipe.model
+      features = prepared["features"].to(model.device, dtype=model.dtype)
+      predicted_ids = model.generate(input_features=features, **guard.generate_kwargs())
+      result = {"text": pipe.tokenizer.batch_decode(predicted_ids, skip_special_tokens=True)[0]}
     else:
-      result = pipe(file_path)
-    print(f"{bcolors.OKBLUE}[INFO] Speech recognition completed{bcolors.ENDC}")
+      log.debug("Audio longer than 30s, enabling return_timestamps=True for long-form recognition")
+      result = pipe(
+          {"raw": prepared["samples"], "sampling_rate": TARGET_SAMPLE_RATE},
+          return_timestamps=True, generate_kwargs=guard.generate_kwargs()
+      )
+    result = guard.finish(result)
+    if result["partial"]:
+      log.warning("Generation stopped early (%s), returning partial result", ', '.join(result['generation']['stopped_by']))
+    log.debug("Speech recognition completed")
     if result.get("status") == "failed":
-        print(f"{bcolors.FAIL}[ERROR] Speech recognition failed with status: failed{bcolors.ENDC}")
-        print(f"{bcolors.FAIL}[ERROR] Result: {result}{bcolors.ENDC}")
+        log.error("Speech recognition failed with status: failed")
+        log.debug("Result: %s", result)
         raise SpeechRecognitionError(f"Speech recognition failed: {result.get('error', result)}")
         
     return {
         "file_path": file_path,
         "result": result,
+        "routing": routing,
+        "partial": result["partial"],
         "status": "processed",
         "message": "Audio processing completed successfully"
     }
   except Exception as e:
-    print(f'\n{bcolors.FAIL}[ERROR] Failed to process audio!')
-    print(f'Error type: {type(e).__name__}')
-    print(f'Error message: {str(e)}')
-    print(f'Error details: {repr(e)}{bcolors.ENDC}\n')
-    
+    return _failed_result(file_path, e)
+
+
+def transcribe_samples(samples_list, sampling_rate=16000, batch_size=8, hint=None):
+  """
+  Előre dekódolt (mono float32) hangok batch-elt felismerése.
+  A hangokat tier és hossz szerint csoportosítja, csoportonként egy pipeline hívással.
+  Az eredmények sorrendje megegyezik a bemenetével.
+  """
+  results = [None] * len(samples_list)
+  groups = {}
+  for index, samples in enumerate(samples_list):
+    duration_sec = len(samples) / float(sampling_rate)
+    routing = route_request(duration_sec, hint=hint)
+    # 30s felett long-form felismerés kell (return_timestamps=True), ezt külön csoportba tesszük
+    long_form = duration_sec > 30
+    groups.setdefault((routing['tier'], long_form), []).append((index, routing))
+
+  for (tier, long_form), items in groups.items():
+    pipe = model_manager.get_pipe(tier)
+    # A csoport közös kerete a leghosszabb hang és az összes hang hossza alapján
+    durations = [len(samples_list[index]) / float(sampling_rate) for index, _ in items]
+    guard = GenerationGuard(max(durations), deadline_audio_sec=sum(durations))
+    kwargs = {"batch_size": batch_size, "generate_kwargs": guard.generate_kwargs()}
+    if long_form:
+      kwargs["return_timestamps"] = True
+    # A pipeline módosítja a bemeneti dict-et, ezért mindig újat adunk át
+    inputs = [{"raw": samples_list[index], "sampling_rate": sampling_rate} for index, _ in items]
+    try:
+      outputs = pipe(inputs, **kwargs)
+    except Exception as e:
+      log.warning("Batch recognition failed (%s), retrying items one by one...", e)
+      outputs = []
+      for index, _ in items:
+        try:
+          outputs.append(pipe({"raw": samples_list[index], "sampling_rate": sampling_rate}, **kwargs))
+        except Exception as item_error:
+          outputs.append(item_error)
+    for (index, routing), output in zip(items, outputs):
+      if isinstance(output, Exception):
+        results[index] = {
+            "status": "failed",
+            "routing": routing,
+            "error": str(output),
+            "error_type": type(output).__name__
+        }
+      else:
+        # A leállás oka csoport szintű, a szöveg végi hurok soronként ellenőrződik
+        item_guard = GenerationGuard(routing['duration_sec'])
+        item_guard.reasons = [reason for reason in guard.reasons if reason != REASON_REPETITION]
+        output = item_guard.finish(output)
+        results[index] = {
+            "result": output,
+            "routing": routing,
+            "partial": output.get("partial", False),
+            "status": "processed",
+        }
+  return results
+
+
+def find_window_end(samples, start, window_len, search_len):
+  """
+  A következő ablak vége: a névleges határ előtti search_len mintán belül a legcsendesebb
+  20 ms-os frame, hogy ne vágjunk szó közepébe.
+  """
+  total = len(samples)
+  if start + window_len >= total:
+    return total
+  frame_len = TARGET_SAMPLE_RATE // 50
+  search_start = start + window_len - search_len
+  frames = np.asarray(samples[search_start:start + window_len], dtype=np.float32)
+  frame_count = len(frames) // frame_len
+  if frame_count == 0:
+    return start + window_len
+  energies = np.abs(frames[:frame_count * frame_len]).reshape(frame_count, frame_len).mean(axis=1)
+  return search_start + (int(np.argmin(energies)) + 1) * frame_len
+
+
+def iter_long_audio(file_path, hint=None, queue_load=None, scratch_dir=None, scratch_path=None):
+  """
+  Generator: a hangot egyszer dekódolja egy 16 kHz-es PCM scratch fájlba, majd np.memmap-en keresztül
+  fix méretű ablakonként ismeri fel, és ablakonként yield-eli a szegmens eredményt.
+  A memóriahasználat az ablakmérettől függ, nem a felvétel hosszától.
+  Az első yield a routing információ ({"type": "routing", ...}), utána {"type": "segment", ...} elemek jönnek.
+  Ha scratch_path meg van adva (már dekódolt scratch fájl), azt használja, és a végén törli.
+  """
+  if scratch_path is None:
+    scratch_path = decode_to_scratch(file_path, scratch_dir=scratch_dir)
+  samples = None
+  try:
+    if os.path.getsize(scratch_path) == 0:
+      raise ValueError(f"Decoded audio is empty: {file_path}")
+    samples = np.memmap(scratch_path, dtype=np.int16, mode='r')
+    total = len(samples)
+    duration_sec = total / float(TARGET_SAMPLE_RATE)
+    routing = route_request(duration_sec, queue_load=queue_load, hint=hint)
+    pipe = model_manager.get_pipe(routing['tier'])
+    yield dict(routing, type="routing")
+
+    window_len = int(get_settings().get('long_audio_window_sec', 30) * TARGET_SAMPLE_RATE)
+    search_len = min(window_len // 4, 2 * TARGET_SAMPLE_RATE)
+    start = 0
+    index = 0
+    while start < total:
+      end = find_window_end(samples, start, window_len, search_len)
+      # Csak az aktuális ablak kerül float32-ként memóriába
+      window = np.asarray(samples[start:end], dtype=np.float32) / 32768.0
+      guard = GenerationGuard((end - start) / float(TARGET_SAMPLE_RATE))
+      output = guard.finish(pipe(
+          {"raw": window, "sampling_rate": TARGET_SAMPLE_RATE},
+          return_timestamps=True, generate_kwargs=guard.generate_kwargs()
+      ))
+      offset = start / float(TARGET_SAMPLE_RATE)
+      chunks = []
+      for chunk in output.get("chunks", []):
+        chunk_start, chunk_end = chunk.get("timestamp", (None, None))
+        chunks.append({
+            "text": chunk.get("text", ""),
+            "timestamp": (
+                offset + chunk_start if chunk_start is not None else None,
+                offset + chunk_end if chunk_end is not None else None,
+            ),
+        })
+      yield {
+          "type": "segment",
+          "index": index,
+          "start_sec": offset,
+          "end_sec": end / float(TARGET_SAMPLE_RATE),
+          "text": output.get("text", "").strip(),
+          "chunks": chunks,
+          "partial": output.get("partial", False),
+      }
+      log.debug("Long audio window %s done (%.0f/%.0fs)", index, end / float(TARGET_SAMPLE_RATE), duration_sec)
+      start = end
+      index += 1
+  finally:
+    # A memmap-et el kell engedni törlés előtt (Windows-on különben zárolva marad)
+    del samples
+    try:
+      os.remove(scratch_path)
+    except OSError:
+      pass
+
+
+def process_long_audio(file_path, hint=None, queue_load=None, on_segment=None, scratch_path=None):
+  """
+  Hosszú felvétel feldolgozása iter_long_audio-val. Az on_segment callback minden kész szegmensre
+  meghívódik; a visszatérési érték a process_audio-val azonos szerkezetű.
+  """
+  try:
+    routing = None
+    texts = []
+    chunks = []
+    segment_count = 0
+    partial_segments = 0
+    for item in iter_long_audio(file_path, hint=hint, queue_load=queue_load, scratch_path=scratch_path):
+      if item["type"] == "routing":
+        routing = {k: v for k, v in item.items() if k != "type"}
+        continue
+      segment_count += 1
+      if item["partial"]:
+        partial_segments += 1
+      if item["text"]:
+        texts.append(item["text"])
+      chunks.extend(item["chunks"])
+      if on_segment:
+        on_segment(item)
     return {
         "file_path": file_path,
-        "status": "failed",
-        "error": str(e),
-        "error_type": type(e).__name__
+        "result": {"text": " ".join(texts), "chunks": chunks},
+        "routing": routing,
+        "mode": "long",
+        "segments": segment_count,
+        "partial": partial_segments > 0,
+        "partial_segments": partial_segments,
+        "status": "processed",
+        "message": "Audio processing completed successfully"
     }
+  except Exception as e:
+    return _failed_result(file_path, e)
+
+
+def recognize_samples(samples, hint=None, queue_load=None):
+  """Már dekódolt 16 kHz mono float32 hang felismerése fájl nélkül (process_audio-val azonos eredmény)"""
+  try:
+    prepared = prepare_samples(samples, hint=hint, queue_load=queue_load)
+    return run_prepared(prepared)
+  except Exception as e:
+    return _failed_result(None, e)
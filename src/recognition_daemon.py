@@ -0,0 +1,354 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import stat
+import struct
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import numpy as np
+from multiprocessing import shared_memory
+from .tools import bcolors
+from .settings import get_settings
+from .audio_utils import TARGET_SAMPLE_RATE
+
+SOCKET_NAME = 'fdp-speech-paste.sock'
+
+
+class DaemonUnavailable(Exception):
+    """A daemon nem érhető el (nincs socket, nem fut, vagy megszakadt a kapcsolat)"""
+    pass
+
+
+def daemon_supported():
+    """Unix domain socket szükséges (Windows-on a Python socket modul nem támogatja)."""
+    return hasattr(socket, 'AF_UNIX')
+
+
+def default_socket_path():
+    """
+    Felhasználónkénti privát könyvtár (0700): $XDG_RUNTIME_DIR, vagy <tmp>/fdp-speech-paste-<uid>.
+    Közös temp útvonalon egy másik helyi felhasználó előbb létrehozhatná a socketet.
+    """
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, SOCKET_NAME)
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(tempfile.gettempdir(), f'fdp-speech-paste-{uid}', SOCKET_NAME)
+
+
+def socket_path():
+    return get_settings().get('daemon_socket_path') or default_socket_path()
+
+
+def ensure_private_dir(directory):
+    """Létrehozza a könyvtárat 0700-zal; ha már létezik, csak akkor fogadjuk el, ha a miénk és privát."""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"Socket directory is not private to this user: {directory}")
+
+
+def resolve_uid(owner):
+    """A daemon elvárt felhasználója: None = az aktuális felhasználó, egyébként uid vagy név."""
+    if owner is None:
+        return os.getuid()
+    if isinstance(owner, int) or str(owner).isdigit():
+        return int(owner)
+    import pwd
+    return pwd.getpwnam(owner).pw_uid
+
+
+def resolve_gid(group):
+    if isinstance(group, int) or str(group).isdigit():
+        return int(group)
+    import grp
+    return grp.getgrnam(group).gr_gid
+
+
+def peer_uid(conn):
+    """A socket másik végén futó processz uid-ja (SO_PEERCRED, Linux); None, ha nem elérhető."""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    return struct.unpack('3i', creds)[1]
+
+
+def _attach_shared(name):
+    """
+    Csatlakozás a kliens által létrehozott shared memory szegmenshez. A szegmens a klienshez
+    tartozik: a daemon resource tracker-e nem törölheti (Python 3.13 előtt nincs track=False).
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        except Exception:
+            pass
+        return segment
+
+
+def _send(conn, message):
+    conn.sendall((json.dumps(message, ensure_ascii=False, default=str) + '\n').encode('utf-8'))
+
+
+class RecognitionDaemon:
+    """
+    Helyi felismerő daemon: egyetlen rezidens modell az összes helyi kliensnek.
+    - kliensenként egy kapcsolat, soronként egy JSON kérés/válasz
+    - a PCM a kliens shared memory szegmenséből jön (float32, 16 kHz mono), fájl nélkül
+    - a kéréseket batch_window_ms-ig gyűjti, és transcribe_samples-szel egyben futtatja
+    """
+
+    def __init__(self, path, batch_size=8, batch_window_ms=20, socket_mode='600'):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_window_sec = batch_window_ms / 1000.0
+        self.socket_mode = int(str(socket_mode), 8)
+        self._queue = queue.Queue()
+        self._server = None
+        self._running = False
+
+    def serve_forever(self):
+        from .model_manager import model_manager
+        model_manager.load_all()
+        model_manager.warm_up()
+
+        self._bind()
+        self._running = True
+        threading.Thread(target=self._batch_loop, name='daemon-batcher', daemon=True).start()
+        print(f"{bcolors.OKGREEN}[SUCCESS] Recognition daemon listening on {self.path}{bcolors.ENDC}")
+        try:
+            while self._running:
+                conn, _ = self._server.accept()
+                threading.Thread(target=self._handle_client, args=(conn,), name='daemon-client', daemon=True).start()
+        finally:
+            self.close()
+
+    def _bind(self):
+        if self.path == default_socket_path():
+            ensure_private_dir(os.path.dirname(self.path))
+        if os.path.exists(self.path):
+            # Régi socket fájl egy korábbi futásból; ha valaki még figyel rajta, nem vesszük át
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise RuntimeError(f"Another daemon is already listening on {self.path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.remove(self.path)
+            finally:
+                probe.close()
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        os.chmod(self.path, self.socket_mode)
+        self._server.listen(64)
+
+    def close(self):
+        self._running = False
+        if self._server:
+            self._server.close()
+            self._server = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _handle_client(self, conn):
+        """Egy kliens kéréseinek olvasása; a választ a batcher szál küldi vissza."""
+        with conn, conn.makefile('r', encoding='utf-8') as reader:
+            for line in reader:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    _send(conn, {"status": "failed", "error": "Invalid request"})
+                    continue
+                if request.get('type') == 'ping':
+                    _send(conn, {"type": "pong", "id": request.get('id')})
+                    continue
+                try:
+                    segment = _attach_shared(request['shm'])
+                    try:
+                        # Másolat, hogy a kliens a válasz után azonnal felszabadíthassa a szegmenst
+                        samples = np.ndarray((request['samples'],), dtype=np.float32, buffer=segment.buf).copy()
+                    finally:
+                        segment.close()
+                except (KeyError, FileNotFoundError, ValueError, TypeError) as e:
+                    _send(conn, {"id": request.get('id'), "status": "failed", "error": f"Invalid audio handoff: {str(e)}"})
+                    continue
+                done = threading.Event()
+                item = {"request": request, "samples": samples, "done": done, "result": None}
+                self._queue.put(item)
+                done.wait()
+                _send(conn, dict(item["result"], id=request.get('id')))
+
+    def _batch_loop(self):
+        from .recognition import transcribe_samples
+        while self._running:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window_sec
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # A hint-ek kérésenként eltérhetnek; hint szerint csoportosítunk
+            groups = {}
+            for item in batch:
+                groups.setdefault(item["request"].get('hint'), []).append(item)
+            for hint, items in groups.items():
+                started = time.monotonic()
+                try:
+                    results = transcribe_samples(
+                        [item["samples"] for item in items], sampling_rate=TARGET_SAMPLE_RATE,
+                        batch_size=self.batch_size, hint=hint
+                    )
+                except Exception as e:
+                    results = [{"status": "failed", "error": str(e), "error_type": type(e).__name__}] * len(items)
+                print(f"{bcolors.OKBLUE}[INFO] Daemon batch: {len(items)} kérés, "
+                      f"{time.monotonic() - started:.2f}s{bcolors.ENDC}")
+                for item, result in zip(items, results):
+                    item["result"] = result
+                    item["done"].set()
+
+
+class DaemonClient:
+    """
+    Kliens a helyi daemonhoz: a mintákat shared memory-n adja át, a kapcsolat megmarad a
+    kérések között. Bármilyen hiba DaemonUnavailable-t dob, a hívó ilyenkor helyben ismer fel.
+    """
+
+    def __init__(self, path=None, timeout_sec=60, owner=None, shm_group=None):
+        settings = get_settings()
+        self.path = path or socket_path()
+        self.timeout_sec = timeout_sec
+        # A daemon elvárt felhasználója (None = saját), illetve a shared memory-t olvasó csoport (None = 0600)
+        self.owner = owner if owner is not None else settings.get('daemon_owner')
+        self.shm_group = shm_group if shm_group is not None else settings.get('daemon_shm_group')
+        self._conn = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            if not daemon_supported() or not os.path.exists(self.path):
+                raise DaemonUnavailable(f"No daemon socket at {self.path}")
+            try:
+                expected_uid = resolve_uid(self.owner)
+            except KeyError:
+                raise DaemonUnavailable(f"Unknown daemon owner: {self.owner}")
+            # Hang csak a várt felhasználó daemonjának mehet (különben más felhasználó kapná meg a diktálást)
+            if os.stat(self.path).st_uid != expected_uid:
+                self._reject(f"Daemon socket {self.path} is not owned by uid {expected_uid}")
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout_sec)
+            try:
+                conn.connect(self.path)
+                uid = peer_uid(conn)
+            except OSError as e:
+                conn.close()
+                raise DaemonUnavailable(str(e))
+            if uid is not None and uid != expected_uid:
+                conn.close()
+                self._reject(f"Daemon process on {self.path} runs as uid {uid}, expected {expected_uid}")
+            self._conn = conn
+            self._reader = conn.makefile('r', encoding='utf-8')
+
+    def _reject(self, reason):
+        print(f"{bcolors.WARNING}[WARNING] {reason}; a daemon nem használható{bcolors.ENDC}")
+        raise DaemonUnavailable(reason)
+
+    def _share_segment(self, segment):
+        """A shared memory csak a saját felhasználónak olvasható, kivéve ha csoport van beállítva."""
+        if not hasattr(os, 'fchmod'):
+            return
+        if self.shm_group is None:
+            os.fchmod(segment._fd, 0o600)
+            return
+        os.fchown(segment._fd, -1, resolve_gid(self.shm_group))
+        os.fchmod(segment._fd, 0o640)
+
+    def _request(self, message):
+        with self._lock:
+            try:
+                self._connect()
+                _send(self._conn, message)
+                line = self._reader.readline()
+                if not line:
+                    raise DaemonUnavailable("Daemon closed the connection")
+                return json.loads(line)
+            except (OSError, ValueError) as e:
+                self.close()
+                raise DaemonUnavailable(str(e))
+            except DaemonUnavailable:
+                self.close()
+                raise
+
+    def ping(self):
+        """True, ha a daemon fut és válaszol."""
+        try:
+            return self._request({"type": "ping", "id": uuid.uuid4().hex}).get('type') == 'pong'
+        except DaemonUnavailable:
+            return False
+
+    def transcribe(self, samples, hint=None):
+        """16 kHz mono float32 minták felismerése a daemonban; process_audio-val azonos eredmény."""
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        segment = shared_memory.SharedMemory(create=True, size=max(1, samples.nbytes))
+        try:
+            self._share_segment(segment)
+            np.ndarray(samples.shape, dtype=np.float32, buffer=segment.buf)[:] = samples
+            return self._request({
+                "type": "recognize",
+                "id": uuid.uuid4().hex,
+                "shm": segment.name,
+                "samples": len(samples),
+                "hint": hint,
+            })
+        finally:
+            segment.close()
+            segment.unlink()
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._reader.close()
+                self._conn.close()
+            except OSError:
+                pass
+        self._conn = None
+        self._reader = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Helyi felismerő daemon (egy modell az összes helyi kliensnek).')
+    parser.add_argument('--socket', default=None, help='Unix domain socket útvonala')
+    args = parser.parse_args()
+    if not daemon_supported():
+        print(f"{bcolors.FAIL}[ERROR] Unix domain sockets are not supported on this platform{bcolors.ENDC}")
+        return 1
+    settings = get_settings()
+    daemon = RecognitionDaemon(
+        args.socket or socket_path(),
+        batch_size=settings.get('daemon_batch_size', 8),
+        batch_window_ms=settings.get('daemon_batch_window_ms', 20),
+        socket_mode=settings.get('daemon_socket_mode', '600'),
+    )
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{bcolors.OKBLUE}[INFO] Daemon leállítva{bcolors.ENDC}")
+    finally:
+        daemon.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
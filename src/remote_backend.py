@@ -0,0 +1,106 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from .tools import get_logger
+from .audio_utils import encode_for_upload, TARGET_SAMPLE_RATE
+
+log = get_logger('remote')
+
+
+class RemoteUnavailable(Exception):
+    """A távoli szerver nem érhető el, túl lassú, vagy nem tudja fogadni a kérést"""
+    pass
+
+
+class RemoteRecognizer:
+    """
+    Távoli /recognition szerver használata az asztali alkalmazásból.
+    - a hang 16 kHz mono, tömörítve (FLAC/Opus) megy fel, nem 44.1 kHz sztereó WAV-ként
+    - keep-alive kapcsolat pool (requests.Session), nincs kérésenkénti TCP/TLS felépítés
+    - háttér health check a /health/ready endpoint-on; ha a szerver nem kész, lassú vagy
+      elérhetetlen, RemoteUnavailable-t dob, és a hívó helyben ismer fel
+    """
+
+    def __init__(self, base_url, codec='flac', timeout_base_sec=5, timeout_per_audio_sec=1.0,
+                 health_interval_sec=15, pool_size=4):
+        self.base_url = base_url.rstrip('/')
+        self.codec = codec
+        self.timeout_base_sec = timeout_base_sec
+        self.timeout_per_audio_sec = timeout_per_audio_sec
+        self.health_interval_sec = health_interval_sec
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.healthy = False
+        self.last_error = None
+        self._stop = threading.Event()
+        self._health_thread = None
+
+    def start(self):
+        """Első health check szinkron (az indításkori döntéshez), utána háttérszálon ismétlődik."""
+        self.check_health()
+        self._health_thread = threading.Thread(target=self._health_loop, name='remote-health', daemon=True)
+        self._health_thread.start()
+        return self.healthy
+
+    def stop(self):
+        self._stop.set()
+        self.session.close()
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval_sec):
+            self.check_health()
+
+    def check_health(self):
+        try:
+            response = self.session.get(f"{self.base_url}/health/ready", timeout=self.timeout_base_sec)
+            healthy = response.status_code == 200
+            self.last_error = None if healthy else f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            healthy = False
+            self.last_error = str(e)
+        if healthy != self.healthy:
+            if healthy:
+                log.success("Távoli szerver elérhető: %s", self.base_url)
+            else:
+                log.warning("Távoli szerver nem elérhető (%s)", self.last_error)
+        self.healthy = healthy
+        return healthy
+
+    def recognize(self, samples, hint=None):
+        """16 kHz mono float32 minták felismerése a szerveren; process_audio-val azonos eredmény."""
+        if not self.healthy:
+            raise RemoteUnavailable(f"Server is not ready: {self.last_error}")
+        duration_sec = len(samples) / float(TARGET_SAMPLE_RATE)
+        body, filename, content_type = encode_for_upload(samples, codec=self.codec)
+        headers = {
+            "Content-Type": content_type,
+            "Filename": filename,
+            # Az asztali kliens késleltetés-érzékeny: interaktív sáv a szerver ütemezőjében
+            "X-Priority": "interactive",
+        }
+        if hint:
+            headers["X-Model-Tier"] = hint
+        timeout = self.timeout_base_sec + self.timeout_per_audio_sec * duration_sec
+        started = time.monotonic()
+        try:
+            response = self.session.post(f"{self.base_url}/recognition", data=body, headers=headers, timeout=timeout)
+        except requests.RequestException as e:
+            # A következő health check dönti el, mikor próbáljuk újra
+            self.healthy = False
+            self.last_error = str(e)
+            raise RemoteUnavailable(str(e))
+        # Túlterhelés vagy bármilyen szerver oldali hiba: a diktálás helyi felismerésre megy
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RemoteUnavailable(f"HTTP {response.status_code}")
+        try:
+            result = response.json()
+        except ValueError:
+            raise RemoteUnavailable(f"Invalid response (HTTP {response.status_code})")
+        log.debug("Távoli felismerés: %s", filename, upload_kb=round(len(body) / 1024),
+                  total_ms=round((time.monotonic() - started) * 1000, 1))
+        if response.status_code != 200:
+            return {"status": "failed", "error": result.get("error", f"HTTP {response.status_code}")}
+        return result
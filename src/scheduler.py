@@ -0,0 +1,146 @@
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from .tools import percentile
+
+# Sávok: az interaktív (késleltetés-érzékeny) kliensek a bulk munkák elé kerülnek
+LANE_INTERACTIVE = 'interactive'
+LANE_BULK = 'bulk'
+LANES = (LANE_INTERACTIVE, LANE_BULK)
+
+
+class SchedulerTimeout(Exception):
+    """A kérés nem kapott inferencia slot-ot a megadott időn belül"""
+    pass
+
+
+class Ticket:
+    """Egy várakozó munka: becsült költség (másodperc), sáv és érkezési idő"""
+
+    def __init__(self, seq, cost_sec, lane):
+        self.seq = seq
+        self.cost_sec = cost_sec
+        self.lane = lane
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+
+
+class JobScheduler:
+    """
+    Shortest-job-first ütemező egyetlen (vagy néhány) inferencia slot-hoz, a processing_lock helyett.
+    - SJF: a legkisebb becsült költségű munka kapja a következő slot-ot
+    - aging: a várakozás másodpercenként aging_rate másodperccel csökkenti az effektív költséget,
+      így a hosszú munkák sem éheznek ki
+    - sávok: az interaktív sáv előnyt élvez, de a bulk munka bulk_max_wait_sec után felzárkózik
+    """
+
+    def __init__(self, slots=1, aging_rate=1.0, bulk_max_wait_sec=60.0, history_size=500):
+        self.slots = slots
+        self.aging_rate = aging_rate
+        self.bulk_max_wait_sec = bulk_max_wait_sec
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._granted = set()
+        self._active = set()
+        self._running = 0
+        self._seq = itertools.count()
+        # Utolsó N munka várakozási ideje sávonként (metrikákhoz)
+        self._wait_history = {lane: deque(maxlen=history_size) for lane in LANES}
+        self._served = {lane: 0 for lane in LANES}
+        self._timeouts = {lane: 0 for lane in LANES}
+
+    def _priority(self, ticket, now):
+        waited = now - ticket.enqueued_at
+        lane_rank = 0 if ticket.lane == LANE_INTERACTIVE else 1
+        if lane_rank and waited >= self.bulk_max_wait_sec:
+            lane_rank = 0
+        # Azonos prioritásnál az érkezési sorrend dönt
+        return (lane_rank, ticket.cost_sec - self.aging_rate * waited, ticket.seq)
+
+    def _dispatch(self):
+        """Szabad slot-ok kiosztása a legjobb prioritású várakozóknak (lock alatt hívandó)."""
+        now = time.monotonic()
+        while self._running < self.slots and self._waiting:
+            ticket = min(self._waiting, key=lambda item: self._priority(item, now))
+            self._waiting.remove(ticket)
+            self._granted.add(ticket)
+            self._running += 1
+        self._cond.notify_all()
+
+    def acquire(self, cost_sec, lane=LANE_BULK, timeout=None):
+        """
+        Várakozik egy slot-ra. Visszaadja a ticket-et, vagy SchedulerTimeout-ot dob, ha timeout
+        másodpercen belül nem kerül sorra.
+        """
+        if lane not in LANES:
+            lane = LANE_BULK
+        with self._cond:
+            ticket = Ticket(next(self._seq), max(0.0, float(cost_sec)), lane)
+            self._waiting.append(ticket)
+            self._dispatch()
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while ticket not in self._granted:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._waiting.remove(ticket)
+                    self._timeouts[lane] += 1
+                    raise SchedulerTimeout(f"No inference slot within {timeout}s")
+                self._cond.wait(remaining)
+            self._granted.discard(ticket)
+            self._active.add(ticket)
+            ticket.started_at = time.monotonic()
+            self._wait_history[lane].append(ticket.started_at - ticket.enqueued_at)
+            self._served[lane] += 1
+            return ticket
+
+    def release(self, ticket):
+        """Felszabadítja a ticket slot-ját és kiosztja a következőnek."""
+        with self._cond:
+            self._active.discard(ticket)
+            self._running -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, cost_sec, lane=LANE_BULK, timeout=None):
+        ticket = self.acquire(cost_sec, lane=lane, timeout=timeout)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def queue_length(self):
+        """A slot-ra várakozó munkák száma."""
+        with self._cond:
+            return len(self._waiting)
+
+    def backlog(self, max_cost_sec=None):
+        """
+        A sorban álló munka költsége (audio-mp) és a futó munkák (költség, eltelt idő) listája.
+        max_cost_sec megadásakor csak az ennél nem drágább várakozókat számolja (SJF szerint ezek
+        kerülnek egy ekkora új munka elé).
+        """
+        with self._cond:
+            now = time.monotonic()
+            queued_sec = sum(
+                ticket.cost_sec for ticket in self._waiting
+                if max_cost_sec is None or ticket.cost_sec <= max_cost_sec
+            )
+            running = [(ticket.cost_sec, now - ticket.started_at) for ticket in self._active]
+            return queued_sec, running
+
+    def stats(self):
+        """Sor hossza és várakozási idők (p50/p95) sávonként."""
+        with self._cond:
+            result = {'running': self._running, 'slots': self.slots, 'lanes': {}}
+            for lane in LANES:
+                waits = sorted(self._wait_history[lane])
+                result['lanes'][lane] = {
+                    'queued': sum(1 for ticket in self._waiting if ticket.lane == lane),
+                    'served': self._served[lane],
+                    'timeouts': self._timeouts[lane],
+                    'wait_p50_sec': percentile(waits, 0.50),
+                    'wait_p95_sec': percentile(waits, 0.95),
+                }
+            return result
@@ -0,0 +1,275 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+import wave
+import numpy as np
+from .tools import bcolors, percentile
+from .settings import get_settings
+from .audio_utils import decode_audio, pcm16_to_float_mono, TARGET_SAMPLE_RATE
+from .evaluation import word_error_rate
+
+# Get the project root directory (one level up from src)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS_DIR = os.path.join(PROJECT_ROOT, 'session-corpus')
+AUDIO_NAME = 'audio.wav'
+SESSION_NAME = 'session.json'
+MB = 1024 * 1024
+
+
+def corpus_dir():
+    return get_settings().get('session_corpus_dir') or DEFAULT_CORPUS_DIR
+
+
+class DictationSession:
+    """
+    Egy diktálás felvétele: idővonal (esemény -> másodperc a kezdettől), a felismert szegmensek
+    (hangbeli pozíció, szöveg, felismerési idő) és a végén a teljes hang.
+    """
+
+    def __init__(self, recorder, mode):
+        self.recorder = recorder
+        self.id = time.strftime('%Y%m%d-%H%M%S') + '-' + uuid.uuid4().hex[:6]
+        self.mode = mode
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.timeline = []
+        self.segments = []
+
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    def mark(self, event, **details):
+        with self._lock:
+            self.timeline.append(dict(details, event=event, t=round(self.elapsed(), 4)))
+
+    def add_segment(self, start_sec, end_sec, text, latency_sec, status='processed'):
+        with self._lock:
+            self.segments.append({
+                "index": len(self.segments),
+                "start_sec": round(start_sec, 4),
+                "end_sec": round(end_sec, 4),
+                "text": text or '',
+                "status": status,
+                "latency_sec": round(latency_sec, 4),
+            })
+
+    def finish(self, pcm_data, channels, rate, backend=None):
+        """A nyers mikrofon adat és a metaadatok mentése háttérszálon (a diktálást nem lassítja)."""
+        self.mark('finished')
+        threading.Thread(
+            target=self.recorder.save, args=(self, pcm_data, channels, rate, backend),
+            name='session-recorder', daemon=True
+        ).start()
+
+
+class SessionRecorder:
+    """
+    Opt-in diktálás felvevő: minden diktálás egy könyvtár a korpuszban (16 kHz mono WAV +
+    session.json). A korpusz mérete max_mb-re korlátozott; a legrégebbi felvételek törlődnek.
+    """
+
+    def __init__(self, directory=None, max_mb=500):
+        self.directory = directory or corpus_dir()
+        self.max_bytes = int(max_mb * MB) if max_mb else None
+        self._lock = threading.Lock()
+
+    def begin(self, mode):
+        return DictationSession(self, mode)
+
+    def save(self, session, pcm_data, channels, rate, backend=None):
+        try:
+            samples = pcm16_to_float_mono(pcm_data, channels, rate)
+            directory = os.path.join(self.directory, session.id)
+            os.makedirs(directory, exist_ok=True)
+            write_wav(os.path.join(directory, AUDIO_NAME), samples)
+            settings = get_settings()
+            record = {
+                "id": session.id,
+                "started_at": session.started_at,
+                "mode": session.mode,
+                "backend": backend,
+                "models": {"accurate": settings.get('ai_model'), "fast": settings.get('ai_model_fast')},
+                "duration_sec": round(len(samples) / float(TARGET_SAMPLE_RATE), 4),
+                "timeline": session.timeline,
+                "segments": session.segments,
+                "text": ' '.join(segment["text"] for segment in session.segments if segment["text"]),
+            }
+            with open(os.path.join(directory, SESSION_NAME), 'w', encoding='utf-8') as f:
+                json.dump(record, f, indent=2, ensure_ascii=False)
+            print(f"{bcolors.OKBLUE}[INFO] Diktálás rögzítve a korpuszba: {session.id}{bcolors.ENDC}")
+            self.rotate()
+        except Exception as e:
+            print(f"{bcolors.WARNING}[WARNING] Diktálás rögzítése sikertelen: {str(e)}{bcolors.ENDC}")
+
+    def rotate(self):
+        """A legrégebbi felvételek törlése, amíg a korpusz a méretkorlát fölött van."""
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            sessions = list_sessions(self.directory)
+            sizes = {path: _dir_size(path) for path in sessions}
+            total = sum(sizes.values())
+            for path in sessions:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= sizes[path]
+
+
+def write_wav(path, samples):
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(TARGET_SAMPLE_RATE)
+        wf.writeframes(pcm.tobytes())
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def list_sessions(directory):
+    """A korpusz felvételei (könyvtár útvonalak), a legrégebbi elöl."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if os.path.isfile(os.path.join(directory, name, SESSION_NAME))
+    )
+
+
+def load_session(path):
+    with open(os.path.join(path, SESSION_NAME), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def make_recognizer(backend):
+    """Felismerő függvény (samples -> process_audio formátumú eredmény) a megadott háttérrel."""
+    if backend == 'daemon':
+        from .recognition_daemon import DaemonClient
+        client = DaemonClient(timeout_sec=get_settings().get('daemon_timeout_sec', 60))
+        if not client.ping():
+            raise RuntimeError(f"No recognition daemon at {client.path}")
+        return client.transcribe
+    if backend == 'remote':
+        from .remote_backend import RemoteRecognizer
+        settings = get_settings()
+        remote = RemoteRecognizer(
+            settings.get('remote_server_url', 'http://localhost:38321'),
+            codec=settings.get('remote_codec', 'flac'),
+            timeout_base_sec=settings.get('remote_timeout_base_sec', 5),
+            timeout_per_audio_sec=settings.get('remote_timeout_per_audio_sec', 1.0),
+        )
+        if not remote.start():
+            raise RuntimeError(f"Remote server is not ready: {remote.base_url}")
+        return remote.recognize
+    from .recognition import recognize_samples
+    return recognize_samples
+
+
+def replay(directory, backend='local', limit=None, output_path=None):
+    """
+    A korpusz felvételeinek újrafuttatása: a rögzített szegmensek ugyanazokkal a határokkal mennek
+    a felismerőbe, a felismerési idő és a szöveg a rögzített baseline-hoz hasonlítva.
+    """
+    sessions = list_sessions(directory)[-limit:] if limit else list_sessions(directory)
+    if not sessions:
+        print(f"{bcolors.WARNING}[WARNING] Üres korpusz: {directory}{bcolors.ENDC}")
+        return []
+    recognize = make_recognizer(backend)
+    output = open(output_path, 'a', encoding='utf-8') if output_path else None
+    records = []
+    try:
+        for path in sessions:
+            session = load_session(path)
+            samples = decode_audio(os.path.join(path, AUDIO_NAME))
+            for segment in session.get('segments', []):
+                window = samples[int(segment['start_sec'] * TARGET_SAMPLE_RATE):int(segment['end_sec'] * TARGET_SAMPLE_RATE)]
+                started = time.perf_counter()
+                result = recognize(window)
+                latency = time.perf_counter() - started
+                text = ''
+                if result.get('status') == 'processed' and isinstance(result.get('result'), dict):
+                    text = result['result'].get('text', '').strip()
+                record = {
+                    "session": session['id'],
+                    "segment": segment['index'],
+                    "audio_sec": round(len(window) / float(TARGET_SAMPLE_RATE), 3),
+                    "baseline_latency_sec": segment['latency_sec'],
+                    "latency_sec": round(latency, 4),
+                    "status": result.get('status'),
+                    "baseline_text": segment['text'],
+                    "text": text,
+                    "wer_vs_baseline": round(word_error_rate(segment['text'], text), 4),
+                }
+                records.append(record)
+                if output:
+                    output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    output.flush()
+                print(f"{bcolors.OKBLUE}[INFO] {session['id']}#{segment['index']}: "
+                      f"{record['baseline_latency_sec']:.2f}s -> {record['latency_sec']:.2f}s, "
+                      f"WER {record['wer_vs_baseline']:.2f}{bcolors.ENDC}")
+    finally:
+        if output:
+            output.close()
+    return records
+
+
+def print_summary(records, backend):
+    if not records:
+        return
+    baseline = sorted(record['baseline_latency_sec'] for record in records)
+    current = sorted(record['latency_sec'] for record in records)
+    changed = sum(1 for record in records if record['wer_vs_baseline'] > 0)
+    mean_wer = sum(record['wer_vs_baseline'] for record in records) / len(records)
+    print(f"\n{bcolors.OKGREEN}[SUCCESS] Replay ({backend}): {len(records)} szegmens{bcolors.ENDC}")
+    print(f"{'':<14}{'baseline':>12}{'replay':>12}")
+    print(f"{'latency p50':<14}{percentile(baseline, 0.50):>11.2f}s{percentile(current, 0.50):>11.2f}s")
+    print(f"{'latency p95':<14}{percentile(baseline, 0.95):>11.2f}s{percentile(current, 0.95):>11.2f}s")
+    print(f"{'latency sum':<14}{sum(baseline):>11.2f}s{sum(current):>11.2f}s")
+    print(f"Eltérő szöveg: {changed}/{len(records)}, átlagos WER a baseline-hoz: {mean_wer:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rögzített diktálások korpusza és visszajátszása.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    replay_parser = subparsers.add_parser('replay', help='A korpusz újrafuttatása és összehasonlítása')
+    replay_parser.add_argument('--corpus', default=None, help='Korpusz könyvtár')
+    replay_parser.add_argument('--backend', choices=['local', 'daemon', 'remote'], default='local')
+    replay_parser.add_argument('--model', default=None, help='Modell azonosító mindkét tier-hez (csak helyi háttér)')
+    replay_parser.add_argument('--limit', type=int, default=None, help='Csak a legutóbbi N felvétel')
+    replay_parser.add_argument('-o', '--output', default=None, help='Szegmensenkénti eredmények JSONL fájlba')
+    list_parser = subparsers.add_parser('list', help='A korpusz felvételeinek listázása')
+    list_parser.add_argument('--corpus', default=None, help='Korpusz könyvtár')
+    args = parser.parse_args()
+
+    directory = args.corpus or corpus_dir()
+    if args.command == 'list':
+        for path in list_sessions(directory):
+            session = load_session(path)
+            print(f"{session['id']:<28} {session['duration_sec']:>7.1f}s {len(session['segments']):>3} szegmens  "
+                  f"{session.get('backend') or '-':<8} {session['text'][:60]}")
+        return 0
+    if args.model:
+        # Csak memóriában: a replay nem írja át a mentett beállításokat
+        settings = get_settings()
+        settings['ai_model'] = args.model
+        settings['ai_model_fast'] = args.model
+    try:
+        records = replay(directory, backend=args.backend, limit=args.limit, output_path=args.output)
+    except RuntimeError as e:
+        print(f"{bcolors.FAIL}[ERROR] {str(e)}{bcolors.ENDC}")
+        return 1
+    print_summary(records, args.backend)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import os
+from .settings_store import SettingsStore
+
+# Beállítások fájl helye (projekt gyökér)
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'settings.json')
+
+# Alapértelmezett beállítások
+def default_settings():
+    return {
+        'volume': 50,
+        'window_x': None,
+        'window_y': None,
+        'ai_model': 'openai/whisper-large-v3-turbo',
+        # Kimenet: 'paste' (vágólap + Ctrl+V) vagy 'type' (szintetikus gépelés)
+        'output_mode': 'paste',
+        'restore_clipboard': True,
+        # Hosszú diktálásnál a felismerés ablakonként fut már felvétel közben
+        'incremental_output': True,
+        'incremental_window_sec': 20,
+        # Modell routing (opt-in): rövid klipek a gyors modellre, hosszúak a pontosra.
+        # Alapból kikapcsolva: a kis modell magyarul pontatlanabb, és egy második modellt is memóriában tart
+        'ai_model_fast': 'openai/whisper-small',
+        'routing_enabled': False,
+        'routing_fast_max_sec': 8,
+        'routing_busy_queue_len': 3,
+        'routing_busy_fast_max_sec': 20,
+        # Hosszú felvételek: e felett memory-mapped scratch fájlból, ablakonként dolgozunk
+        'long_audio_threshold_sec': 600,
+        'long_audio_window_sec': 30,
+        # Indítási profil riport kiírása (ugyanaz, mint a --profile-startup kapcsoló)
+        'startup_profile': False,
+        # Szerver warm-up: ennyi másodperces szintetikus inferenciák tier-enként
+        'warmup_durations_sec': [1, 5],
+        # Helyi model store (local-models): csak onnan töltünk, teljes checksum ellenőrzés indításkor
+        'model_store_offline': False,
+        'model_store_full_verify': False,
+        # None vagy 'dynamic-int8' (csak CPU-n)
+        'model_quantization': None,
+        # Ütemező: SJF aging (költség-mp / várakozási mp), bulk sáv max várakozása, slot timeout
+        'scheduler_aging_rate': 1.0,
+        'scheduler_bulk_max_wait_sec': 60,
+        'scheduler_wait_timeout_sec': 30,
+        # Befogadás: max sorban álló audio-mp, max becsült várakozás, kezdeti RTF becslés
+        'admission_max_backlog_audio_sec': 1800,
+        'admission_max_wait_sec': 60,
+        'admission_initial_rtf': 0.3,
+        # API stage-ek: párhuzamos feltöltések és decode worker-ek száma
+        'ingest_max_concurrent': 8,
+        'ingest_wait_timeout_sec': 10,
+        'decode_workers': 2,
+        # CPU szálkiosztás (python -m src.thread_tuner tölti ki); None = torch alapértelmezés
+        'torch_num_threads': None,
+        'torch_interop_threads': None,
+        'tuned_batch_size': None,
+        # None, magok listája, vagy 'auto' (SPEECH_WORKER_INDEX szerinti szelet worker-enként)
+        'cpu_affinity': None,
+        # Generálási korlátok: token keret a hang hosszából, wall-clock határidő, hurok felismerés
+        'generation_guard_enabled': True,
+        'generation_base_tokens': 16,
+        # Mért érték: magyar szöveg ~1.34 Whisper token / szótag, gyors beszéd ~8 szótag/s -> ~10.7 token/s;
+        # a keret ennek ~1.5-szerese, csak végső védelem (a hurkot az ismétlés- és határidő-figyelés fogja meg)
+        'generation_tokens_per_sec': 16,
+        'generation_deadline_base_sec': 10,
+        'generation_deadline_per_audio_sec': 1.0,
+        'repetition_max_period': 8,
+        'repetition_min_repeats': 4,
+        'repetition_min_span': 16,
+        # Élő profilozás (/debug/profile): alapból kikapcsolva, csak tokennel érhető el
+        'debug_profiling_enabled': False,
+        'debug_profiling_token': None,
+        'debug_profiling_max_sec': 120,
+        # Memória keret MB-ban (None = csak mérés); a becslés: hang mp * 16 kHz * 4 bájt * szorzó
+        'memory_budget_mb': None,
+        'memory_defer_timeout_sec': 10,
+        'memory_overhead_factor': 3,
+        # Asztali felismerő háttér: 'auto' (daemon, ha fut, egyébként helyi), 'daemon', 'local', 'remote'
+        'recognition_backend': 'auto',
+        # Helyi daemon (python -m src.recognition_daemon); None = felhasználónkénti privát könyvtár
+        'daemon_socket_path': None,
+        'daemon_socket_mode': '600',
+        # Közös daemon: a daemon felhasználója (név / uid, None = saját) és a shared memory csoportja
+        'daemon_owner': None,
+        'daemon_shm_group': None,
+        'daemon_batch_size': 8,
+        'daemon_batch_window_ms': 20,
+        'daemon_timeout_sec': 60,
+        # Távoli szerver háttér ('remote'): tömörített feltöltés, kapcsolat pool, health check
+        'remote_server_url': 'http://localhost:38321',
+        'remote_codec': 'flac',
+        'remote_timeout_base_sec': 5,
+        'remote_timeout_per_audio_sec': 1.0,
+        'remote_health_interval_sec': 15,
+        # WebSocket streaming (/recognition/ws, flask-sock szükséges)
+        'ws_max_streams': 8,
+        'ws_window_sec': 15,
+        'ws_partial_step_sec': 1.0,
+        'ws_max_buffer_sec': 60,
+        'ws_max_frame_bytes': 262144,
+        # Opt-in diktálás korpusz (hang + idővonal + szöveg) a replay eszközhöz
+        'session_recording_enabled': False,
+        'session_corpus_dir': None,
+        'session_corpus_max_mb': 500,
+        # Kihangosított mód: Ctrl+Win koppintás indít, a beszéd végét a VAD érzékeli
+        'hands_free_mode': False,
+        'vad_trailing_silence_ms': 700,
+        'vad_min_speech_ms': 150,
+        'vad_threshold_ratio': 3.0,
+        'vad_min_rms': 150,
+        'vad_no_speech_timeout_sec': 8,
+        'vad_tail_ms': 150,
+        # Naplózás: szint (DEBUG / INFO / WARNING / ERROR), opcionális JSON soros log fájl
+        'log_level': 'INFO',
+        'log_file': None,
+        'log_queue_size': 10000,
+    }
+
+# Beállítások közös példánya: debounce-olt atomi írás, külső szerkesztés újratöltése
+SETTINGS_SAVE_DEBOUNCE_SEC = 0.5
+SETTINGS_CHECK_INTERVAL_SEC = 2.0
+_store = SettingsStore(
+    SETTINGS_PATH, default_settings,
+    debounce_sec=SETTINGS_SAVE_DEBOUNCE_SEC, check_interval_sec=SETTINGS_CHECK_INTERVAL_SEC
+)
+
+
+def load_settings():
+    """
+    Betölti a beállításokat a fájlból, vagy alapértelmezettet ad vissza.
+    A fájl kézi módosítását (mtime) újratölti.
+    """
+    return _store.get()
+
+
+def save_settings(settings):
+    """
+    Elmenti a beállításokat: a memóriában azonnal érvényes, a fájlba írás rövid késleltetéssel,
+    összevonva és atomi módon történik.
+    """
+    _store.save(settings)
+
+
+def flush_settings():
+    """
+    A függő mentés azonnali kiírása (pl. ablak bezárásakor, kilépéskor).
+    """
+    _store.flush()
+
+
+def subscribe_settings(callback, keys=None):
+    """
+    Feliratkozás a beállítások változására; callback(changed) a megváltozott kulcsokkal.
+    Visszaad egy leiratkozó függvényt.
+    """
+    return _store.subscribe(callback, keys)
+
+
+def get_settings():
+    """
+    Visszaadja az aktuális beállításokat.
+    """
+    return load_settings()
@@ -0,0 +1,205 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class SettingsStore:
+    """
+    A settings.json memóriabeli példánya.
+    - save(): azonnal frissíti a memóriát, a fájlba írást debounce_sec-ig gyűjti (egy csúszka
+      húzása vagy gépelés így egyetlen írás), és atomi módon ír (temp fájl + os.replace)
+    - get(): olcsó mtime ellenőrzés (legfeljebb check_interval_sec-enként), a kézi szerkesztést
+      újratölti; a dict ugyanaz az objektum marad, a korábban kiadott referenciák is frissülnek
+    - subscribe(): értesítés a megváltozott kulcsokról (írás után, illetve külső módosításkor);
+      a callback-ek csak a figyelő / mentő szálon futnak, a get()-et hívó szálon soha
+      (a hívó zárat tarthat, amit a callback is kérne)
+    """
+
+    def __init__(self, path, defaults, debounce_sec=0.5, check_interval_sec=2.0):
+        self.path = path
+        self.defaults = defaults
+        self.debounce_sec = debounce_sec
+        self.check_interval_sec = check_interval_sec
+        self._lock = threading.RLock()
+        self._settings = None
+        self._notified = {}
+        self._mtime = None
+        self._last_check = 0.0
+        self._reloaded = False
+        self._timer = None
+        self._subscribers = []
+        self._watcher = None
+        atexit.register(self.flush)
+
+    def _read_file(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._mtime = self._signature()
+            return data
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"[WARNING] Beállítások betöltése sikertelen: {e}")
+            return None
+
+    def _with_defaults(self, data):
+        # Biztosítjuk, hogy minden kulcs meglegyen
+        for key, value in self.defaults().items():
+            if key not in data:
+                data[key] = value
+        return data
+
+    def get(self):
+        """Az aktuális beállítások (egyetlen közös dict), szükség esetén újratöltve a lemezről."""
+        with self._lock:
+            if self._settings is None:
+                data = self._read_file()
+                self._settings = self._with_defaults(data if data is not None else self.defaults())
+                self._notified = json.loads(json.dumps(self._settings))
+                self._last_check = time.monotonic()
+                return self._settings
+        if time.monotonic() - self._last_check >= self.check_interval_sec:
+            # Csak újratöltés; az értesítést a figyelő szál küldi ki
+            self.check_for_changes(notify=False)
+        return self._settings
+
+    def check_for_changes(self, notify=True):
+        """
+        Kézi szerkesztés felismerése a fájl mtime alapján és újratöltés. notify=True esetén
+        (figyelő szál) a korábban vagy most újratöltött változásokról értesít is.
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            # Függő saját írásnál nem töltünk újra (az írás úgyis felülírja a fájlt)
+            if self._timer is not None or self._settings is None:
+                return
+            self._reload_if_modified()
+            if not notify or not self._reloaded:
+                return
+            self._reloaded = False
+            changed = self._collect_changes()
+        if changed:
+            print(f"[INFO] Beállítások újratöltve a lemezről: {', '.join(sorted(changed))}")
+            self._notify(changed)
+
+    def _reload_if_modified(self):
+        try:
+            mtime = self._signature()
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        data = self._read_file()
+        if data is None:
+            return
+        self._replace(self._with_defaults(data))
+        self._reloaded = True
+
+    def _replace(self, new):
+        """
+        A közös dict helyben frissítése törlés nélkül: más szálak zár nélkül olvassák, így
+        soha nem láthatnak üres vagy hiányos állapotot (csak a változott kulcsok íródnak).
+        """
+        for key in [key for key in self._settings if key not in new]:
+            self._settings.pop(key, None)
+        for key, value in new.items():
+            if key not in self._settings or self._settings[key] != value:
+                self._settings[key] = value
+
+    def save(self, settings=None):
+        """A módosítások memóriában azonnal érvényesek; a fájlba írás debounce-olt."""
+        with self._lock:
+            if settings is not None and settings is not self._settings:
+                if self._settings is None:
+                    self._settings = settings
+                else:
+                    self._replace(settings)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce_sec, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Függő írás azonnali végrehajtása (debounce lejártakor és kilépéskor)."""
+        with self._lock:
+            if self._timer is None:
+                return
+            self._timer.cancel()
+            self._timer = None
+            try:
+                self._write()
+            except Exception as e:
+                print(f"[WARNING] Beállítások mentése sikertelen: {e}")
+            changed = self._collect_changes()
+        if changed:
+            self._notify(changed)
+
+    def _write(self):
+        directory = os.path.dirname(self.path) or '.'
+        fd, temp_path = tempfile.mkstemp(prefix='.settings-', suffix='.json', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._settings, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            # Atomi csere: olvasó sosem lát félig írt fájlt
+            os.replace(temp_path, self.path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._mtime = self._signature()
+
+    def _signature(self):
+        # mtime (ns) és méret: durva mtime felbontású fájlrendszeren is észreveszi a gyors szerkesztést
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _collect_changes(self):
+        changed = {
+            key: value for key, value in self._settings.items()
+            if key not in self._notified or self._notified[key] != value
+        }
+        self._notified = json.loads(json.dumps(self._settings))
+        return changed
+
+    def subscribe(self, callback, keys=None):
+        """
+        callback(changed) hívódik a megváltozott kulcs -> érték dict-tel; keys megadásakor
+        csak ezekre a kulcsokra. A külső szerkesztés figyelése az első feliratkozáskor indul.
+        Visszaad egy leiratkozó függvényt.
+        """
+        entry = (callback, set(keys) if keys else None)
+        with self._lock:
+            self._subscribers.append(entry)
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch_loop, name='settings-watcher', daemon=True)
+                self._watcher.start()
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+        return unsubscribe
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.check_interval_sec)
+            self.check_for_changes()
+
+    def _notify(self, changed):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback, keys in subscribers:
+            relevant = changed if keys is None else {key: value for key, value in changed.items() if key in keys}
+            if not relevant:
+                continue
+            try:
+                callback(relevant)
+            except Exception as e:
+                print(f"[WARNING] Beállítás értesítés sikertelen: {e}")
@@ -1,72 +1,16 @@
 import tkinter as tk
-import json
 import os
 from tkinter import messagebox
 from tkinter import simpledialog
 from tkinter import filedialog
 from tkinter import PhotoImage
 from PIL import Image, ImageTk
+from .settings import default_settings, load_settings, save_settings, flush_settings
 
-# Beállítások fájl helye (projekt gyökér)
-SETTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'settings.json')
 ERROR_LOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'error_log.txt')
 LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'images', 'logo.png')
 LOGO_ICON_PATH = LOGO_PATH  # Ugyanazt a képet használjuk ikonként is
 
-# Alapértelmezett beállítások
-def default_settings():
-    return {
-        'volume': 50,
-        'window_x': None,
-        'window_y': None,
-        'ai_model': 'openai/whisper-large-v3-turbo',
-    }
-
-# Beállítások globális cache
-_current_settings = None
-
-
-def load_settings():
-    """
-    Betölti a beállításokat a fájlból, vagy alapértelmezettet ad vissza.
-    """
-    global _current_settings
-    if _current_settings is not None:
-        return _current_settings
-    if os.path.exists(SETTINGS_PATH):
-        try:
-            with open(SETTINGS_PATH, 'r', encoding='utf-8') as f:
-                _current_settings = json.load(f)
-        except Exception:
-            _current_settings = default_settings()
-    else:
-        _current_settings = default_settings()
-    # Biztosítjuk, hogy minden kulcs meglegyen
-    for k, v in default_settings().items():
-        if k not in _current_settings:
-            _current_settings[k] = v
-    return _current_settings
-
-
-def save_settings(settings):
-    """
-    Elmenti a beállításokat a fájlba.
-    """
-    global _current_settings
-    _current_settings = settings
-    try:
-        with open(SETTINGS_PATH, 'w', encoding='utf-8') as f:
-            json.dump(settings, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        print(f"[WARNING] Beállítások mentése sikertelen: {e}")
-
-
-def get_settings():
-    """
-    Visszaadja az aktuális beállításokat.
-    """
-    return load_settings()
-
 # --- Hiba napló kezelés ---
 def append_error_log(msg):
     """
@@ -205,6 +149,7 @@ def open_settings_window(on_volume_change=None):
                     settings['window_x'] = int(parts[1])
                     settings['window_y'] = int(parts[2])
                     save_settings(settings)
+            flush_settings()
         except Exception as e:
             print(f"[WARNING] Ablak pozíció mentése sikertelen: {e}")
         window.destroy()
@@ -0,0 +1,60 @@
+import threading
+import time
+from contextlib import contextmanager
+from .tools import bcolors
+
+# A modul importálásának ideje = a profilozás nulla pontja (az app ezt importálja elsőként)
+PROCESS_START = time.perf_counter()
+
+
+class StartupProfiler:
+    """
+    Indítási lépések (import, modell betöltés, UI komponensek) időmérése és riportja.
+    Thread-safe, mert a nehéz betöltés háttérszálon fut.
+    """
+
+    def __init__(self, origin=PROCESS_START):
+        self.origin = origin
+        self.entries = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, name):
+        """Egy komponens idejének mérése: with startup_profiler.measure('indicator'): ..."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, started, time.perf_counter())
+
+    def mark(self, name):
+        """Időbélyeg a nulla ponttól (pl. 'ui ready'); a mark időtartama 0."""
+        now = time.perf_counter()
+        self._add(name, now, now)
+
+    def _add(self, name, started, finished):
+        with self._lock:
+            self.entries.append({
+                'name': name,
+                'thread': threading.current_thread().name,
+                'start_ms': (started - self.origin) * 1000.0,
+                'duration_ms': (finished - started) * 1000.0,
+            })
+
+    def report(self):
+        """Táblázatos riport: komponens, szál, kezdés és időtartam ezredmásodpercben."""
+        with self._lock:
+            entries = sorted(self.entries, key=lambda entry: entry['start_ms'])
+        lines = [f"{'component':<36} {'thread':<16} {'start ms':>10} {'took ms':>10}"]
+        for entry in entries:
+            lines.append(
+                f"{entry['name']:<36} {entry['thread'][:16]:<16} "
+                f"{entry['start_ms']:>10.1f} {entry['duration_ms']:>10.1f}"
+            )
+        return '\n'.join(lines)
+
+    def print_report(self):
+        print(f"{bcolors.HEADER}[PROFILE] Startup profile:\n{self.report()}{bcolors.ENDC}")
+
+
+startup_profiler = StartupProfiler()
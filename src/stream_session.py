@@ -0,0 +1,161 @@
+import threading
+import numpy as np
+from .tools import bcolors
+from .audio_utils import StreamResampler, TARGET_SAMPLE_RATE
+from .recognition import find_window_end
+
+# Támogatott PCM kódolások a kliens frame-jeihez
+ENCODING_S16LE = 's16le'
+ENCODING_F32LE = 'f32le'
+ENCODINGS = (ENCODING_S16LE, ENCODING_F32LE)
+
+
+class StreamBufferOverflow(Exception):
+    """A kliens gyorsabban küld hangot, mint ahogy a szerver feldolgozza (túllépte a puffer keretet)"""
+    pass
+
+
+class StreamSession:
+    """
+    Egy streaming kapcsolat állapota: a beérkező PCM frame-ekből ablakokat képez, és
+    - partial eseményt küld a nyitott ablakról, ha partial_step_sec új hang gyűlt össze
+      (terhelés alatt kihagyja, hogy a véglegesítés ne késsen),
+    - final eseményt küld, amikor az ablak betelt (a legcsendesebb ponton vágva) vagy a stream véget ért.
+    A feldolgozás külön szálon fut; a még nem véglegesített hang legfeljebb max_buffer_sec lehet.
+    """
+
+    def __init__(self, send, recognize, sampling_rate=TARGET_SAMPLE_RATE, encoding=ENCODING_S16LE,
+                 window_sec=15, partial_step_sec=1.0, max_buffer_sec=60, is_busy=None):
+        self.send = send
+        self.recognize = recognize
+        self.sampling_rate = sampling_rate
+        self.encoding = encoding
+        self.window_len = int(window_sec * TARGET_SAMPLE_RATE)
+        self.search_len = min(self.window_len // 4, 2 * TARGET_SAMPLE_RATE)
+        self.partial_step = int(partial_step_sec * TARGET_SAMPLE_RATE) if partial_step_sec else None
+        self.max_buffer = int(max_buffer_sec * TARGET_SAMPLE_RATE)
+        self.is_busy = is_busy or (lambda: False)
+        # Frame-ek közötti állapot: a félbevágott minta bájtjai és a resampler szűrő kontextusa
+        self._leftover = b''
+        self._resampler = StreamResampler(sampling_rate)
+        self._cond = threading.Condition()
+        self._incoming = []
+        self._incoming_len = 0
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._offset = 0
+        self._last_partial_len = 0
+        self._index = 0
+        self._ended = False
+        self._closed = False
+        self._error = None
+        self._worker = threading.Thread(target=self._run, name='stream-session', daemon=True)
+
+    def start(self):
+        self._worker.start()
+
+    def _to_samples(self, data):
+        # A frame határ eshet minta közepére: a maradék bájtok a következő frame elejére kerülnek
+        data = self._leftover + data
+        width = 4 if self.encoding == ENCODING_F32LE else 2
+        cut = len(data) - len(data) % width
+        self._leftover = data[cut:]
+        if self.encoding == ENCODING_F32LE:
+            samples = np.frombuffer(data[:cut], dtype=np.float32)
+        else:
+            samples = np.frombuffer(data[:cut], dtype=np.int16).astype(np.float32) / 32768.0
+        return self._resampler.push(samples)
+
+    def push(self, data):
+        """Egy PCM frame hozzáadása; StreamBufferOverflow, ha a nem véglegesített hang túl sok."""
+        self._append(self._to_samples(data))
+
+    def _append(self, samples):
+        with self._cond:
+            if self._error:
+                raise self._error
+            if len(self._buffer) + self._incoming_len + len(samples) > self.max_buffer:
+                raise StreamBufferOverflow(
+                    f"Unfinalized audio exceeds {self.max_buffer / TARGET_SAMPLE_RATE:.0f}s, client is sending too fast"
+                )
+            self._incoming.append(samples)
+            self._incoming_len += len(samples)
+            self._cond.notify()
+
+    def finish(self):
+        """A stream vége: a maradék hang véglegesítése, majd a done esemény."""
+        self._append(self._resampler.flush())
+        with self._cond:
+            self._ended = True
+            self._cond.notify()
+        self._worker.join()
+
+    def close(self):
+        """Kliens bontás: a feldolgozás megszakítása, a maradék eldobása."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _has_work(self):
+        pending = len(self._buffer) + self._incoming_len
+        if self._closed or (self._ended and self._incoming_len == 0 and len(self._buffer) == 0):
+            return True
+        if pending >= self.window_len or (self._ended and pending):
+            return True
+        return self.partial_step is not None and pending - self._last_partial_len >= self.partial_step
+
+    def _run(self):
+        try:
+            while True:
+                with self._cond:
+                    while not self._has_work():
+                        self._cond.wait()
+                    if self._closed:
+                        return
+                    if self._incoming:
+                        self._buffer = np.concatenate([self._buffer] + self._incoming)
+                        self._incoming = []
+                        self._incoming_len = 0
+                    buffer = self._buffer
+                    ended = self._ended
+                if len(buffer) == 0 and ended:
+                    self.send({"type": "done", "segments": self._index})
+                    return
+                if len(buffer) >= self.window_len or ended:
+                    self._finalize(buffer)
+                elif not self.is_busy():
+                    self._partial(buffer)
+                else:
+                    self._last_partial_len = len(buffer)
+        except Exception as e:
+            print(f"{bcolors.FAIL}[ERROR] Streaming feldolgozás sikertelen: {str(e)}{bcolors.ENDC}")
+            with self._cond:
+                self._error = e
+            self.send({"type": "error", "error": str(e), "error_type": type(e).__name__})
+
+    def _event(self, event_type, samples, result):
+        text = ''
+        if result.get('status') == 'processed' and isinstance(result.get('result'), dict):
+            text = result['result'].get('text', '').strip()
+        return {
+            "type": event_type,
+            "index": self._index,
+            "start_sec": self._offset / float(TARGET_SAMPLE_RATE),
+            "end_sec": (self._offset + len(samples)) / float(TARGET_SAMPLE_RATE),
+            "text": text,
+            "status": result.get('status'),
+            "partial_generation": bool(result.get('partial', False)),
+        }
+
+    def _partial(self, buffer):
+        self._last_partial_len = len(buffer)
+        self.send(self._event("partial", buffer, self.recognize(buffer)))
+
+    def _finalize(self, buffer):
+        end = find_window_end(buffer, 0, self.window_len, self.search_len)
+        window = buffer[:end]
+        self.send(self._event("final", window, self.recognize(window)))
+        with self._cond:
+            self._buffer = self._buffer[end:]
+        self._offset += end
+        self._index += 1
+        self._last_partial_len = 0
@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import numpy as np
+import torch
+from .tools import bcolors
+from .settings import get_settings, save_settings
+
+# A worker sorszáma (több szerver process egy gépen), az 'auto' affinity ez alapján oszt magokat
+WORKER_INDEX_ENV = 'SPEECH_WORKER_INDEX'
+CPU_AFFINITY_AUTO = 'auto'
+
+_applied = False
+_apply_lock = threading.Lock()
+
+
+def cpu_count():
+    """A process számára elérhető magok száma (affinity mask szerint, ha lekérdezhető)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def affinity_for_worker(worker_index, threads, total=None):
+    """Az 'auto' pinning magjai: a worker_index-edik, threads méretű szelet (körbefordulva)."""
+    total = total or os.cpu_count() or 1
+    threads = max(1, min(threads, total))
+    start = (worker_index * threads) % total
+    return sorted({(start + offset) % total for offset in range(threads)})
+
+
+def set_cpu_affinity(cores):
+    """Process rögzítése a megadott magokra; ahol az OS nem támogatja, csak figyelmeztet."""
+    if not hasattr(os, 'sched_setaffinity'):
+        print(f"{bcolors.WARNING}[WARNING] CPU affinity is not supported on this platform, ignored{bcolors.ENDC}")
+        return False
+    try:
+        os.sched_setaffinity(0, cores)
+        return True
+    except OSError as e:
+        print(f"{bcolors.WARNING}[WARNING] CPU affinity beállítása sikertelen ({cores}): {str(e)}{bcolors.ENDC}")
+        return False
+
+
+def apply_thread_settings(settings=None):
+    """
+    A hangolt torch szálszámok (intra-op, inter-op) és az opcionális CPU affinity alkalmazása.
+    Processenként egyszer fut, a modell betöltése előtt: az inter-op szálszám csak az első
+    párhuzamos torch művelet előtt állítható.
+    """
+    global _applied
+    with _apply_lock:
+        if _applied:
+            return
+        _applied = True
+    settings = settings or get_settings()
+    num_threads = settings.get('torch_num_threads')
+    interop_threads = settings.get('torch_interop_threads')
+    tuning = settings.get('thread_tuning') or {}
+    if tuning.get('cpu_count') and tuning['cpu_count'] != os.cpu_count():
+        print(f"{bcolors.WARNING}[WARNING] Thread settings were tuned on a {tuning['cpu_count']}-core host, "
+              f"this host has {os.cpu_count()} cores; rerun the tuner{bcolors.ENDC}")
+
+    affinity = settings.get('cpu_affinity')
+    if affinity == CPU_AFFINITY_AUTO:
+        worker_index = int(os.environ.get(WORKER_INDEX_ENV, 0))
+        affinity = affinity_for_worker(worker_index, num_threads or cpu_count())
+    if affinity:
+        if set_cpu_affinity(affinity):
+            print(f"{bcolors.OKBLUE}[INFO] CPU affinity: {affinity}{bcolors.ENDC}")
+
+    if num_threads:
+        torch.set_num_threads(int(num_threads))
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(int(interop_threads))
+        except RuntimeError as e:
+            # Már elindult párhuzamos munka ebben a processben
+            print(f"{bcolors.WARNING}[WARNING] Inter-op thread count cannot be changed now: {str(e)}{bcolors.ENDC}")
+    print(f"{bcolors.OKBLUE}[INFO] Torch threads: intra-op {torch.get_num_threads()}, "
+          f"inter-op {torch.get_num_interop_threads()}{bcolors.ENDC}")
+
+
+def default_thread_grid(total=None):
+    """Kettő hatványai a magszámig, plusz maga a magszám."""
+    total = total or cpu_count()
+    grid = []
+    threads = 1
+    while threads < total:
+        grid.append(threads)
+        threads *= 2
+    grid.append(total)
+    return grid
+
+
+def _benchmark_worker(interop_threads, thread_grid, batch_sizes, tier, clip_sec, repeats, max_new_tokens):
+    """
+    Egy inter-op beállítás mérése (külön processben fut, mert az inter-op szálszám processenként
+    csak egyszer állítható). Az intra-op szálszám és a batch méret menet közben változtatható.
+    Minden mérés egy JSON sor a stdout-on.
+    """
+    global _applied
+    torch.set_num_interop_threads(interop_threads)
+    # A mentett beállítások ne írják felül a mérés konfigurációját
+    _applied = True
+    from .model_manager import model_manager
+    pipe = model_manager.get_pipe(tier)
+    rng = np.random.default_rng(0)
+    generate_kwargs = {"max_new_tokens": max_new_tokens}
+    for threads in thread_grid:
+        torch.set_num_threads(threads)
+        for batch_size in batch_sizes:
+            inputs = [
+                {"raw": (rng.standard_normal(int(16000 * clip_sec)) * 0.001).astype(np.float32), "sampling_rate": 16000}
+                for _ in range(batch_size)
+            ]
+            # Bemelegítés az adott konfigurációval
+            pipe(inputs, batch_size=batch_size, generate_kwargs=generate_kwargs)
+            started = time.perf_counter()
+            for _ in range(repeats):
+                pipe(inputs, batch_size=batch_size, generate_kwargs=generate_kwargs)
+            elapsed = time.perf_counter() - started
+            print(json.dumps({
+                "interop_threads": interop_threads,
+                "threads": threads,
+                "batch_size": batch_size,
+                "elapsed_sec": elapsed,
+                "throughput": batch_size * clip_sec * repeats / elapsed,
+                "latency_sec": elapsed / repeats,
+            }), flush=True)
+
+
+def run_tuning(thread_grid, interop_grid, batch_sizes, tier='accurate', clip_sec=10.0, repeats=3, max_new_tokens=32):
+    """
+    Végigméri a (inter-op, intra-op, batch méret) rácsot a betöltött modellen, ezen a gépen.
+    Visszaadja az összes mérést, a legnagyobb átbocsátású (audio-mp / mp) elöl.
+    """
+    results = []
+    for interop_threads in interop_grid:
+        print(f"{bcolors.OKBLUE}[INFO] Mérés: inter-op {interop_threads}, intra-op {thread_grid}, "
+              f"batch {batch_sizes}{bcolors.ENDC}")
+        command = [
+            sys.executable, '-m', 'src.thread_tuner', '_worker',
+            '--interop', str(interop_threads),
+            '--threads', ','.join(str(value) for value in thread_grid),
+            '--batch-sizes', ','.join(str(value) for value in batch_sizes),
+            '--tier', tier,
+            '--clip-sec', str(clip_sec),
+            '--repeats', str(repeats),
+            '--max-new-tokens', str(max_new_tokens),
+        ]
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        process = subprocess.run(command, cwd=project_root, stdout=subprocess.PIPE, text=True)
+        if process.returncode != 0:
+            print(f"{bcolors.FAIL}[ERROR] Mérés sikertelen (inter-op {interop_threads}), kihagyva{bcolors.ENDC}")
+        for line in process.stdout.splitlines():
+            if line.startswith('{'):
+                result = json.loads(line)
+                results.append(result)
+                print(f"  intra-op {result['threads']:>3}  inter-op {result['interop_threads']:>2}  "
+                      f"batch {result['batch_size']:>3}  {result['throughput']:>8.2f} audio-s/s  "
+                      f"{result['latency_sec']:>7.2f}s/batch")
+    results.sort(key=lambda result: result['throughput'], reverse=True)
+    return results
+
+
+def save_best(best, tier):
+    """A legjobb konfiguráció mentése a beállításokba; indításkor apply_thread_settings alkalmazza."""
+    settings = get_settings()
+    settings['torch_num_threads'] = best['threads']
+    settings['torch_interop_threads'] = best['interop_threads']
+    settings['tuned_batch_size'] = best['batch_size']
+    settings['thread_tuning'] = {
+        'tuned_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'cpu_count': os.cpu_count(),
+        'tier': tier,
+        'throughput': round(best['throughput'], 3),
+    }
+    save_settings(settings)
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Torch szálszám és batch méret hangolása ezen a gépen.')
+    parser.add_argument('command', nargs='?', default='tune', choices=['tune', '_worker'])
+    parser.add_argument('--threads', type=_int_list, default=None, help='Intra-op szálszámok (pl. 1,2,4,8)')
+    parser.add_argument('--interop', type=str, default=None, help='Inter-op szálszámok (pl. 1,2)')
+    parser.add_argument('--batch-sizes', type=_int_list, default=[1, 4, 8], help='Batch méretek (pl. 1,4,8)')
+    parser.add_argument('--tier', choices=['fast', 'accurate'], default='accurate', help='Mért modell tier')
+    parser.add_argument('--clip-sec', type=float, default=10.0, help='Szintetikus klip hossza')
+    parser.add_argument('--repeats', type=int, default=3, help='Ismétlések konfigurációnként')
+    parser.add_argument('--max-new-tokens', type=int, default=32, help='Generálási limit a mérésekhez')
+    parser.add_argument('--dry-run', action='store_true', help='Csak kiírja az eredményt, nem menti')
+    args = parser.parse_args()
+
+    thread_grid = args.threads or default_thread_grid()
+    if args.command == '_worker':
+        _benchmark_worker(int(args.interop), thread_grid, args.batch_sizes, args.tier,
+                          args.clip_sec, args.repeats, args.max_new_tokens)
+        return 0
+
+    interop_grid = _int_list(args.interop) if args.interop else [value for value in (1, 2, 4) if value <= cpu_count()]
+    results = run_tuning(thread_grid, interop_grid, args.batch_sizes, tier=args.tier, clip_sec=args.clip_sec,
+                         repeats=args.repeats, max_new_tokens=args.max_new_tokens)
+    if not results:
+        print(f"{bcolors.FAIL}[ERROR] Nincs sikeres mérés{bcolors.ENDC}")
+        return 1
+    best = results[0]
+    print(f"{bcolors.OKGREEN}[SUCCESS] Legjobb: intra-op {best['threads']}, inter-op {best['interop_threads']}, "
+          f"batch {best['batch_size']} ({best['throughput']:.2f} audio-s/s){bcolors.ENDC}")
+    if not args.dry_run:
+        save_best(best, args.tier)
+        print(f"{bcolors.OKGREEN}[SUCCESS] Beállítások mentve, a következő indításkor érvényesek{bcolors.ENDC}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
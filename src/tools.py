@@ -1,3 +1,11 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
 
 class bcolors:
   HEADER = '\033[95m'
@@ -8,4 +16,157 @@ class bcolors:
   FAIL = '\033[91m'
   ENDC = '\033[0m'
   BOLD = '\033[1m'
-  UNDERLINE = '\033[4m'
\ No newline at end of file
+  UNDERLINE = '\033[4m'
+
+
+# --- Naplózás ---
+# Szintek: DEBUG (alapból kikapcsolva), INFO, SUCCESS, WARNING, ERROR
+SUCCESS = 25
+logging.addLevelName(SUCCESS, 'SUCCESS')
+LOGGER_NAME = 'fdp'
+# Az adapter kulcsszavai; minden más kulcsszó strukturált mező lesz
+_LOGGING_KWARGS = ('exc_info', 'stack_info', 'stacklevel', 'extra')
+
+_setup_lock = threading.Lock()
+_listener = None
+_handler = None
+
+
+class ConsoleFormatter(logging.Formatter):
+  """A korábbi print kimenettel azonos formátum: színes [SZINT] előtag, a mezők key=value alakban"""
+  COLORS = {
+    logging.DEBUG: '',
+    logging.INFO: bcolors.OKBLUE,
+    SUCCESS: bcolors.OKGREEN,
+    logging.WARNING: bcolors.WARNING,
+    logging.ERROR: bcolors.FAIL,
+    logging.CRITICAL: bcolors.FAIL,
+  }
+
+  def format(self, record):
+    message = record.getMessage()
+    fields = getattr(record, 'fields', None)
+    if fields:
+      message += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+    if record.exc_info:
+      message += '\n' + self.formatException(record.exc_info)
+    color = self.COLORS.get(record.levelno, '')
+    return f"{color}[{record.levelname}] {message}{bcolors.ENDC if color else ''}"
+
+
+class JsonFormatter(logging.Formatter):
+  """Egy JSON objektum soronként (log fájlhoz, gépi feldolgozáshoz)"""
+
+  def format(self, record):
+    entry = {
+      "ts": round(record.created, 3),
+      "level": record.levelname,
+      "logger": record.name,
+      "thread": record.threadName,
+      "msg": record.getMessage(),
+    }
+    entry.update(getattr(record, 'fields', None) or {})
+    if record.exc_info:
+      entry["exc"] = self.formatException(record.exc_info)
+    return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class AsyncQueueHandler(QueueHandler):
+  """
+  Sorba teszi a rekordot, az üzenet formázása és a kiírás a háttérszálon történik.
+  A hívó szál sosem blokkol: ha a sor megtelt (lassú konzol), a rekord eldobódik és számolódik.
+  """
+
+  def __init__(self, log_queue):
+    super().__init__(log_queue)
+    self.dropped = 0
+
+  def prepare(self, record):
+    # Nem formázunk a hívó szálon (a QueueHandler alapból itt fűzi össze az üzenetet)
+    return record
+
+  def enqueue(self, record):
+    try:
+      self.queue.put_nowait(record)
+    except queue.Full:
+      self.dropped += 1
+
+
+class StructuredLogger(logging.LoggerAdapter):
+  """
+  log.info("Kérés kész: %s", name, duration_sec=1.2) - a kulcsszavak strukturált mezők.
+  Kikapcsolt szintnél az üzenet és a mezők sem formázódnak.
+  """
+
+  def process(self, msg, kwargs):
+    fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in _LOGGING_KWARGS}
+    if fields:
+      kwargs['extra'] = dict(kwargs.get('extra') or {}, fields=fields)
+    return msg, kwargs
+
+  def success(self, msg, *args, **kwargs):
+    self.log(SUCCESS, msg, *args, **kwargs)
+
+
+def setup_logging(level=None, log_file=None, queue_size=None):
+  """
+  A naplózás beállítása (processenként egyszer): sor alapú háttér író a konzolra, opcionálisan
+  JSON soros log fájlba. Paraméter nélkül a settings.json log_level / log_file értékeit használja.
+  """
+  global _listener, _handler
+  with _setup_lock:
+    if _listener is not None:
+      return
+    if level is None or queue_size is None:
+      try:
+        from .settings import get_settings
+        settings = get_settings()
+      except Exception:
+        settings = {}
+      level = level or settings.get('log_level', 'INFO')
+      log_file = log_file or settings.get('log_file')
+      queue_size = queue_size or settings.get('log_queue_size', 10000)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    handlers[0].setFormatter(ConsoleFormatter())
+    if log_file:
+      file_handler = logging.FileHandler(log_file, encoding='utf-8')
+      file_handler.setFormatter(JsonFormatter())
+      handlers.append(file_handler)
+    log_queue = queue.Queue(maxsize=queue_size)
+    _handler = AsyncQueueHandler(log_queue)
+    root = logging.getLogger(LOGGER_NAME)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    root.addHandler(_handler)
+    root.propagate = False
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+  """A sorban maradt rekordok kiírása (kilépéskor)."""
+  global _listener
+  if _listener is not None:
+    _listener.stop()
+    _listener = None
+    if _handler is not None and _handler.dropped:
+      print(f"{bcolors.WARNING}[WARNING] {_handler.dropped} log rekord eldobva (a kimenet túl lassú volt){bcolors.ENDC}")
+
+
+def get_logger(name):
+  """Modul logger (az 'fdp' alatt); az első híváskor elindítja a háttér írót."""
+  setup_logging()
+  return StructuredLogger(logging.getLogger(f"{LOGGER_NAME}.{name}"), {})
+
+
+def elapsed_ms(started):
+  """perf_counter kezdőponttól eltelt idő ms-ban, log mezőkhöz."""
+  return round((time.perf_counter() - started) * 1000, 1)
+
+
+def percentile(sorted_values, fraction):
+  """Legközelebbi rang percentilis egy rendezett listából (üres listánál None)."""
+  if not sorted_values:
+    return None
+  index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+  return sorted_values[index]
@@ -0,0 +1,86 @@
+import numpy as np
+
+# Endpointer események
+EVENT_SPEECH_START = 'speech_start'
+EVENT_ENDPOINT = 'endpoint'
+EVENT_NO_SPEECH = 'no_speech'
+
+
+class Endpointer:
+    """
+    Streaming energia alapú beszéd végpont detektor a felvételi szálhoz (chunkonként hívva).
+    - a zajszintet az első chunkokból becsüli, és beszédszünetben lassan követi
+    - beszéd: RMS > max(min_rms, zajszint * threshold_ratio); a beszéd akkor indul, ha legalább
+      min_speech_ms folyamatos beszéd volt (egy kattanás nem indít)
+    - végpont: beszéd után trailing_silence_ms csend; a hang a beszéd vége + tail_ms-nél vágható
+    - ha no_speech_timeout_sec alatt nem indul beszéd, EVENT_NO_SPEECH
+    """
+
+    def __init__(self, rate, chunk_frames, trailing_silence_ms=700, min_speech_ms=150,
+                 threshold_ratio=3.0, min_rms=150, no_speech_timeout_sec=8, tail_ms=150, calibration_ms=150):
+        self.chunk_ms = 1000.0 * chunk_frames / rate
+        self.trailing_silence_ms = trailing_silence_ms
+        self.min_speech_ms = min_speech_ms
+        self.threshold_ratio = threshold_ratio
+        self.min_rms = min_rms
+        self.no_speech_timeout_ms = no_speech_timeout_sec * 1000.0 if no_speech_timeout_sec else None
+        self.tail_chunks = int(round(tail_ms / self.chunk_ms))
+        self.calibration_chunks = max(1, int(round(calibration_ms / self.chunk_ms)))
+        self.noise_floor = None
+        self._calibration = []
+        self.index = 0
+        self.speech_started = False
+        self.last_speech_index = None
+        self._speech_run_ms = 0.0
+        self._silence_ms = 0.0
+
+    def _rms(self, data):
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        if len(samples) == 0:
+            return 0.0
+        return float(np.sqrt(np.mean(samples * samples)))
+
+    def threshold(self):
+        return max(self.min_rms, (self.noise_floor or 0.0) * self.threshold_ratio)
+
+    def push(self, data):
+        """Egy mikrofon chunk feldolgozása; visszaad egy eseményt vagy None-t."""
+        rms = self._rms(data)
+        index = self.index
+        self.index += 1
+        if self.noise_floor is None:
+            self._calibration.append(rms)
+            if len(self._calibration) < self.calibration_chunks:
+                return None
+            # Minimum: ha a felhasználó már az első pillanatban beszél, az se emelje meg a zajszintet
+            self.noise_floor = float(min(self._calibration))
+
+        is_speech = rms > self.threshold()
+        if not is_speech:
+            # Zajszint követése csak beszédszünetben, lassan (beszéd nem emeli meg)
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * rms
+
+        if not self.speech_started:
+            self._speech_run_ms = self._speech_run_ms + self.chunk_ms if is_speech else 0.0
+            if self._speech_run_ms >= self.min_speech_ms:
+                self.speech_started = True
+                self.last_speech_index = index
+                return EVENT_SPEECH_START
+            if self.no_speech_timeout_ms is not None and self.index * self.chunk_ms >= self.no_speech_timeout_ms:
+                return EVENT_NO_SPEECH
+            return None
+
+        if is_speech:
+            self.last_speech_index = index
+            self._silence_ms = 0.0
+            return None
+        self._silence_ms += self.chunk_ms
+        if self._silence_ms >= self.trailing_silence_ms:
+            return EVENT_ENDPOINT
+        return None
+
+    def end_index(self):
+        """A megtartandó chunkok száma: az utolsó beszéd chunk + tail_ms (a csend nem megy a modellbe)."""
+        if self.last_speech_index is None:
+            return self.index
+        return min(self.index, self.last_speech_index + 1 + self.tail_chunks)